@@ -0,0 +1,244 @@
+"""
+Benchmark of the HTML cleaning step of the web scraper.
+
+Compares the previous cleaner (html.parser and two passes over the tree, plus two more `find_all("a")` passes) with the single-pass cleaner, with each available parser, over a directory of saved HTML pages. It also checks that the `Contenido` and `Enlaces` fields are the same for every page.
+
+Usage (from the src directory):
+
+    python -m benchmarks.html_cleaner_benchmark --fetch ../source_urls.txt
+    python -m benchmarks.html_cleaner_benchmark
+"""
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+import argparse
+import os
+import time
+from typing import Callable
+
+from model.web_scraper.web_scraper import clean_page, get_page_text, load_urls, scrape_page
+
+FIXTURES_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_clean_page_content(page_content: str) -> Tag:
+    """
+    The cleaner used before the single-pass one, kept as the reference for the benchmark.
+
+    :param page_content: The content of the page.
+    :type page_content: str
+    :return: The cleaned page content.
+    :rtype: Tag
+    """
+
+    soup: BeautifulSoup = BeautifulSoup(page_content, "html.parser")
+
+    attrs_to_remove: list[str] = [
+        "id", "class", "style", "data-fusion-component", "rel",
+        "data-index", "data-type", "data-custom-type", "target",
+        "dir", "lang"
+    ]
+
+    tags_to_remove: list[str] = [
+        "script", "svg", "img", "header", "footer", "iframe",
+        "nav", "figure", "noscript", "meta", "button", "input",
+        "style", "picture", "figcaption", "data-autor", "data-bloqueo",
+        "data-board", "data-category", "data-clasecontenido", "data-editorial",
+        "data-id", "data-name", "data-position", "data-publicacion", "data-redactorvisible",
+        "data-seccion", "data-subseccion", "data-tipocontenido"
+    ]
+
+    for trash_tag in soup(tags_to_remove):
+        trash_tag.extract()
+
+    for tag in soup.find_all(True):
+        for attr in attrs_to_remove:
+            if attr in tag.attrs:
+                del tag.attrs[attr]
+
+    return soup.body
+
+
+def legacy_clean(page_content: str) -> tuple[str, list[str]]:
+    """
+    Get the Contenido and Enlaces fields the way `extract_relevant_data` used to.
+
+    :param page_content: The content of the page.
+    :type page_content: str
+    :return: The article text and the links.
+    :rtype: tuple[str, list[str]]
+    """
+
+    clean_content: Tag = legacy_clean_page_content(page_content)
+
+    text: str = get_page_text(clean_content)
+    links: list[str] = [a["href"] for a in clean_content.find_all("a", href=True)]
+
+    for a in clean_content.find_all("a", href=True):
+        if "author" in str(a["href"]).lower() or "autor" in str(a["href"]).lower():
+            continue
+
+        a.decompose()
+
+    return text, links
+
+
+def single_pass_clean(parser: str) -> Callable[[str], tuple[str, list[str]]]:
+    """
+    Get a function that computes the Contenido and Enlaces fields with the single-pass cleaner.
+
+    :param parser: The parser used by BeautifulSoup.
+    :type parser: str
+    :return: The cleaning function.
+    :rtype: Callable[[str], tuple[str, list[str]]]
+    """
+
+    def clean(page_content: str) -> tuple[str, list[str]]:
+        clean_content, link_tags = clean_page(page_content, parser)
+
+        text: str = get_page_text(clean_content)
+        links: list[str] = [a["href"] for a in link_tags]
+
+        for a in link_tags:
+            if "author" in str(a["href"]).lower() or "autor" in str(a["href"]).lower():
+                continue
+
+            a.decompose()
+
+        return text, links
+
+    return clean
+
+
+def fetch_fixtures(urls_path: str, fixtures_path: str):
+    """
+    Download the pages of the given URLs file into the fixtures directory.
+
+    :param urls_path: The path to the file containing the URLs.
+    :type urls_path: str
+    :param fixtures_path: The directory to save the pages.
+    :type fixtures_path: str
+    """
+
+    if not os.path.exists(fixtures_path):
+        os.makedirs(fixtures_path)
+
+    for counter, url in enumerate(load_urls(urls_path)):
+        if not url:
+            continue
+
+        with open(os.path.join(fixtures_path, f"page_{counter}.html"), "w", encoding="utf-8") as file:
+            file.write(scrape_page(url))
+
+
+def load_fixtures(fixtures_path: str) -> list[str]:
+    """
+    Load the saved HTML pages.
+
+    :param fixtures_path: The directory with the pages.
+    :type fixtures_path: str
+    :return: The content of the pages.
+    :rtype: list[str]
+    """
+
+    pages: list[str] = []
+
+    for file in sorted(os.listdir(fixtures_path)):
+        if file.endswith(".html"):
+            with open(os.path.join(fixtures_path, file), "r", encoding="utf-8") as f:
+                pages.append(f.read())
+
+    return pages
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse the whitespace of the given text, since parsers differ in how they keep whitespace-only nodes.
+
+    :param text: The text to normalize.
+    :type text: str
+    :return: The normalized text.
+    :rtype: str
+    """
+
+    return " ".join(text.split())
+
+
+def run_benchmark(pages: list[str], repeat: int) -> list[dict]:
+    """
+    Run every cleaner over the given pages.
+
+    :param pages: The content of the pages.
+    :type pages: list[str]
+    :param repeat: The number of times each page is cleaned.
+    :type repeat: int
+    :return: For each cleaner, its name, pages per second and number of pages whose output differs from the reference.
+    :rtype: list[dict]
+    """
+
+    cleaners: dict[str, Callable[[str], tuple[str, list[str]]]] = {
+        "legacy (html.parser)": legacy_clean,
+        "single-pass (html.parser)": single_pass_clean("html.parser"),
+    }
+
+    try:
+        import lxml
+
+        cleaners["single-pass (lxml)"] = single_pass_clean("lxml")
+    except ImportError:
+        pass
+
+    reference: list[tuple[str, list[str]]] = [legacy_clean(page) for page in pages]
+    results: list[dict] = []
+
+    for name, cleaner in cleaners.items():
+        start: float = time.perf_counter()
+
+        for _ in range(repeat):
+            outputs: list[tuple[str, list[str]]] = [cleaner(page) for page in pages]
+
+        elapsed: float = time.perf_counter() - start
+
+        mismatches: int = sum(
+            1 for (text, links), (ref_text, ref_links) in zip(outputs, reference)
+            if normalize_text(text) != normalize_text(ref_text) or links != ref_links
+        )
+
+        results.append({
+            "cleaner": name,
+            "pages_per_second": len(pages) * repeat / elapsed,
+            "mismatches": mismatches,
+        })
+
+    return results
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Benchmark of the HTML cleaners of the web scraper.")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="Directory with the saved HTML pages.")
+    parser.add_argument("--fetch", metavar="URLS_PATH", help="Download the pages of this URLs file into the fixtures directory first.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each page is cleaned.")
+    args: argparse.Namespace = parser.parse_args()
+
+    if args.fetch:
+        fetch_fixtures(args.fetch, args.fixtures)
+
+    pages: list[str] = load_fixtures(args.fixtures)
+
+    if len(pages) == 0:
+        print(f"No HTML pages found in {args.fixtures}.")
+        return
+
+    print(f"{len(pages)} pages, {args.repeat} repetitions\n")
+    print(f"{'Cleaner':<28}{'Pages/s':>10}{'Speedup':>10}{'Mismatches':>12}")
+
+    results: list[dict] = run_benchmark(pages, args.repeat)
+    baseline: float = results[0]["pages_per_second"]
+
+    for result in results:
+        print(f"{result['cleaner']:<28}{result['pages_per_second']:>10.1f}{result['pages_per_second'] / baseline:>9.2f}x{result['mismatches']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark of parsing pages in a process pool.
+
+Parses a large set of saved HTML pages with `parse_page`, first in the current process and then in process pools of increasing size, and reports how the throughput scales with the number of workers. The saved pages are repeated until the set has the requested size.
+
+Usage (from the src directory):
+
+    python -m benchmarks.parse_pool_benchmark --pages 400 --workers 1 2 4 8
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import argparse
+import os
+import time
+
+from benchmarks.html_cleaner_benchmark import FIXTURES_PATH, load_fixtures
+from model.web_scraper.web_scraper import parse_page
+
+
+def run_serial(pages: list[str]) -> float:
+    """
+    Parse the given pages in the current process.
+
+    :param pages: The content of the pages.
+    :type pages: list[str]
+    :return: The elapsed time, in seconds.
+    :rtype: float
+    """
+
+    start: float = time.perf_counter()
+
+    for page in pages:
+        parse_page(page)
+
+    return time.perf_counter() - start
+
+
+def run_pool(pages: list[str], workers: int) -> float:
+    """
+    Parse the given pages in a process pool. The time to start the pool is included.
+
+    :param pages: The content of the pages.
+    :type pages: list[str]
+    :param workers: The number of processes.
+    :type workers: int
+    :return: The elapsed time, in seconds.
+    :rtype: float
+    """
+
+    start: float = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for _ in pool.map(parse_page, pages, chunksize=4):
+            pass
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Benchmark of parsing pages in a process pool.")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="Directory with the saved HTML pages.")
+    parser.add_argument("--pages", type=int, default=200, help="Number of pages to parse.")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Pool sizes to test. Defaults to powers of two up to the number of cores.")
+    args: argparse.Namespace = parser.parse_args()
+
+    fixtures: list[str] = load_fixtures(args.fixtures)
+
+    if len(fixtures) == 0:
+        print(f"No HTML pages found in {args.fixtures}.")
+        return
+
+    pages: list[str] = [fixtures[i % len(fixtures)] for i in range(args.pages)]
+
+    cpu_count: int = os.cpu_count() or 1
+    workers_list: list[int] = args.workers or [2 ** i for i in range(cpu_count.bit_length()) if 2 ** i <= cpu_count]
+
+    print(f"{len(pages)} pages ({len(fixtures)} distinct), {cpu_count} cores\n")
+    print(f"{'Mode':<16}{'Pages/s':>10}{'Speedup':>10}")
+
+    serial_time: float = run_serial(pages)
+    print(f"{'serial':<16}{len(pages) / serial_time:>10.1f}{1:>9.2f}x")
+
+    for workers in workers_list:
+        pool_time: float = run_pool(pages, workers)
+        print(f"{f'pool ({workers})':<16}{len(pages) / pool_time:>10.1f}{serial_time / pool_time:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+from langchain_core.documents import Document
+
+import re
+from datetime import date, datetime, time, timezone
+
+from model.web_scraper.article_store import get_site
+
+# Version of the way articles are turned into documents. The articles indexed with another version are indexed again by the incremental refresh.
+DOCUMENT_FORMAT: int = 2
+
+SPANISH_MONTHS: dict[str, int] = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+
+ISO_DATE_PATTERN: re.Pattern = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+NUMERIC_DATE_PATTERN: re.Pattern = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b")
+SPANISH_DATE_PATTERN: re.Pattern = re.compile(r"\b(\d{1,2})\s+de\s+([a-záéíóú]+)(?:\s+de)?\s+(\d{4})\b", re.IGNORECASE)
+
+
+def article_to_document(data: dict, source: str) -> Document:
+    """
+    Turn an extracted article into a document to index.
+
+    The text of the document is the content of the article, and the title, author, publication date, URL and site of the article are its metadata, so they can be shown with the retrieved chunks and used to filter the retrieval without being embedded.
+
+    :param data: The extracted data, with the keys Título, Autor, Fecha, Contenido and Enlaces.
+    :type data: dict
+    :param source: The URL of the article.
+    :type source: str
+    :return: The document.
+    :rtype: Document
+    """
+
+    metadata: dict[str, str | int] = {"source": source, "domain": get_site(source)}
+
+    for field, key in (("Título", "title"), ("Autor", "author")):
+        if isinstance(data.get(field), str) and data[field].strip():
+            metadata[key] = data[field].strip()
+
+    published: date | None = parse_publish_date(data.get("Fecha"))
+
+    if published is not None:
+        metadata["published"] = published.isoformat()
+        metadata["published_at"] = get_timestamp(published)
+
+    return Document(page_content=str(data.get("Contenido") or ""), metadata=metadata)
+
+
+def parse_publish_date(text: str | None) -> date | None:
+    """
+    Parse the publication date of an article, as found in its structured metadata ("2024-11-20T10:30:00-05:00") or written by the LLM ("20 de noviembre de 2024", "20/11/2024").
+
+    :param text: The date.
+    :type text: str | None
+    :return: The date, or None if it could not be parsed.
+    :rtype: date | None
+    """
+
+    if not isinstance(text, str):
+        return None
+
+    iso_match: re.Match | None = ISO_DATE_PATTERN.search(text)
+    numeric_match: re.Match | None = NUMERIC_DATE_PATTERN.search(text)
+    spanish_match: re.Match | None = SPANISH_DATE_PATTERN.search(text)
+
+    try:
+        if iso_match is not None:
+            return date(int(iso_match[1]), int(iso_match[2]), int(iso_match[3]))
+
+        if numeric_match is not None:
+            return date(int(numeric_match[3]), int(numeric_match[2]), int(numeric_match[1]))
+
+        if spanish_match is not None and spanish_match[2].lower() in SPANISH_MONTHS:
+            return date(int(spanish_match[3]), SPANISH_MONTHS[spanish_match[2].lower()], int(spanish_match[1]))
+
+    except ValueError:
+        return None
+
+    return None
+
+
+def get_timestamp(day: date) -> int:
+    """
+    Get the UNIX timestamp of the start of the given day, in UTC.
+
+    :param day: The day.
+    :type day: date
+    :return: The timestamp, in seconds.
+    :rtype: int
+    """
+
+    return int(datetime.combine(day, time(), tzinfo=timezone.utc).timestamp())
+
+
+def build_filter(sources: list[str] | None = None, published_after: date | None = None, published_before: date | None = None) -> dict | None:
+    """
+    Build the metadata filter of a retrieval, in the `where` syntax of Chroma.
+
+    :param sources: The sites (e.g. "elpais.com.co") or URLs of the articles to search, or None to search every article.
+    :type sources: list[str] | None
+    :param published_after: The first publication day of the articles to search, included.
+    :type published_after: date | None
+    :param published_before: The last publication day of the articles to search, included.
+    :type published_before: date | None
+    :return: The filter, or None if there is nothing to filter.
+    :rtype: dict | None
+    """
+
+    conditions: list[dict] = []
+
+    if sources:
+        sites: list[str] = [source.removeprefix("www.") for source in sources]
+        conditions.append({"$or": [{"domain": {"$in": sites}}, {"source": {"$in": list(sources)}}]})
+
+    if published_after is not None:
+        conditions.append({"published_at": {"$gte": get_timestamp(published_after)}})
+
+    if published_before is not None:
+        conditions.append({"published_at": {"$lte": get_timestamp(published_before)}})
+
+    if len(conditions) == 0:
+        return None
+
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def format_chunk(chunk: Document) -> str:
+    """
+    Format a retrieved chunk for the prompt, with the title, date and URL of its article before its text.
+
+    :param chunk: The chunk.
+    :type chunk: Document
+    :return: The formatted chunk.
+    :rtype: str
+    """
+
+    header: list[str] = [
+        f"{label}: {chunk.metadata[key]}"
+        for label, key in (("Título", "title"), ("Autor", "author"), ("Fecha", "published"), ("Fuente", "source"))
+        if chunk.metadata.get(key)
+    ]
+
+    return "\n".join(header + [chunk.page_content]) if header else chunk.page_content
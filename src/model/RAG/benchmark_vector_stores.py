@@ -0,0 +1,267 @@
+"""
+Benchmark of the vector stores of the RAG model.
+
+Builds a Chroma store, a flat store and an int8 flat store with the same synthetic embeddings, and compares the time to build them, to open them and to answer queries, the memory of the process that queries them and their recall@k against an exact search. Each store is built and queried in a fresh process, so the memory of one does not count against the other.
+
+Usage (from the src directory):
+
+    python -m model.RAG.benchmark_vector_stores --chunks 20000 --dimensions 1536 --queries 200 --quantized-dimensions 512
+"""
+
+from colorama import Fore
+from langchain_chroma import Chroma
+import numpy as np
+import psutil
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from model.RAG.flat_vector_store import FlatVectorStore, normalize
+from model.RAG.rag import VECTOR_STORES, get_collection
+from model.web_scraper.scrape_metrics import percentile
+
+BATCH_SIZE: int = 1000
+
+BENCHMARK_STORES: list[str] = VECTOR_STORES + ["flat-int8"]
+
+
+def benchmark_vector_stores(chunks: int = 20000, dimensions: int = 1536, queries: int = 200, k: int = 20, vector_stores: list[str] | None = None, quantized_dimensions: int | None = None, rerank: bool = True, seed: int = 0) -> dict[str, dict[str, float]]:
+    """
+    Benchmark the given vector stores with random embeddings.
+
+    The queries are noisy copies of stored embeddings, so each one has a clear set of nearest chunks, as real queries do. The recall@k of a store is the fraction of the k exact nearest chunks of each query that it returns.
+
+    :param chunks: The number of chunks in the stores.
+    :type chunks: int
+    :param dimensions: The dimensions of the embeddings.
+    :type dimensions: int
+    :param queries: The number of queries.
+    :type queries: int
+    :param k: The number of chunks returned per query.
+    :type k: int
+    :param vector_stores: The stores to benchmark: "chroma", "flat" and/or "flat-int8". Defaults to every store.
+    :type vector_stores: list[str] | None
+    :param quantized_dimensions: The dimensions kept by the int8 flat store, or None to keep them all.
+    :type quantized_dimensions: int | None
+    :param rerank: Whether the int8 flat store re-ranks its candidates with the float32 embeddings.
+    :type rerank: bool
+    :param seed: The seed of the random embeddings.
+    :type seed: int
+    :return: The results of each store: build, open and query times (in seconds), memory (in MB) and recall@k.
+    :rtype: dict[str, dict[str, float]]
+    """
+
+    results: dict[str, dict[str, float]] = {}
+    benchmark_path: str = tempfile.mkdtemp(prefix="vector_stores_")
+
+    try:
+        for vector_store in vector_stores or BENCHMARK_STORES:
+            store_path: str = os.path.join(benchmark_path, vector_store)
+            options: dict = {"quantized_dimensions": quantized_dimensions, "rerank": rerank}
+
+            results[vector_store] = {
+                **run_in_process(build_store, vector_store, store_path, chunks, dimensions, seed, options),
+                **run_in_process(query_store, vector_store, store_path, chunks, dimensions, queries, k, seed, options),
+            }
+
+            print(Fore.GREEN, f"{vector_store}: {results[vector_store]}")
+
+    finally:
+        shutil.rmtree(benchmark_path, ignore_errors=True)
+
+    return results
+
+
+def run_in_process(function, *args) -> dict[str, float]:
+    """
+    Run the given function in a fresh process.
+
+    :param function: The function, defined at module level.
+    :param args: The arguments of the function.
+    :return: The result of the function.
+    :rtype: dict[str, float]
+    """
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def build_store(vector_store: str, store_path: str, chunks: int, dimensions: int, seed: int, options: dict) -> dict[str, float]:
+    """
+    Build a store with random embeddings.
+
+    :param vector_store: The store: "chroma", "flat" or "flat-int8".
+    :type vector_store: str
+    :param store_path: The path of the store.
+    :type store_path: str
+    :param chunks: The number of chunks.
+    :type chunks: int
+    :param dimensions: The dimensions of the embeddings.
+    :type dimensions: int
+    :param seed: The seed of the random embeddings.
+    :type seed: int
+    :param options: The options of the int8 flat store.
+    :type options: dict
+    :return: The time to build the store and its size on disk.
+    :rtype: dict[str, float]
+    """
+
+    vectors: np.ndarray = get_vectors(chunks, dimensions, seed)
+
+    start: float = time.perf_counter()
+    db: Chroma | FlatVectorStore = open_store(vector_store, store_path, options)
+
+    for batch_start in range(0, chunks, BATCH_SIZE):
+        batch: range = range(batch_start, min(batch_start + BATCH_SIZE, chunks))
+
+        get_collection(db).upsert(
+            ids=[str(index) for index in batch],
+            embeddings=vectors[batch.start:batch.stop].tolist(),
+            metadatas=[{"source": f"article-{index // 10}"} for index in batch],
+            documents=[f"chunk {index}" for index in batch],
+        )
+
+    return {
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "disk_mb": round(get_directory_size(store_path) / 2**20, 1),
+    }
+
+
+def query_store(vector_store: str, store_path: str, chunks: int, dimensions: int, queries: int, k: int, seed: int, options: dict) -> dict[str, float]:
+    """
+    Open a store and run the queries, measuring their latency, their recall and the memory of the process.
+
+    :param vector_store: The store: "chroma", "flat" or "flat-int8".
+    :type vector_store: str
+    :param store_path: The path of the store.
+    :type store_path: str
+    :param chunks: The number of chunks in the store.
+    :type chunks: int
+    :param dimensions: The dimensions of the embeddings.
+    :type dimensions: int
+    :param queries: The number of queries.
+    :type queries: int
+    :param k: The number of chunks returned per query.
+    :type k: int
+    :param seed: The seed of the random embeddings.
+    :type seed: int
+    :param options: The options of the int8 flat store.
+    :type options: dict
+    :return: The time to open the store, the latencies of the queries, the memory used by the store and the recall@k.
+    :rtype: dict[str, float]
+    """
+
+    rng: np.random.Generator = np.random.default_rng(seed + 1)
+    stored: np.ndarray = get_vectors(chunks, dimensions, seed)
+    query_vectors: np.ndarray = normalize(stored[rng.integers(0, chunks, queries)] + rng.normal(0, 0.5 / np.sqrt(dimensions), (queries, dimensions)).astype(np.float32))
+    exact_ids: list[set[str]] = [
+        {str(index) for index in np.argpartition(-(stored @ query_vector), k - 1)[:k]}
+        for query_vector in query_vectors
+    ]
+    del stored
+
+    process: psutil.Process = psutil.Process()
+    base_rss: int = process.memory_info().rss
+
+    start: float = time.perf_counter()
+    collection = get_collection(open_store(vector_store, store_path, options))
+    collection.count()
+    open_seconds: float = time.perf_counter() - start
+
+    latencies: list[float] = []
+    recalls: list[float] = []
+
+    for query_vector, query_exact_ids in zip(query_vectors, exact_ids):
+        start = time.perf_counter()
+        results: dict = collection.query(query_embeddings=[query_vector.tolist()], n_results=k, include=["documents", "metadatas"])
+        latencies.append(time.perf_counter() - start)
+
+        recalls.append(len(query_exact_ids.intersection(results["ids"][0])) / k)
+
+    return {
+        "open_seconds": round(open_seconds, 3),
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "query_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "memory_mb": round((process.memory_info().rss - base_rss) / 2**20, 1),
+        f"recall@{k}": round(sum(recalls) / len(recalls), 4),
+    }
+
+
+def open_store(vector_store: str, store_path: str, options: dict) -> Chroma | FlatVectorStore:
+    """
+    Open a store with no embedding function, since the benchmark provides the embeddings.
+
+    :param vector_store: The store: "chroma", "flat" or "flat-int8".
+    :type vector_store: str
+    :param store_path: The path of the store.
+    :type store_path: str
+    :param options: The options of the int8 flat store.
+    :type options: dict
+    :return: The store.
+    :rtype: Chroma | FlatVectorStore
+    """
+
+    if vector_store == "flat":
+        return FlatVectorStore(store_path, embeddings=None)
+
+    if vector_store == "flat-int8":
+        return FlatVectorStore(store_path, embeddings=None, quantization="int8", **options)
+
+    return Chroma(persist_directory=store_path)
+
+
+def get_vectors(chunks: int, dimensions: int, seed: int) -> np.ndarray:
+    """
+    Get random normalized embeddings.
+
+    :param chunks: The number of embeddings.
+    :type chunks: int
+    :param dimensions: The dimensions of the embeddings.
+    :type dimensions: int
+    :param seed: The seed.
+    :type seed: int
+    :return: The embeddings, one per row.
+    :rtype: np.ndarray
+    """
+
+    return normalize(np.random.default_rng(seed).normal(size=(chunks, dimensions)).astype(np.float32))
+
+
+def get_directory_size(path: str) -> int:
+    """
+    Get the size of the files in the given directory.
+
+    :param path: The path of the directory.
+    :type path: str
+    :return: The size, in bytes.
+    :rtype: int
+    """
+
+    return sum(
+        os.path.getsize(os.path.join(directory, file))
+        for directory, _, files in os.walk(path)
+        for file in files
+    )
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Compare the latency and memory of the vector stores.")
+    parser.add_argument("--chunks", type=int, default=20000, help="Number of chunks in the stores.")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Dimensions of the embeddings.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries.")
+    parser.add_argument("--k", type=int, default=20, help="Number of chunks returned per query.")
+    parser.add_argument("--stores", nargs="+", choices=BENCHMARK_STORES, default=BENCHMARK_STORES, help="Stores to benchmark.")
+    parser.add_argument("--quantized-dimensions", type=int, default=None, help="Dimensions kept by the int8 flat store.")
+    parser.add_argument("--no-rerank", action="store_true", help="Do not re-rank the candidates of the int8 flat store.")
+    args: argparse.Namespace = parser.parse_args()
+
+    benchmark_vector_stores(args.chunks, args.dimensions, args.queries, args.k, args.stores, args.quantized_dimensions, not args.no_rerank)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+from langchain.schema import Document
+
+import math
+import threading
+from collections import Counter
+
+from model.RAG.article_documents import format_chunk
+from model.RAG.embedding_backends import tokenize
+from model.web_scraper.prompt_compactor import count_tokens
+
+CONTEXT_SEPARATOR: str = "\n\n---\n\n"
+
+
+class ContextPacker:
+    """
+    ContextPacker assembles the context of the prompt from the retrieved chunks, without repeating the same text.
+
+    The chunks are chosen from a larger set of candidates with maximal marginal relevance (MMR): each one is the candidate with the best trade-off between its rank in the retrieval and its similarity to the chunks already chosen, so a syndicated copy of a chosen article gives its place to a chunk that adds something, and near-duplicates are dropped. The chosen chunks of the same article that overlap (consecutive chunks share 100 characters) are merged into one, and the context is cut to fit a token budget for the whole prompt. The similarity of two chunks is the cosine of their word counts, which is exact for the repeated text this is meant to remove, and needs no embeddings.
+    """
+
+    def __init__(self, max_chunks: int = 3, candidates_factor: int = 4, mmr_lambda: float = 0.7, duplicate_threshold: float = 0.9, token_budget: int = 2000):
+        self.MAX_CHUNKS: int = max_chunks
+        self.CANDIDATES_FACTOR: int = candidates_factor
+        self.MMR_LAMBDA: float = mmr_lambda
+        self.DUPLICATE_THRESHOLD: float = duplicate_threshold
+        self.TOKEN_BUDGET: int = token_budget
+
+        self.last_stats: dict[str, int] = {}
+        self.stats: dict[str, int] = {"queries": 0, "tokens_before": 0, "tokens_after": 0, "duplicates": 0, "merged": 0, "dropped": 0}
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_candidates_count(self) -> int:
+        """
+        Get the number of chunks to retrieve for each query, among which the context is chosen.
+
+        :return: The number of candidates.
+        :rtype: int
+        """
+
+        return self.MAX_CHUNKS * self.CANDIDATES_FACTOR
+
+    def pack(self, chunks: list[Document], reserved_tokens: int = 0) -> str:
+        """
+        Build the context from the given chunks.
+
+        The tokens saved are measured against joining the first `max_chunks` chunks as they are, as the context was built before.
+
+        :param chunks: The retrieved chunks, from best to worst.
+        :type chunks: list[Document]
+        :param reserved_tokens: The tokens of the rest of the prompt (template and question), which are taken from the budget.
+        :type reserved_tokens: int
+        :return: The context.
+        :rtype: str
+        """
+
+        selected, duplicates = self.select(chunks)
+        merged: list[Document] = merge_adjacent_chunks(selected)
+        blocks: list[str] = []
+        budget: int = self.TOKEN_BUDGET - reserved_tokens
+        separator_tokens: int = count_tokens(CONTEXT_SEPARATOR)
+
+        for chunk in merged:
+            block: str = format_chunk(chunk)
+            block_tokens: int = count_tokens(block) + (separator_tokens if blocks else 0)
+
+            if block_tokens <= budget:
+                blocks.append(block)
+                budget -= block_tokens
+
+        context: str = CONTEXT_SEPARATOR.join(blocks)
+        last_stats: dict[str, int] = {
+            "tokens_before": count_tokens(CONTEXT_SEPARATOR.join(format_chunk(chunk) for chunk in chunks[:self.MAX_CHUNKS])),
+            "tokens_after": count_tokens(context),
+            "duplicates": duplicates,
+            "merged": len(selected) - len(merged),
+            "dropped": len(merged) - len(blocks),
+        }
+        last_stats["tokens_saved"] = last_stats["tokens_before"] - last_stats["tokens_after"]
+
+        with self.lock:
+            self.last_stats = last_stats
+            self.stats["queries"] += 1
+
+            for key in ("tokens_before", "tokens_after", "duplicates", "merged", "dropped"):
+                self.stats[key] += last_stats[key]
+
+        return context
+
+    def select(self, chunks: list[Document]) -> tuple[list[Document], int]:
+        """
+        Choose up to `max_chunks` chunks with maximal marginal relevance.
+
+        The relevance of a chunk is given by its rank, since the scores of the vector and hybrid retrievals are not comparable: it goes from 1 for the first chunk to almost 0 for the last one.
+
+        :param chunks: The candidates, from best to worst.
+        :type chunks: list[Document]
+        :return: The chosen chunks, in the order they were chosen, and the number of candidates dropped as duplicates.
+        :rtype: tuple[list[Document], int]
+        """
+
+        term_counts: list[Counter] = [Counter(tokenize(chunk.page_content)) for chunk in chunks]
+        remaining: list[int] = list(range(len(chunks)))
+        selected: list[int] = []
+        duplicates: int = 0
+
+        while remaining and len(selected) < self.MAX_CHUNKS:
+            best_index: int | None = None
+            best_score: float = -math.inf
+
+            for index in list(remaining):
+                redundancy: float = max((get_term_similarity(term_counts[index], term_counts[other]) for other in selected), default=0.0)
+
+                if redundancy >= self.DUPLICATE_THRESHOLD:
+                    remaining.remove(index)
+                    duplicates += 1
+                    continue
+
+                score: float = self.MMR_LAMBDA * (1 - index / len(chunks)) - (1 - self.MMR_LAMBDA) * redundancy
+
+                if score > best_score:
+                    best_index, best_score = index, score
+
+            if best_index is None:
+                break
+
+            selected.append(best_index)
+            remaining.remove(best_index)
+
+        return [chunks[index] for index in selected], duplicates
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Get the tokens saved by the packing since the packer was created, and in the last query.
+
+        :return: The packed queries, the tokens of their contexts before and after packing, the tokens saved, the chunks dropped as duplicates, merged with an adjacent chunk or cut by the budget, and the stats of the last query.
+        :rtype: dict[str, int]
+        """
+
+        with self.lock:
+            return {
+                **self.stats,
+                "tokens_saved": self.stats["tokens_before"] - self.stats["tokens_after"],
+                "last_query": dict(self.last_stats),
+            }
+
+
+def merge_adjacent_chunks(chunks: list[Document]) -> list[Document]:
+    """
+    Merge the chunks of the same source that overlap or touch, using their `start_index` metadata.
+
+    A merged chunk takes the place of the first of its chunks in the list, and its text is the union of theirs, without repeating the overlap.
+
+    :param chunks: The chunks, from best to worst.
+    :type chunks: list[Document]
+    :return: The merged chunks, from best to worst.
+    :rtype: list[Document]
+    """
+
+    groups: dict[str, list[int]] = {}
+
+    for index, chunk in enumerate(chunks):
+        if "start_index" in chunk.metadata:
+            groups.setdefault(chunk.metadata.get("source", ""), []).append(index)
+
+    merged: dict[int, Document] = {}
+    absorbed: set[int] = set()
+
+    for indexes in groups.values():
+        indexes.sort(key=lambda index: chunks[index].metadata["start_index"])
+        first: int = indexes[0]
+        current: Document = chunks[first]
+
+        for index in indexes[1:]:
+            chunk: Document = chunks[index]
+            end: int = current.metadata["start_index"] + len(current.page_content)
+
+            if chunk.metadata["start_index"] > end:
+                merged[first] = current
+                first, current = index, chunk
+                continue
+
+            current = Document(
+                id=current.id,
+                page_content=current.page_content + chunk.page_content[end - chunk.metadata["start_index"]:],
+                metadata=current.metadata,
+            )
+            # The merged chunk goes where the best ranked of its chunks was.
+            absorbed.add(max(first, index))
+            first = min(first, index)
+
+        merged[first] = current
+
+    return [merged.get(index, chunk) for index, chunk in enumerate(chunks) if index not in absorbed]
+
+
+def get_term_similarity(first: Counter, second: Counter) -> float:
+    """
+    Get the cosine similarity of the word counts of two texts.
+
+    :param first: The word counts of the first text.
+    :type first: Counter
+    :param second: The word counts of the second text.
+    :type second: Counter
+    :return: The similarity, from 0 (no words in common) to 1 (same words, in the same proportions).
+    :rtype: float
+    """
+
+    if len(first) > len(second):
+        first, second = second, first
+
+    norms: float = math.sqrt(sum(count * count for count in first.values())) * math.sqrt(sum(count * count for count in second.values()))
+
+    return sum(count * second[word] for word, count in first.items()) / norms if norms > 0 else 0.0
@@ -0,0 +1,110 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Iterable, Iterator
+
+CHUNK_SIZE: int = 1000
+CHUNK_OVERLAP: int = 100
+
+# Documents split together by a worker: large enough to amortize sending them to the worker process, small enough to keep few of them in memory.
+SPLIT_BATCH_SIZE: int = 64
+
+
+def create_text_splitter() -> RecursiveCharacterTextSplitter:
+    """
+    Create the text splitter of the knowledge base.
+
+    :return: The splitter, with chunks of up to 1000 characters overlapping by 100, and the start index of each chunk in its document.
+    :rtype: RecursiveCharacterTextSplitter
+    """
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        add_start_index=True,
+    )
+
+
+def split_document_batch(documents: list[Document]) -> list[Document]:
+    """
+    Split a batch of documents into chunks. Defined at module level so it can run in a worker process.
+
+    :param documents: The documents.
+    :type documents: list[Document]
+    :return: The chunks, in order.
+    :rtype: list[Document]
+    """
+
+    return create_text_splitter().split_documents(documents)
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    """
+    Group the given items in batches, consuming them lazily.
+
+    :param items: The items.
+    :type items: Iterable[Any]
+    :param batch_size: The maximum size of each batch.
+    :type batch_size: int
+    :return: The batches, in order.
+    :rtype: Iterator[list[Any]]
+    """
+
+    batch: list[Any] = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def iter_chunks(documents: Iterable[Document], workers: int = 0, batch_size: int = SPLIT_BATCH_SIZE) -> Iterator[Document]:
+    """
+    Split the given documents into chunks, as a stream.
+
+    The documents are consumed lazily, in batches, so the memory does not grow with the number of documents, and the chunks are yielded in the order of the documents. By default they are split in this process, since splitting is cheaper than sending the chunks back from a worker. With `workers`, the batches are split in a pool of worker processes, with only a few batches per worker in flight at a time; the pool is only started if there is more than one batch. Do not use it from a thread of a multithreaded process (e.g. the background loaders of the UI), where starting worker processes is not safe.
+
+    :param documents: The documents. It can be a generator.
+    :type documents: Iterable[Document]
+    :param workers: The number of worker processes, or 0 to split in this process.
+    :type workers: int
+    :param batch_size: The number of documents per batch.
+    :type batch_size: int
+    :return: The chunks, in order.
+    :rtype: Iterator[Document]
+    """
+
+    batches: Iterator[list[Document]] = iter_batches(documents, batch_size)
+
+    if workers <= 0:
+        for batch in batches:
+            yield from split_document_batch(batch)
+
+        return
+
+    first_batch: list[Document] | None = next(batches, None)
+    second_batch: list[Document] | None = next(batches, None)
+
+    if second_batch is None:
+        yield from split_document_batch(first_batch or [])
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future] = deque(pool.submit(split_document_batch, batch) for batch in (first_batch, second_batch))
+
+        for batch in batches:
+            pending.append(pool.submit(split_document_batch, batch))
+
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
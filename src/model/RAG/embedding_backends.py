@@ -0,0 +1,140 @@
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+import math
+import re
+import unicodedata
+import zlib
+from typing import Callable
+
+DEFAULT_EMBEDDING_BACKEND: str = "openai"
+
+# Backends that run on this machine: they need no API key, no network and no rate limiting.
+LOCAL_EMBEDDING_BACKENDS: set[str] = {"hashing"}
+
+WORD_PATTERN: re.Pattern = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    HashingEmbeddings is a fully local embedding function that runs on the CPU, with no model to download.
+
+    Each text is represented by its words and word pairs, hashed into a fixed number of dimensions with a random sign (the hashing trick) and weighted by the logarithm of their count. The vectors are normalized, so the cosine similarity measures the overlap of vocabulary. It is not as good as a neural model at matching paraphrases, but it embeds in microseconds, works offline and gives the same vectors on every machine.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.DIMENSIONS: int = dimensions
+
+        # Used by the embedding cache and to remember which backend built a store.
+        self.model: str = f"hashing-{dimensions}"
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed the given documents.
+
+        :param texts: The texts to embed.
+        :type texts: list[str]
+        :return: The embeddings, in the same order as the texts.
+        :rtype: list[list[float]]
+        """
+
+        return [self.embed_text(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed the given query.
+
+        :param text: The query.
+        :type text: str
+        :return: The embedding.
+        :rtype: list[float]
+        """
+
+        return self.embed_text(text)
+
+    def embed_text(self, text: str) -> list[float]:
+        """
+        Embed a single text.
+
+        :param text: The text.
+        :type text: str
+        :return: The normalized embedding.
+        :rtype: list[float]
+        """
+
+        words: list[str] = tokenize(text)
+        features: list[str] = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+        counts: dict[str, int] = {}
+
+        for feature in features:
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector: list[float] = [0.0] * self.DIMENSIONS
+
+        for feature, count in counts.items():
+            feature_hash: int = zlib.crc32(feature.encode("utf-8"))
+            sign: float = 1.0 if feature_hash & 0x80000000 else -1.0
+
+            vector[feature_hash % self.DIMENSIONS] += sign * (1.0 + math.log(count))
+
+        norm: float = math.sqrt(sum(value * value for value in vector))
+
+        return [value / norm for value in vector] if norm > 0 else vector
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split the given text into lowercase words without accents, so "Política" and "politica" are the same word.
+
+    :param text: The text.
+    :type text: str
+    :return: The words.
+    :rtype: list[str]
+    """
+
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+
+    return WORD_PATTERN.findall(text)
+
+
+EMBEDDING_BACKENDS: dict[str, Callable[[], Embeddings]] = {
+    "openai": lambda: OpenAIEmbeddings(max_retries=0),
+    "hashing": lambda: HashingEmbeddings(),
+}
+
+
+def register_embedding_backend(name: str, factory: Callable[[], Embeddings], local: bool = False):
+    """
+    Register an embedding backend, so it can be selected by name when a store is created.
+
+    :param name: The name of the backend.
+    :type name: str
+    :param factory: The function that creates the embedding function.
+    :type factory: Callable[[], Embeddings]
+    :param local: Whether the backend runs on this machine, in which case its embeddings are neither cached nor rate limited.
+    :type local: bool
+    """
+
+    EMBEDDING_BACKENDS[name] = factory
+
+    if local:
+        LOCAL_EMBEDDING_BACKENDS.add(name)
+
+
+def create_embeddings(backend: str) -> Embeddings:
+    """
+    Create the embedding function of the given backend.
+
+    :param backend: The name of the backend.
+    :type backend: str
+    :return: The embedding function.
+    :rtype: Embeddings
+    :raises ValueError: If the backend is not registered.
+    """
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}. Expected one of: {', '.join(EMBEDDING_BACKENDS)}")
+
+    return EMBEDDING_BACKENDS[backend]()
@@ -0,0 +1,226 @@
+from langchain_core.embeddings import Embeddings
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+DEFAULT_MAX_SIZE_BYTES: int = 512 * 1024 * 1024
+
+CREATE_TABLE_QUERY: str = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+CREATE_INDEX_QUERY: str = "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+
+
+class EmbeddingCache:
+    """
+    EmbeddingCache is an on-disk cache of embeddings, saved in a single SQLite file.
+
+    Each embedding is keyed by the name of the model and the hash of the embedded text, so a byte-identical chunk embedded by the same model is never sent to the embeddings API again. The vectors are stored as 32-bit floats. When the cache grows over its maximum size, the least recently used embeddings are evicted.
+    """
+
+    def __init__(self, cache_path: str = ".cache/embeddings.db", max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES):
+        self.CACHE_PATH: str = cache_path
+        self.MAX_SIZE_BYTES: int = max_size_bytes
+
+        cache_dir: str = os.path.dirname(self.CACHE_PATH)
+
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.connection: sqlite3.Connection = sqlite3.connect(self.CACHE_PATH, check_same_thread=False)
+        self.lock: threading.Lock = threading.Lock()
+
+        self.stats: dict[str, int] = {"hits": 0, "misses": 0, "evicted": 0}
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(CREATE_TABLE_QUERY)
+            self.connection.execute(CREATE_INDEX_QUERY)
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """
+        Get the cached embeddings of the given keys, counting the hits and misses.
+
+        :param keys: The keys, built with `get_key`.
+        :type keys: list[str]
+        :return: The cached embeddings, by key. The missing keys are not included.
+        :rtype: dict[str, list[float]]
+        """
+
+        unique_keys: list[str] = list(dict.fromkeys(keys))
+        found: dict[str, list[float]] = {}
+
+        with self.lock:
+            # Query in batches to stay under the SQLite limit of variables per statement.
+            for start in range(0, len(unique_keys), 500):
+                batch: list[str] = unique_keys[start:start + 500]
+                placeholders: str = ", ".join("?" * len(batch))
+
+                for key, vector in self.connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch):
+                    found[key] = array("f", vector).tolist()
+
+            with self.connection:
+                self.connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found])
+
+            self.stats["hits"] += sum(1 for key in keys if key in found)
+            self.stats["misses"] += sum(1 for key in keys if key not in found)
+
+        return found
+
+    def put_many(self, embeddings: dict[str, list[float]]):
+        """
+        Save the given embeddings, evicting the least recently used ones if the cache grows over its maximum size.
+
+        :param embeddings: The embeddings, by key.
+        :type embeddings: dict[str, list[float]]
+        """
+
+        now: float = time.time()
+        rows: list[tuple] = []
+
+        for key, embedding in embeddings.items():
+            vector: bytes = array("f", embedding).tobytes()
+            rows.append((key, vector, len(key) + len(vector), now))
+
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows)
+            self.evict()
+
+    def evict(self):
+        """
+        Delete the least recently used embeddings until the cache is under its maximum size. The lock must be held by the caller.
+        """
+
+        total_size: int = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+        if total_size <= self.MAX_SIZE_BYTES:
+            return
+
+        to_delete: list[str] = []
+
+        for key, size in self.connection.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            if total_size <= self.MAX_SIZE_BYTES:
+                break
+
+            to_delete.append(key)
+            total_size -= size
+
+        self.connection.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key in to_delete])
+        self.stats["evicted"] += len(to_delete)
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Get the hits, misses and evictions of the cache since it was opened, and its current number of embeddings and size.
+
+        :return: The stats of the cache.
+        :rtype: dict[str, int]
+        """
+
+        with self.lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+
+            return {**self.stats, "entries": entries, "size_bytes": size}
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+
+        with self.lock:
+            self.connection.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    CachedEmbeddings wraps an embedding function with an `EmbeddingCache`.
+
+    Only the documents that are not in the cache are sent to the wrapped embedding function, in a single call. Queries are not cached, since they are rarely repeated verbatim.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.EMBEDDINGS: Embeddings = embeddings
+        self.CACHE: EmbeddingCache = cache
+        self.MODEL_NAME: str = get_model_name(embeddings)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed the given documents, reading the embeddings from the cache when possible.
+
+        :param texts: The texts to embed.
+        :type texts: list[str]
+        :return: The embeddings, in the same order as the texts.
+        :rtype: list[list[float]]
+        """
+
+        keys: list[str] = [get_key(self.MODEL_NAME, text) for text in texts]
+        cached: dict[str, list[float]] = self.CACHE.get_many(keys)
+
+        missing: dict[str, str] = {key: text for key, text in zip(keys, texts) if key not in cached}
+
+        if missing:
+            new_embeddings: dict[str, list[float]] = dict(zip(missing.keys(), self.EMBEDDINGS.embed_documents(list(missing.values()))))
+
+            self.CACHE.put_many(new_embeddings)
+            cached.update(new_embeddings)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed the given query with the wrapped embedding function.
+
+        :param text: The query.
+        :type text: str
+        :return: The embedding.
+        :rtype: list[float]
+        """
+
+        return self.EMBEDDINGS.embed_query(text)
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Get the stats of the cache.
+
+        :return: The hits, misses, evictions, entries and size of the cache.
+        :rtype: dict[str, int]
+        """
+
+        return self.CACHE.get_stats()
+
+
+def get_model_name(embeddings: Embeddings) -> str:
+    """
+    Get the name of the model of the given embedding function.
+
+    :param embeddings: The embedding function.
+    :type embeddings: Embeddings
+    :return: The model name, or the class name if it has no model attribute.
+    :rtype: str
+    """
+
+    return str(getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or type(embeddings).__name__)
+
+
+def get_key(model_name: str, text: str) -> str:
+    """
+    Get the cache key of the given text embedded by the given model.
+
+    :param model_name: The name of the model.
+    :type model_name: str
+    :param text: The text.
+    :type text: str
+    :return: The key, in the format «model name»:«SHA-256 of the text».
+    :rtype: str
+    """
+
+    return f"{model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
@@ -0,0 +1,201 @@
+from colorama import Fore
+from langchain_core.embeddings import Embeddings
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from model.RAG.embedding_cache import get_model_name
+from model.web_scraper.prompt_compactor import count_tokens
+from model.web_scraper.retry_policy import RetryPolicy
+
+# Below the limits of the OpenAI embeddings endpoint (2048 inputs and 300k tokens per request), so a batch is never rejected for its size.
+DEFAULT_MAX_BATCH_SIZE: int = 512
+DEFAULT_MAX_BATCH_TOKENS: int = 100_000
+
+
+class AdaptiveLimiter:
+    """
+    AdaptiveLimiter bounds the number of requests in flight, adapting the bound to the rate limits of the provider.
+
+    The bound is halved on every rate limit (429) response, and grows back by one after as many successful requests as the current bound, up to its maximum (additive increase, multiplicative decrease). This keeps the build close to the available quota without repeatedly tripping the rate limits.
+    """
+
+    def __init__(self, max_limit: int):
+        self.MAX_LIMIT: int = max(1, max_limit)
+        self.limit: int = self.MAX_LIMIT
+        self.in_flight: int = 0
+        self.successes: int = 0
+
+        self.condition: threading.Condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait until a request can be sent, and count it as in flight.
+        """
+
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+
+            self.in_flight += 1
+
+    def release(self, succeeded: bool):
+        """
+        Count a request as done, growing the bound if enough requests succeeded.
+
+        :param succeeded: Whether the request succeeded.
+        :type succeeded: bool
+        """
+
+        with self.condition:
+            self.in_flight -= 1
+
+            if succeeded:
+                self.successes += 1
+
+                if self.successes >= self.limit and self.limit < self.MAX_LIMIT:
+                    self.limit += 1
+                    self.successes = 0
+
+            self.condition.notify_all()
+
+    def slow_down(self):
+        """
+        Halve the bound after a rate limit response.
+        """
+
+        with self.condition:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    EmbeddingScheduler sends the documents to an embedding function in batches, with several requests in flight.
+
+    The batches are sized by number of texts and tokens to stay within the limits of the provider. The requests run in a thread pool, bounded by an `AdaptiveLimiter` that slows down on rate limit responses, which are retried by a `RetryPolicy` (honouring their Retry-After header). The progress and throughput of large builds are printed as the batches finish.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_in_flight: int = 4, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS):
+        self.EMBEDDINGS: Embeddings = embeddings
+        self.MAX_IN_FLIGHT: int = max_in_flight
+        self.MAX_BATCH_SIZE: int = max_batch_size
+        self.MAX_BATCH_TOKENS: int = max_batch_tokens
+
+        # Exposed so the embedding cache keys the embeddings by the model of the wrapped function.
+        self.model: str = get_model_name(embeddings)
+
+        self.limiter: AdaptiveLimiter = AdaptiveLimiter(max_in_flight)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed the given documents in concurrent batches.
+
+        :param texts: The texts to embed.
+        :type texts: list[str]
+        :return: The embeddings, in the same order as the texts.
+        :rtype: list[list[float]]
+        """
+
+        if len(texts) == 0:
+            return []
+
+        batches: list[tuple[list[str], int]] = self.get_batches(texts)
+
+        if len(batches) == 1:
+            return self.embed_batch(batches[0][0])
+
+        total_tokens: int = sum(tokens for _, tokens in batches)
+        progress: dict[str, int] = {"texts": 0, "tokens": 0}
+        progress_lock: threading.Lock = threading.Lock()
+        start: float = time.perf_counter()
+
+        def embed_batch(batch: tuple[list[str], int]) -> list[list[float]]:
+            batch_texts, batch_tokens = batch
+            embeddings: list[list[float]] = self.embed_batch(batch_texts)
+
+            with progress_lock:
+                progress["texts"] += len(batch_texts)
+                progress["tokens"] += batch_tokens
+                elapsed: float = time.perf_counter() - start
+
+                print(
+                    Fore.CYAN,
+                    f"Embeddings: {progress['texts']}/{len(texts)} textos ({progress['tokens'] / total_tokens:.0%}), "
+                    f"{progress['tokens'] / elapsed:.0f} tokens/s, {self.limiter.limit} peticiones simultáneas como máximo."
+                )
+
+            return embeddings
+
+        with ThreadPoolExecutor(max_workers=self.MAX_IN_FLIGHT) as executor:
+            results: list[list[list[float]]] = list(executor.map(embed_batch, batches))
+
+        return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed the given query with the wrapped embedding function, retrying a few times on errors.
+
+        :param text: The query.
+        :type text: str
+        :return: The embedding.
+        :rtype: list[float]
+        """
+
+        return RetryPolicy(max_attempts=3).run(lambda: self.EMBEDDINGS.embed_query(text))
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed a single batch, waiting for a free slot of the limiter and retrying on errors.
+
+        :param texts: The texts of the batch.
+        :type texts: list[str]
+        :return: The embeddings of the batch.
+        :rtype: list[list[float]]
+        """
+
+        def on_retry(attempt: int, error: Exception):
+            if getattr(error, "status_code", None) == 429:
+                self.limiter.slow_down()
+
+        self.limiter.acquire()
+        succeeded: bool = False
+
+        try:
+            embeddings: list[list[float]] = RetryPolicy().run(lambda: self.EMBEDDINGS.embed_documents(texts), on_retry)
+            succeeded = True
+
+            return embeddings
+
+        finally:
+            self.limiter.release(succeeded)
+
+    def get_batches(self, texts: list[str]) -> list[tuple[list[str], int]]:
+        """
+        Split the given texts into batches within the size and token limits. A text over the token limit goes in a batch of its own.
+
+        :param texts: The texts.
+        :type texts: list[str]
+        :return: The texts and number of tokens of each batch, in order.
+        :rtype: list[tuple[list[str], int]]
+        """
+
+        batches: list[tuple[list[str], int]] = []
+        batch: list[str] = []
+        batch_tokens: int = 0
+
+        for text in texts:
+            text_tokens: int = count_tokens(text)
+
+            if batch and (len(batch) >= self.MAX_BATCH_SIZE or batch_tokens + text_tokens > self.MAX_BATCH_TOKENS):
+                batches.append((batch, batch_tokens))
+                batch, batch_tokens = [], 0
+
+            batch.append(text)
+            batch_tokens += text_tokens
+
+        if batch:
+            batches.append((batch, batch_tokens))
+
+        return batches
@@ -0,0 +1,666 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+FLAT_INDEX_FILE_NAME: str = "flat_index.db"
+FLAT_VECTORS_FILE_NAME: str = "flat_vectors.f32"
+FLAT_CODES_FILE_NAME: str = "flat_vectors.i8"
+FLAT_SCALES_FILE_NAME: str = "flat_scales.f32"
+
+QUANTIZATIONS: list[str] = ["float32", "int8"]
+
+# With re-ranking, the quantized search takes this many candidates per result, which are re-ranked with the exact embeddings.
+RERANK_CANDIDATES_FACTOR: int = 4
+
+# Rows of the quantized matrix converted to float at a time when searching, to bound the memory of a query.
+SEARCH_BLOCK_ROWS: int = 1024
+
+# The comparison operators of the Chroma `where` filters, in SQL.
+WHERE_OPERATORS: dict[str, str] = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+CREATE_TABLE_QUERIES: list[str] = [
+    "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, document TEXT NOT NULL, metadata TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+]
+
+
+class FlatVectorStore:
+    """
+    FlatVectorStore is an exact vector store kept in a single float32 matrix, an alternative to Chroma for corpora of up to a few hundred thousand chunks.
+
+    The normalized embeddings are saved row by row in a raw file that is memory-mapped when queried, so opening the store reads nothing and every process that opens it shares the same pages of the OS cache. A query is a single matrix-vector product followed by `argpartition`, with no graph to build or load. The IDs, texts and metadata of the chunks are saved in a SQLite file next to the matrix, and the rows of deleted chunks are reused by the next chunks.
+
+    The store can also be searched on an int8 copy of the matrix, optionally truncated to its first dimensions, which takes a quarter of the memory (or less) of the float32 matrix. Each row is scaled by its own factor, so its largest value is 127. The float32 matrix is still kept on disk as the source of truth, and the best candidates of the quantized search are re-ranked with it, reading only their rows. The quantization is remembered by the store; opening it with a different one rebuilds the int8 copy from the float32 matrix.
+
+    Its methods mirror the subset of the Chroma collection API that `RAG` uses (`get`, `upsert`, `delete`, `count` and `query`, with `where` metadata filters), so both stores are interchangeable. The distances are cosine distances. A filtered query only scores the rows of the chunks that pass the filter.
+    """
+
+    def __init__(self, store_path: str, embeddings: Embeddings, quantization: str | None = None, quantized_dimensions: int | None = None, rerank: bool = True):
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Invalid quantization: {quantization}. Expected one of: {', '.join(QUANTIZATIONS)}")
+
+        self.STORE_PATH: str = store_path
+        self.VECTORS_PATH: str = os.path.join(store_path, FLAT_VECTORS_FILE_NAME)
+        self.CODES_PATH: str = os.path.join(store_path, FLAT_CODES_FILE_NAME)
+        self.SCALES_PATH: str = os.path.join(store_path, FLAT_SCALES_FILE_NAME)
+        self.RERANK: bool = rerank
+        self.embeddings: Embeddings = embeddings
+
+        if not os.path.exists(self.STORE_PATH):
+            os.makedirs(self.STORE_PATH)
+
+        # Created empty if they do not exist, so they can always be opened for writing.
+        for path in (self.VECTORS_PATH, self.CODES_PATH, self.SCALES_PATH):
+            open(path, "ab").close()
+
+        self.connection: sqlite3.Connection = sqlite3.connect(os.path.join(store_path, FLAT_INDEX_FILE_NAME), check_same_thread=False)
+        self.lock: threading.RLock = threading.RLock()
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+
+            for query in CREATE_TABLE_QUERIES:
+                self.connection.execute(query)
+
+        settings: dict[str, str] = dict(self.connection.execute("SELECT key, value FROM settings").fetchall())
+        self.dimensions: int | None = int(settings["dimensions"]) if "dimensions" in settings else None
+
+        # The chunk ID of each row of the matrix (None for free rows), and which rows hold a chunk.
+        self.row_ids: list[str | None] = []
+        self.rows: dict[str, int] = {}
+
+        for chunk_id, row_number in self.connection.execute("SELECT id, row FROM chunks"):
+            self.set_row(row_number, chunk_id)
+
+        self.alive: np.ndarray = np.array([chunk_id is not None for chunk_id in self.row_ids], dtype=bool)
+        self.vectors: np.memmap | None = None
+        self.codes: np.memmap | None = None
+        self.scales: np.memmap | None = None
+
+        stored_quantization: tuple[str, int | None] = (
+            settings.get("quantization", "float32"),
+            int(settings["quantized_dimensions"]) if settings.get("quantized_dimensions") else None
+        )
+
+        self.QUANTIZATION: str = quantization or stored_quantization[0]
+        self.QUANTIZED_DIMENSIONS: int | None = None
+
+        if self.QUANTIZATION == "int8":
+            self.QUANTIZED_DIMENSIONS = quantized_dimensions if quantized_dimensions is not None else stored_quantization[1]
+
+        if (self.QUANTIZATION, self.QUANTIZED_DIMENSIONS) != stored_quantization:
+            with self.lock:
+                self.requantize()
+
+    def count(self) -> int:
+        """
+        Count the chunks in the store.
+
+        :return: The number of chunks.
+        :rtype: int
+        """
+
+        with self.lock:
+            return len(self.rows)
+
+    def get(self, ids: list[str] | None = None, where: dict | None = None, include: list[str] | None = None) -> dict:
+        """
+        Get the chunks with the given IDs or metadata.
+
+        :param ids: The IDs of the chunks, or None to get every chunk.
+        :type ids: list[str] | None
+        :param where: The metadata filter of the chunks, in the `where` syntax of Chroma, or None.
+        :type where: dict | None
+        :param include: What to return besides the IDs: "documents", "metadatas" and/or "embeddings". Defaults to the documents and metadatas.
+        :type include: list[str] | None
+        :return: The "ids" of the chunks and the included fields, as lists in the same order.
+        :rtype: dict
+        """
+
+        include = ["documents", "metadatas"] if include is None else include
+
+        conditions: list[str] = []
+        parameters: list = []
+
+        if ids is not None:
+            if len(ids) == 0:
+                return {"ids": [], **{field: [] for field in include}}
+
+            conditions.append(f"id IN ({', '.join('?' * len(ids))})")
+            parameters += ids
+
+        if where:
+            where_sql, where_parameters = where_to_sql(where)
+            conditions.append(where_sql)
+            parameters += where_parameters
+
+        query: str = "SELECT id, row, document, metadata FROM chunks"
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        with self.lock:
+            rows: list[tuple] = self.connection.execute(query, parameters).fetchall()
+
+            if ids is not None:
+                positions: dict[str, int] = {chunk_id: position for position, chunk_id in enumerate(ids)}
+                rows.sort(key=lambda row: positions[row[0]])
+
+            return self.get_results(rows, include)
+
+    def upsert(self, ids: list[str], embeddings: list[list[float]], metadatas: list[dict] | None = None, documents: list[str] | None = None):
+        """
+        Add the given chunks to the store, replacing the chunks with the same IDs.
+
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        :param embeddings: The embeddings of the chunks.
+        :type embeddings: list[list[float]]
+        :param metadatas: The metadata of the chunks.
+        :type metadatas: list[dict] | None
+        :param documents: The texts of the chunks.
+        :type documents: list[str] | None
+        :raises ValueError: If the embeddings do not have the dimensions of the store.
+        """
+
+        if len(ids) == 0:
+            return
+
+        vectors: np.ndarray = normalize(np.asarray(embeddings, dtype=np.float32))
+        metadatas = metadatas or [{}] * len(ids)
+        documents = documents or [""] * len(ids)
+
+        with self.lock:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+
+                with self.connection:
+                    self.connection.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dimensions', ?)", (str(self.dimensions),))
+
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Expected embeddings of {self.dimensions} dimensions, got {vectors.shape[1]}.")
+
+            free_rows: list[int] = [row for row, chunk_id in enumerate(self.row_ids) if chunk_id is None]
+            free_rows.reverse()
+            chunk_rows: list[int] = []
+
+            for chunk_id in ids:
+                if chunk_id in self.rows:
+                    row: int = self.rows[chunk_id]
+                elif free_rows:
+                    row: int = free_rows.pop()
+                else:
+                    row: int = len(self.row_ids)
+
+                self.set_row(row, chunk_id)
+                chunk_rows.append(row)
+
+            write_rows(self.VECTORS_PATH, chunk_rows, vectors)
+
+            if self.QUANTIZATION == "int8":
+                codes, scales = quantize(vectors, self.QUANTIZED_DIMENSIONS)
+
+                write_rows(self.CODES_PATH, chunk_rows, codes)
+                write_rows(self.SCALES_PATH, chunk_rows, scales)
+
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (chunk_id, row, document, json.dumps(metadata or {}, ensure_ascii=False))
+                        for chunk_id, row, document, metadata in zip(ids, chunk_rows, documents, metadatas)
+                    ]
+                )
+
+            self.alive = np.array([chunk_id is not None for chunk_id in self.row_ids], dtype=bool)
+            self.unmap()
+
+    def delete(self, ids: list[str]):
+        """
+        Remove the given chunks from the store. Their rows are reused by the next chunks added.
+
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        """
+
+        with self.lock:
+            ids = [chunk_id for chunk_id in ids if chunk_id in self.rows]
+
+            if len(ids) == 0:
+                return
+
+            for chunk_id in ids:
+                row: int = self.rows.pop(chunk_id)
+                self.row_ids[row] = None
+                self.alive[row] = False
+
+            with self.connection:
+                self.connection.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def clear(self):
+        """
+        Remove every chunk from the store.
+        """
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute("DELETE FROM chunks")
+                self.connection.execute("DELETE FROM settings WHERE key = 'dimensions'")
+
+            self.unmap()
+
+            for path in (self.VECTORS_PATH, self.CODES_PATH, self.SCALES_PATH):
+                open(path, "wb").close()
+
+            self.dimensions = None
+            self.row_ids = []
+            self.rows = {}
+            self.alive = np.zeros(0, dtype=bool)
+
+    def query(self, query_embeddings: list[list[float]], n_results: int = 4, where: dict | None = None, include: list[str] | None = None) -> dict:
+        """
+        Get the chunks nearest to each of the given query embeddings.
+
+        :param query_embeddings: The embeddings of the queries.
+        :type query_embeddings: list[list[float]]
+        :param n_results: The number of chunks to return per query.
+        :type n_results: int
+        :param where: The metadata filter of the chunks, in the `where` syntax of Chroma, or None to search every chunk.
+        :type where: dict | None
+        :param include: What to return besides the IDs: "documents", "metadatas", "distances" and/or "embeddings". Defaults to the documents, metadatas and distances.
+        :type include: list[str] | None
+        :return: The "ids" of the chunks and the included fields, as one list per query, from nearest to farthest.
+        :rtype: dict
+        """
+
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        results: dict[str, list] = {"ids": [], **{field: [] for field in include}}
+
+        with self.lock:
+            rows_to_search: np.ndarray | None = None
+
+            if where:
+                where_sql, where_parameters = where_to_sql(where)
+                rows_to_search = np.array(sorted(row for row, in self.connection.execute(f"SELECT row FROM chunks WHERE {where_sql}", where_parameters)), dtype=np.int64)
+
+            for query_embedding in query_embeddings:
+                rows, scores = self.search(np.asarray(query_embedding, dtype=np.float32), n_results, rows_to_search)
+
+                chunks: dict = self.get([self.row_ids[row] for row in rows], include=[field for field in include if field != "distances"])
+
+                for field, values in chunks.items():
+                    results[field].append(values)
+
+                if "distances" in include:
+                    results["distances"].append([float(1 - score) for score in scores])
+
+        return results
+
+    def search(self, query_embedding: np.ndarray, k: int, rows: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the rows of the chunks nearest to the given query embedding. The lock must be held by the caller.
+
+        :param query_embedding: The embedding of the query.
+        :type query_embedding: np.ndarray
+        :param k: The maximum number of rows to return.
+        :type k: int
+        :param rows: The rows to search, sorted, or None to search every chunk.
+        :type rows: np.ndarray | None
+        :return: The rows and their cosine similarities to the query (approximate if the store is quantized and not re-ranked), from nearest to farthest.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+
+        k = min(k, len(self.rows) if rows is None else len(rows))
+
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query_embedding = normalize(query_embedding)
+        reranked: bool = self.QUANTIZATION == "int8" and self.RERANK
+        candidates_count: int = min(k * RERANK_CANDIDATES_FACTOR, len(self.rows) if rows is None else len(rows)) if reranked else k
+
+        if rows is None:
+            candidates, scores = get_top_rows(self.get_scores(query_embedding), self.alive, candidates_count)
+        else:
+            top, scores = get_top_rows(self.get_scores(query_embedding, rows), np.ones(len(rows), dtype=bool), candidates_count)
+            candidates = rows[top]
+
+        if not reranked:
+            return candidates, scores
+
+        # The rows of the candidates are read from the file rather than the memory map, so the float32 matrix does not end up mapped in the memory of the process.
+        candidates = np.sort(candidates)
+        candidate_scores: np.ndarray = read_rows(self.VECTORS_PATH, candidates, self.dimensions) @ query_embedding
+        top: np.ndarray = np.argsort(-candidate_scores)[:k]
+
+        return candidates[top], candidate_scores[top]
+
+    def get_scores(self, query_embedding: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """
+        Score the rows of the matrix that is searched (the float32 matrix, or its int8 copy) against the given query embedding. The lock must be held by the caller.
+
+        :param query_embedding: The normalized embedding of the query.
+        :type query_embedding: np.ndarray
+        :param rows: The rows to score, or None to score every row.
+        :type rows: np.ndarray | None
+        :return: The cosine similarity of each row, approximate if the matrix is quantized.
+        :rtype: np.ndarray
+        """
+
+        if self.QUANTIZATION == "float32":
+            vectors: np.ndarray = self.get_vectors()
+
+            return (vectors if rows is None else vectors[rows]) @ query_embedding
+
+        codes, scales = self.get_codes()
+
+        if rows is not None:
+            codes, scales = codes[rows], scales[rows]
+
+        query_codes_embedding: np.ndarray = normalize(query_embedding[:codes.shape[1]])
+        scores: np.ndarray = np.empty(len(codes), dtype=np.float32)
+
+        for start in range(0, len(codes), SEARCH_BLOCK_ROWS):
+            scores[start:start + SEARCH_BLOCK_ROWS] = codes[start:start + SEARCH_BLOCK_ROWS].astype(np.float32) @ query_codes_embedding
+
+        return scores * scales
+
+    def requantize(self):
+        """
+        Rebuild the int8 copy of the matrix from the float32 matrix with the quantization of the store, and save the quantization. The lock must be held by the caller.
+        """
+
+        self.unmap()
+
+        with open(self.CODES_PATH, "wb") as codes_file, open(self.SCALES_PATH, "wb") as scales_file:
+            if self.QUANTIZATION == "int8" and len(self.row_ids) > 0:
+                vectors: np.ndarray = self.get_vectors()
+
+                for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+                    codes, scales = quantize(np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS]), self.QUANTIZED_DIMENSIONS)
+
+                    codes_file.write(codes.tobytes())
+                    scales_file.write(scales.tobytes())
+
+        self.unmap()
+
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('quantization', ?)", (self.QUANTIZATION,))
+            self.connection.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('quantized_dimensions', ?)", (str(self.QUANTIZED_DIMENSIONS or ""),))
+
+    def get_memory_stats(self) -> dict[str, float]:
+        """
+        Get the memory taken by the matrix that is searched, compared to the full float32 matrix.
+
+        :return: The bytes of the searched matrix and of the float32 matrix, and the fraction of memory saved.
+        :rtype: dict[str, float]
+        """
+
+        with self.lock:
+            float_bytes: int = len(self.row_ids) * (self.dimensions or 0) * 4
+            search_bytes: int = float_bytes
+
+            if self.QUANTIZATION == "int8":
+                search_bytes = os.path.getsize(self.CODES_PATH) + os.path.getsize(self.SCALES_PATH)
+
+            return {
+                "search_matrix_bytes": search_bytes,
+                "float32_matrix_bytes": float_bytes,
+                "saved": round(1 - search_bytes / float_bytes, 3) if float_bytes > 0 else 0.0,
+            }
+
+    def similarity_search(self, query: str, k: int = 4) -> list[Document]:
+        """
+        Get the chunks most similar to the given query.
+
+        :param query: The query.
+        :type query: str
+        :param k: The number of chunks to return.
+        :type k: int
+        :return: The chunks, with their IDs, from most to least similar.
+        :rtype: list[Document]
+        """
+
+        results: dict = self.query([self.embeddings.embed_query(query)], n_results=k, include=["documents", "metadatas"])
+
+        return [
+            Document(id=chunk_id, page_content=content, metadata=metadata)
+            for chunk_id, content, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def get_vectors(self) -> np.ndarray:
+        """
+        Get the matrix of embeddings, memory-mapping it again if it changed. The lock must be held by the caller.
+
+        :return: The matrix, with one row per row of the store (free rows included).
+        :rtype: np.ndarray
+        """
+
+        if self.vectors is None:
+            self.vectors = np.memmap(self.VECTORS_PATH, dtype=np.float32, mode="r", shape=(len(self.row_ids), self.dimensions))
+
+        return self.vectors
+
+    def get_codes(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the int8 copy of the matrix and the scale of each row, memory-mapping them again if they changed. The lock must be held by the caller.
+
+        :return: The quantized matrix and the scales, with one row per row of the store (free rows included).
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+
+        if self.codes is None:
+            rows: int = len(self.row_ids)
+            dimensions: int = min(self.QUANTIZED_DIMENSIONS or self.dimensions, self.dimensions)
+
+            self.codes = np.memmap(self.CODES_PATH, dtype=np.int8, mode="r", shape=(rows, dimensions))
+            self.scales = np.memmap(self.SCALES_PATH, dtype=np.float32, mode="r", shape=(rows,))
+
+        return self.codes, self.scales
+
+    def unmap(self):
+        """
+        Drop the memory maps of the matrices, so they are mapped again after they change. The lock must be held by the caller.
+        """
+
+        self.vectors = None
+        self.codes = None
+        self.scales = None
+
+    def get_results(self, rows: list[tuple], include: list[str]) -> dict:
+        """
+        Build the results of `get` from the given database rows. The lock must be held by the caller.
+
+        :param rows: The ID, row, document and metadata of each chunk.
+        :type rows: list[tuple]
+        :param include: The fields to include besides the IDs.
+        :type include: list[str]
+        :return: The "ids" of the chunks and the included fields.
+        :rtype: dict
+        """
+
+        results: dict[str, list] = {"ids": [row[0] for row in rows]}
+
+        if "documents" in include:
+            results["documents"] = [row[2] for row in rows]
+
+        if "metadatas" in include:
+            results["metadatas"] = [json.loads(row[3]) for row in rows]
+
+        if "embeddings" in include:
+            results["embeddings"] = [self.get_vectors()[row[1]].tolist() for row in rows]
+
+        return results
+
+    def set_row(self, row: int, chunk_id: str):
+        """
+        Assign the given row of the matrix to the given chunk. The lock must be held by the caller.
+
+        :param row: The row.
+        :type row: int
+        :param chunk_id: The ID of the chunk.
+        :type chunk_id: str
+        """
+
+        if row >= len(self.row_ids):
+            self.row_ids += [None] * (row + 1 - len(self.row_ids))
+
+        self.row_ids[row] = chunk_id
+        self.rows[chunk_id] = row
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+
+        with self.lock:
+            self.unmap()
+            self.connection.close()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale the given vectors to unit length, so their dot products are cosine similarities.
+
+    :param vectors: A vector, or a matrix with one vector per row.
+    :type vectors: np.ndarray
+    :return: The normalized vectors. Zero vectors are left as they are.
+    :rtype: np.ndarray
+    """
+
+    norms: np.ndarray = np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+    return vectors / np.where(norms > 0, norms, 1).astype(vectors.dtype)
+
+
+def where_to_sql(where: dict) -> tuple[str, list]:
+    """
+    Translate a metadata filter in the `where` syntax of Chroma to a SQL condition on the metadata column.
+
+    The supported operators are $and, $or, $eq, $ne, $gt, $gte, $lt, $lte, $in and $nin. A key with a plain value is an equality.
+
+    :param where: The filter.
+    :type where: dict
+    :return: The SQL condition and its parameters.
+    :rtype: tuple[str, list]
+    :raises ValueError: If the filter uses an unsupported operator.
+    """
+
+    conditions: list[str] = []
+    parameters: list = []
+
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            clauses: list[tuple[str, list]] = [where_to_sql(clause) for clause in value]
+            conditions.append("(" + f" {key[1:].upper()} ".join(clause for clause, _ in clauses) + ")")
+            parameters += [parameter for _, clause_parameters in clauses for parameter in clause_parameters]
+            continue
+
+        operations: dict = value if isinstance(value, dict) else {"$eq": value}
+
+        for operator, operand in operations.items():
+            if operator in WHERE_OPERATORS:
+                conditions.append(f"json_extract(metadata, ?) {WHERE_OPERATORS[operator]} ?")
+                parameters += [f"$.{key}", operand]
+            elif operator in ("$in", "$nin"):
+                negation: str = "NOT " if operator == "$nin" else ""
+                conditions.append(f"json_extract(metadata, ?) {negation}IN ({', '.join('?' * len(operand))})")
+                parameters += [f"$.{key}", *operand]
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+
+    return "(" + " AND ".join(conditions) + ")" if conditions else "1", parameters
+
+
+def quantize(vectors: np.ndarray, dimensions: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize the given vectors to int8, each with its own scale.
+
+    :param vectors: The normalized vectors, one per row.
+    :type vectors: np.ndarray
+    :param dimensions: The number of leading dimensions to keep, or None to keep them all. The truncated vectors are normalized again.
+    :type dimensions: int | None
+    :return: The int8 codes and the scale of each vector, so each vector is approximately its codes times its scale.
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    vectors = normalize(vectors[:, :dimensions])
+    scales: np.ndarray = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+
+    codes: np.ndarray = np.rint(vectors / scales[:, None]).astype(np.int8)
+
+    return codes, scales.astype(np.float32)
+
+
+def get_top_rows(scores: np.ndarray, alive: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Get the rows with the highest scores among the rows that hold a chunk.
+
+    :param scores: The score of each row. It is modified.
+    :type scores: np.ndarray
+    :param alive: Which rows hold a chunk.
+    :type alive: np.ndarray
+    :param k: The number of rows to return, at most the number of rows that hold a chunk.
+    :type k: int
+    :return: The rows and their scores, from highest to lowest.
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    if not alive.all():
+        scores[~alive] = -np.inf
+
+    rows: np.ndarray = np.argpartition(-scores, k - 1)[:k]
+    rows = rows[np.argsort(-scores[rows])]
+
+    return rows, scores[rows]
+
+
+def read_rows(path: str, rows: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Read the given rows of a raw float32 matrix file.
+
+    :param path: The path of the file.
+    :type path: str
+    :param rows: The rows to read.
+    :type rows: np.ndarray
+    :param dimensions: The number of columns of the matrix.
+    :type dimensions: int
+    :return: The rows, in the given order.
+    :rtype: np.ndarray
+    """
+
+    values: np.ndarray = np.empty((len(rows), dimensions), dtype=np.float32)
+
+    with open(path, "rb") as file:
+        for index, row in enumerate(rows):
+            file.seek(int(row) * dimensions * 4)
+            file.readinto(values[index])
+
+    return values
+
+
+def write_rows(path: str, rows: list[int], values: np.ndarray):
+    """
+    Write the given rows of a raw matrix file.
+
+    :param path: The path of the file.
+    :type path: str
+    :param rows: The rows to write.
+    :type rows: list[int]
+    :param values: The values of the rows, one row per row.
+    :type values: np.ndarray
+    """
+
+    row_size: int = values[0].nbytes
+
+    with open(path, "r+b") as file:
+        for row, value in zip(rows, values):
+            file.seek(row * row_size)
+            file.write(value.tobytes())
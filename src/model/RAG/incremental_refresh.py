@@ -0,0 +1,389 @@
+from colorama import Fore
+from langchain.schema import Document
+from requests import Response
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Callable
+
+from model.RAG.article_documents import DOCUMENT_FORMAT, article_to_document
+from model.RAG.embedding_scheduler import DEFAULT_MAX_BATCH_TOKENS
+from model.RAG.rag import RAG
+from model.RAG.manifest import KnowledgeBaseManifest
+from model.pipeline.pipeline import BatchPipelineStage, Pipeline, PipelineStage
+from model.web_scraper.article_store import ArticleStore, ARTICLE_STORE_FILE_NAME, canonicalize_url
+from model.web_scraper.crawl_frontier import CrawlFrontier, FRONTIER_FILE_NAME
+from model.web_scraper.prompt_compactor import count_tokens
+from model.web_scraper.response_cache import ResponseCache
+from model.web_scraper.scrape_metrics import ScrapeMetrics, measure
+from model.web_scraper.web_scraper import PROMPT_TOKEN_BUDGET, is_data_path, load_urls, fetch_page, parse_page, extract_from_parsed_page, get_extraction_stats, get_prompt_stats
+
+MANIFEST_FILE_NAME: str = "manifest.json"
+
+# The new chunks of several articles are embedded together, in batches of about the tokens of a request of the embedding scheduler.
+EMBED_BATCH_TOKENS: int = DEFAULT_MAX_BATCH_TOKENS
+
+
+def refresh_knowledge_base(rag: RAG, data_path: str, urls_path: str | list[str], cache: ResponseCache | None = None, rebuild: bool = False, retry: bool = True, max_workers: int = 8, queue_size: int = 16, parse_workers: int = 0, metrics: ScrapeMetrics | None = None, include_crawled: bool = True) -> dict:
+    """
+    Refresh the knowledge base incrementally.
+
+    Only the articles that are new or whose content changed since the last refresh are extracted and embedded again. The chunks of the articles whose URL is no longer in the list are deleted. The pages visited by the crawler (see `crawl_pages`) are refreshed along with the list, so they are indexed, kept up to date and downloaded again by a rebuild. The state of the knowledge base is kept in a manifest saved next to the Chroma database.
+
+    The changes are not written to the version of the index being queried, but to a copy of it (see `RAG.stage_index`), which is checked against the manifest and activated when the refresh ends. The models querying the knowledge base switch to it on their next query. If nothing changed, or the refresh fails, the copy is deleted and the active version is left as it was. The refreshes of the same index, in this or another process, run one at a time (see `IndexVersions.lock_updates`), and each one starts from the version activated by the previous one, even if `rag` has not switched to it yet.
+
+    The articles go through a streaming pipeline (fetch, clean, extract, chunk, embed and upsert), so the first articles are embedded while the rest are still being scraped, and the bounded queues between stages keep the memory use independent of the number of URLs. The new chunks of consecutive articles are embedded together, in batches of about `EMBED_BATCH_TOKENS` tokens, so the embedding requests are full and run concurrently.
+
+    The extracted articles are saved in the article store of the data path, and the validators of their pages in the response cache, once the version is published, so an article that fails to be embedded or indexed is downloaded and extracted again on the next refresh. The store is shared with the running sessions, so it is only changed once the version is published, in a single transaction: if the refresh fails, it keeps the articles of the active version. If there is no manifest yet, or `rebuild` is True, the knowledge base is built from scratch: the staged collection starts empty, and the stored articles are replaced once the version is published.
+
+    :param rag: The RAG model whose database is refreshed. It is not modified: it switches to the new version on its next query.
+    :type rag: RAG
+    :param data_path: The path to save the extracted data.
+    :type data_path: str
+    :param urls_path: The path to the file containing the URLs or a list with the urls.
+    :type urls_path: str | list[str]
+    :param cache: The response cache used to revalidate the pages. If None, every page is downloaded.
+    :type cache: ResponseCache | None
+    :param rebuild: Whether to rebuild the knowledge base from scratch.
+    :type rebuild: bool
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param max_workers: The number of workers of the network-bound stages (fetch and extract).
+    :type max_workers: int
+    :param queue_size: The maximum number of articles waiting between two stages.
+    :type queue_size: int
+    :param parse_workers: The number of processes used to parse and clean the pages. If 0, they are parsed in two threads, which only use one core.
+    :type parse_workers: int
+    :param metrics: The metrics where the duration of each stage, and the counters, of every URL are recorded.
+    :type metrics: ScrapeMetrics | None
+    :param include_crawled: Whether to refresh the pages visited by the crawler too, from the frontier of the data path.
+    :type include_crawled: bool
+    :return: The summary of the refresh, with the added, updated, unchanged and removed URLs, the failed URLs mapped to their error message, the throughput of each stage and the published version of the index (None if nothing changed).
+    :rtype: dict
+    """
+
+    is_data_path(data_path)
+
+    SOURCE_URLS: list[str] = load_urls(urls_path) if isinstance(urls_path, str) else urls_path
+    SOURCE_URLS = list(dict.fromkeys(url for url in SOURCE_URLS if url))
+
+    if include_crawled:
+        SOURCE_URLS += load_crawled_urls(data_path, SOURCE_URLS)
+
+    # Another refresh may activate a version while this one waits, so the active version is read once the lock is held.
+    with rag.index_versions.lock_updates():
+        current_path: str | None = rag.index_versions.get_current_path()
+        rebuild = rebuild or current_path is None or not os.path.exists(os.path.join(current_path, MANIFEST_FILE_NAME))
+
+        staged_rag: RAG = rag.stage_index(copy_current=not rebuild)
+        manifest: KnowledgeBaseManifest = KnowledgeBaseManifest(os.path.join(staged_rag.index_path, MANIFEST_FILE_NAME))
+        store: ArticleStore = ArticleStore(os.path.join(data_path, ARTICLE_STORE_FILE_NAME))
+
+        if rebuild:
+            reset_knowledge_base(staged_rag, manifest)
+            cache = None
+
+        summary: dict = {
+            "added": [],
+            "updated": [],
+            "unchanged": [],
+            "removed": [],
+            "failed": {},
+            "stages": [],
+            "version": None,
+        }
+
+        summary_lock: threading.Lock = threading.Lock()
+        indexed_articles: list[dict] = []
+        stored_articles: list[tuple[str, dict, str]] = []
+        parse_pool: ProcessPoolExecutor | None = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+
+        def mark_unchanged(article: dict):
+            with summary_lock:
+                summary["unchanged"].append(article["url"])
+
+        def fetch(article: dict) -> dict | None:
+            # An article indexed with an older document format must be indexed again, even if its page did not change.
+            response: Response = fetch_page(article["url"], cache if is_current(article["entry"]) else None)
+
+            if response.status_code == 304:
+                mark_unchanged(article)
+                return None
+
+            if article["metrics"] is not None:
+                article["metrics"].add("bytes_downloaded", len(response.content))
+
+            article["page_content"] = response.text
+            article["headers"] = response.headers
+
+            return article
+
+        def clean(article: dict) -> dict | None:
+            measure_prompt: bool = article["metrics"] is not None
+
+            if parse_pool is not None:
+                article["parsed_page"] = parse_pool.submit(parse_page, article.pop("page_content"), PROMPT_TOKEN_BUDGET, measure_prompt).result()
+            else:
+                article["parsed_page"] = parse_page(article.pop("page_content"), PROMPT_TOKEN_BUDGET, measure_prompt)
+
+            entry: dict | None = article["entry"]
+
+            if entry is not None and entry["content_hash"] == article["parsed_page"]["content_hash"] and not is_current(entry):
+                # The article did not change, but it is indexed with an older document format: index the stored data again, without extracting it.
+                stored_article: dict | None = store.get(article["url"])
+
+                if stored_article is not None:
+                    article["data"] = stored_article["data"]
+                    article["content_hash"] = article.pop("parsed_page")["content_hash"]
+
+                    return article
+
+            if is_current(entry) and entry["content_hash"] == article["parsed_page"]["content_hash"]:
+                # The page changed, but not its article. Keep the new validators so the next refresh gets a 304.
+                stored_article: dict | None = store.get(article["url"]) if cache is not None else None
+
+                if stored_article is not None:
+                    save_validators(cache, article, stored_article["data"])
+
+                mark_unchanged(article)
+                return None
+
+            return article
+
+        def extract(article: dict) -> dict:
+            if "data" in article:
+                return article
+
+            parsed_page: dict = article.pop("parsed_page")
+
+            article["data"] = extract_from_parsed_page(parsed_page, retry, article["metrics"])
+            article["content_hash"] = parsed_page["content_hash"]
+
+            return article
+
+        def chunk(article: dict) -> dict:
+            document: Document = article_to_document(article["data"], article["url"])
+
+            chunks: list[Document] = staged_rag.split_documents([document])
+            article["chunk_ids"] = staged_rag.get_chunk_ids(chunks)
+
+            # The chunk IDs include the hash of their content, so the chunks that did not change are already embedded.
+            existing_ids: set[str] = staged_rag.get_existing_ids(article["chunk_ids"])
+            article["new_chunks"] = {
+                chunk_id: chunk for chunk_id, chunk in zip(article["chunk_ids"], chunks) if chunk_id not in existing_ids
+            }
+            article["new_tokens"] = sum(count_tokens(chunk.page_content) for chunk in article["new_chunks"].values())
+
+            return article
+
+        def embed(articles: list[dict]) -> list[dict]:
+            # The new chunks of the whole batch are embedded in one call, which the scheduler splits into concurrent requests.
+            with ExitStack() as stack:
+                for article in articles:
+                    stack.enter_context(measure(article["metrics"], "embed"))
+
+                embeddings: list[list[float]] = staged_rag.embed_chunks([chunk for article in articles for chunk in article["new_chunks"].values()])
+
+            start: int = 0
+
+            for article in articles:
+                end: int = start + len(article["new_chunks"])
+                article["embeddings"] = embeddings[start:end]
+                start = end
+
+            return articles
+
+        def upsert(article: dict) -> dict:
+            url: str = article["url"]
+            entry: dict | None = article["entry"]
+
+            if entry is not None:
+                staged_rag.delete_chunks([chunk_id for chunk_id in entry["chunk_ids"] if chunk_id not in article["chunk_ids"]])
+
+            staged_rag.upsert_embedded_chunks(list(article["new_chunks"].values()), list(article["new_chunks"].keys()), article["embeddings"])
+            manifest.set(url, article["content_hash"], article["chunk_ids"], DOCUMENT_FORMAT)
+            data: dict = article.pop("data")
+
+            # The article and the validators are saved once the version is published: with them, the next refresh gets a 304 and keeps the indexed article.
+            with summary_lock:
+                stored_articles.append((url, data, article["content_hash"]))
+
+                if cache is not None:
+                    indexed_articles.append({"url": url, "headers": article["headers"], "data": data})
+
+                summary["updated" if entry is not None else "added"].append(url)
+
+            print(Fore.MAGENTA, f"Datos de {url} indexados correctamente ({len(article['chunk_ids'])} fragmentos).")
+
+            return article
+
+        def on_error(article: dict, stage: PipelineStage, error: Exception):
+            with summary_lock:
+                summary["failed"][article["url"]] = str(error)
+
+            if article["metrics"] is not None:
+                article["metrics"].set_error(error)
+
+            print(Fore.RED, f"\nError al procesar {article['url']} ({stage.NAME}): {error}")
+
+        def measured(stage: str, function: Callable[[dict], dict | None]) -> Callable[[dict], dict | None]:
+            def measured_function(article: dict) -> dict | None:
+                with measure(article["metrics"], stage):
+                    return function(article)
+
+            return measured_function
+
+        pipeline: Pipeline = Pipeline(
+            [
+                PipelineStage("fetch", measured("fetch", fetch), workers=max_workers),
+                PipelineStage("clean", measured("clean", clean), workers=max(parse_workers, 2)),
+                PipelineStage("extract", measured("extract", extract), workers=max_workers),
+                PipelineStage("chunk", measured("chunk", chunk)),
+                BatchPipelineStage("embed", embed, workers=2, max_batch_weight=EMBED_BATCH_TOKENS, get_weight=lambda article: article["new_tokens"]),
+                PipelineStage("upsert", measured("upsert", upsert)),
+            ],
+            queue_size=queue_size,
+            on_error=on_error,
+        )
+
+        try:
+            pipeline.run(
+                {"url": url, "entry": manifest.get(url), "metrics": metrics.get_record(url) if metrics is not None else None}
+                for url in SOURCE_URLS
+            )
+
+            for url in set(manifest.get_urls()) - set(SOURCE_URLS):
+                entry: dict = manifest.remove(url)
+
+                staged_rag.delete_source(url)
+
+                summary["removed"].append(url)
+                print(Fore.YELLOW, f"Datos de {url} eliminados de la base de conocimiento.")
+
+            if rebuild or summary["added"] or summary["updated"] or summary["removed"]:
+                manifest.save()
+                staged_rag.publish_index([chunk_id for url in manifest.get_urls() for chunk_id in manifest.get(url)["chunk_ids"]])
+                summary["version"] = os.path.basename(staged_rag.index_path)
+
+                print(Fore.CYAN, f"Versión {summary['version']} del índice activada.")
+
+                store.apply_changes(stored_articles, summary["removed"], clear=rebuild)
+
+                if rebuild:
+                    remove_json_files(data_path)
+
+                for article in indexed_articles:
+                    save_validators(cache, article, article["data"])
+            else:
+                staged_rag.discard_index()
+
+        except Exception:
+            staged_rag.discard_index()
+            raise
+
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown()
+
+            staged_rag.close_index()
+            store.close()
+
+    summary["stages"] = pipeline.get_stats()
+
+    print(Fore.CYAN, f"Rutas de extracción: {get_extraction_stats()}")
+    print(Fore.CYAN, f"Tokens de entrada del prompt de extracción: {get_prompt_stats()}")
+    print(Fore.CYAN, f"Caché de embeddings: {staged_rag.get_embedding_stats()}")
+
+    for stage_stats in summary["stages"]:
+        print(Fore.CYAN, f"Etapa {stage_stats['stage']}: {stage_stats}")
+
+    return summary
+
+
+def load_crawled_urls(data_path: str, source_urls: list[str]) -> list[str]:
+    """
+    Load the URLs of the pages visited by the crawler that are not in the given list.
+
+    :param data_path: The path of the extracted data, where the frontier of the crawler is saved.
+    :type data_path: str
+    :param source_urls: The URLs of the list.
+    :type source_urls: list[str]
+    :return: The visited URLs, in their canonical form, that are not in the list in any form.
+    :rtype: list[str]
+    """
+
+    frontier_path: str = os.path.join(data_path, FRONTIER_FILE_NAME)
+
+    if not os.path.exists(frontier_path):
+        return []
+
+    frontier: CrawlFrontier = CrawlFrontier(frontier_path)
+
+    try:
+        crawled_urls: list[str] = frontier.get_urls("visited")
+    finally:
+        frontier.close()
+
+    listed_urls: set[str] = {canonicalize_url(url) for url in source_urls}
+
+    return [url for url in crawled_urls if url not in listed_urls]
+
+
+def is_current(entry: dict | None) -> bool:
+    """
+    Check if the given manifest entry was indexed with the current document format.
+
+    :param entry: The manifest entry, or None if the URL is not indexed.
+    :type entry: dict | None
+    :return: True if the entry exists and its document format is the current one, False otherwise.
+    :rtype: bool
+    """
+
+    return entry is not None and entry.get("document_format") == DOCUMENT_FORMAT
+
+
+def save_validators(cache: ResponseCache, article: dict, data: dict):
+    """
+    Save the validators of the response of the given article in the response cache.
+
+    :param cache: The response cache.
+    :type cache: ResponseCache
+    :param article: The article being processed, with its url and response headers.
+    :type article: dict
+    :param data: The extracted data of the article.
+    :type data: dict
+    """
+
+    cache.save(article["url"], article["headers"].get("ETag"), article["headers"].get("Last-Modified"), data)
+
+
+def reset_knowledge_base(rag: RAG, manifest: KnowledgeBaseManifest):
+    """
+    Remove everything from the staged version of the knowledge base: the Chroma collection and the manifest entries.
+
+    :param rag: The staged RAG model whose database is cleared.
+    :type rag: RAG
+    :param manifest: The manifest of the staged version.
+    :type manifest: KnowledgeBaseManifest
+    """
+
+    rag.clear_db()
+    manifest.clear()
+
+
+def remove_json_files(data_path: str):
+    """
+    Remove the JSON files left in the data path by older versions, which kept each extracted article in its own file.
+
+    :param data_path: The path where the extracted data is saved.
+    :type data_path: str
+    """
+
+    for file in os.listdir(data_path):
+        file_path: str = os.path.join(data_path, file)
+
+        if os.path.isfile(file_path) and file.endswith(".json"):
+            os.remove(file_path)
+
@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+CURRENT_VERSION_FILE_NAME: str = "current_version.json"
+VERSIONS_DIR_NAME: str = "versions"
+UPDATE_LOCK_FILE_NAME: str = "update.lock"
+
+# The entries of the root directory that belong to the versions, and not to an index built before them.
+VERSIONING_ENTRIES: tuple[str, ...] = (VERSIONS_DIR_NAME, CURRENT_VERSION_FILE_NAME, UPDATE_LOCK_FILE_NAME)
+
+# A version newer than the active one, and not used by this process, is a build left by a process that stopped.
+STALE_BUILD_SECONDS: float = 24 * 3600
+
+# The version used by each open RAG model of this process, so it is not garbage collected under it.
+version_users: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+version_users_lock: threading.Lock = threading.Lock()
+
+
+class IndexVersions:
+    """
+    IndexVersions keeps the versions of the index (vector store, lexical index and manifest) of the knowledge base, each in its own directory, and which one is active.
+
+    A new version is built next to the active one, which is never written while it is being queried. Once the new version is complete and checked, it is activated by replacing the file that names the active version, which is atomic, so a reader always opens a complete version: the old one or the new one. The versions that are not active are deleted, unless they are in use by a RAG model of this process or are among the `keep_versions` previous ones.
+
+    An index built before the versions existed, directly in the root directory, is used as the active version until the first new version is activated.
+
+    The builds of new versions are serialized with `lock_updates`, so each one starts from the version activated by the previous one.
+    """
+
+    def __init__(self, root_path: str, keep_versions: int = 1):
+        self.ROOT_PATH: str = root_path
+        self.VERSIONS_PATH: str = os.path.join(root_path, VERSIONS_DIR_NAME)
+        self.CURRENT_VERSION_PATH: str = os.path.join(root_path, CURRENT_VERSION_FILE_NAME)
+        self.UPDATE_LOCK_PATH: str = os.path.join(root_path, UPDATE_LOCK_FILE_NAME)
+        self.KEEP_VERSIONS: int = keep_versions
+
+        self.current: tuple[int, str | None] | None = None
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_current_path(self) -> str | None:
+        """
+        Get the directory of the active version.
+
+        The file that names the active version is only read again when it changes, so this can be called before every query.
+
+        :return: The directory, the root directory for an index built before the versions existed, or None if there is no index yet.
+        :rtype: str | None
+        """
+
+        try:
+            modified: int = os.stat(self.CURRENT_VERSION_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return self.ROOT_PATH if self.has_legacy_index() else None
+
+        with self.lock:
+            if self.current is None or self.current[0] != modified:
+                with open(self.CURRENT_VERSION_PATH, "r", encoding="utf-8") as file:
+                    self.current = (modified, os.path.join(self.VERSIONS_PATH, json.load(file)["version"]))
+
+            return self.current[1]
+
+    def has_legacy_index(self) -> bool:
+        """
+        Check if there is an index built before the versions existed in the root directory.
+
+        :return: True if the root directory has files other than the versions, False otherwise.
+        :rtype: bool
+        """
+
+        return os.path.isdir(self.ROOT_PATH) and any(
+            entry not in VERSIONING_ENTRIES for entry in os.listdir(self.ROOT_PATH)
+        )
+
+    @contextmanager
+    def lock_updates(self) -> Iterator[None]:
+        """
+        Hold the update lock of the index while the block runs, waiting for it if a build or a refresh of this or another process holds it.
+
+        The lock is a lock on a file of the root directory, so the operating system releases it if the process stops.
+
+        :return: A context manager that holds the lock.
+        :rtype: Iterator[None]
+        """
+
+        os.makedirs(self.ROOT_PATH, exist_ok=True)
+
+        with open(self.UPDATE_LOCK_PATH, "a+b") as file:
+            lock_file(file)
+
+            try:
+                yield
+            finally:
+                unlock_file(file)
+
+    def create_version(self, copy_from: str | None = None) -> str:
+        """
+        Create the directory of a new version, which is not active until it is activated.
+
+        :param copy_from: The directory of the version to start from, usually the active one, or None to start from an empty index.
+        :type copy_from: str | None
+        :return: The directory of the new version. Its name starts with its creation time, so the versions sort from oldest to newest.
+        :rtype: str
+        """
+
+        now: int = time.time_ns()
+        version_path: str = os.path.join(
+            self.VERSIONS_PATH, f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 10**9))}-{now % 10**9:09d}-{uuid.uuid4().hex[:4]}"
+        )
+
+        if copy_from is not None and os.path.isdir(copy_from):
+            shutil.copytree(copy_from, version_path, ignore=shutil.ignore_patterns(*VERSIONING_ENTRIES))
+        else:
+            os.makedirs(version_path)
+
+        return version_path
+
+    def activate(self, version_path: str):
+        """
+        Make the given version the active one.
+
+        :param version_path: The directory of the version, created with `create_version`.
+        :type version_path: str
+        """
+
+        tmp_path: str = f"{self.CURRENT_VERSION_PATH}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": os.path.basename(version_path), "activated_at": time.time()}, file, indent=4)
+
+        os.replace(tmp_path, self.CURRENT_VERSION_PATH)
+
+    def use(self, user: object, version_path: str | None):
+        """
+        Register the version used by the given RAG model, so it is not garbage collected while the model uses it. The registration ends when the model is deleted.
+
+        :param user: The RAG model.
+        :type user: object
+        :param version_path: The directory of the version, or None if the model does not use any.
+        :type version_path: str | None
+        """
+
+        with version_users_lock:
+            if version_path is None:
+                version_users.pop(user, None)
+            else:
+                version_users[user] = os.path.abspath(version_path)
+
+    def is_used_by_others(self, user: object, version_path: str) -> bool:
+        """
+        Check if the given version is used by a RAG model of this process other than the given one.
+
+        :param user: The RAG model.
+        :type user: object
+        :param version_path: The directory of the version.
+        :type version_path: str
+        :return: True if another model uses the version, False otherwise.
+        :rtype: bool
+        """
+
+        version_path = os.path.abspath(version_path)
+
+        with version_users_lock:
+            return any(path == version_path for other, path in version_users.items() if other is not user)
+
+    def collect_garbage(self) -> list[str]:
+        """
+        Delete the versions that are no longer needed.
+
+        The active version, the `keep_versions` newest previous versions and the versions in use by a RAG model of this process are kept. So are the versions newer than the active one, which are still being built, unless they are stale.
+
+        :return: The directories deleted.
+        :rtype: list[str]
+        """
+
+        current_path: str | None = self.get_current_path()
+
+        if current_path is None or current_path == self.ROOT_PATH:
+            return []
+
+        with version_users_lock:
+            used_paths: set[str] = set(version_users.values())
+
+        current_name: str = os.path.basename(current_path)
+        names: list[str] = sorted(os.listdir(self.VERSIONS_PATH)) if os.path.isdir(self.VERSIONS_PATH) else []
+        previous_names: list[str] = [name for name in names if name < current_name]
+        kept_names: set[str] = set(previous_names[max(len(previous_names) - self.KEEP_VERSIONS, 0):]) if self.KEEP_VERSIONS > 0 else set()
+        deleted: list[str] = []
+
+        for name in names:
+            version_path: str = os.path.join(self.VERSIONS_PATH, name)
+
+            if name == current_name or name in kept_names or os.path.abspath(version_path) in used_paths:
+                continue
+
+            if name > current_name and time.time() - os.path.getmtime(version_path) < STALE_BUILD_SECONDS:
+                continue
+
+            shutil.rmtree(version_path, ignore_errors=True)
+            deleted.append(version_path)
+
+        # The index built before the versions is older than every version.
+        if self.has_legacy_index() and len(previous_names) >= self.KEEP_VERSIONS and os.path.abspath(self.ROOT_PATH) not in used_paths:
+            for entry in os.listdir(self.ROOT_PATH):
+                if entry in VERSIONING_ENTRIES:
+                    continue
+
+                entry_path: str = os.path.join(self.ROOT_PATH, entry)
+
+                if os.path.isdir(entry_path):
+                    shutil.rmtree(entry_path, ignore_errors=True)
+                else:
+                    os.remove(entry_path)
+
+            deleted.append(self.ROOT_PATH)
+
+        return deleted
+
+    def discard(self, version_path: str):
+        """
+        Delete a version that was not activated, e.g. because its build failed.
+
+        :param version_path: The directory of the version.
+        :type version_path: str
+        """
+
+        shutil.rmtree(version_path, ignore_errors=True)
+
+
+def lock_file(file: BinaryIO):
+    """
+    Take an exclusive lock on the given file, waiting until it is free.
+
+    :param file: The open file.
+    :type file: BinaryIO
+    """
+
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return
+
+    file.seek(0)
+
+    while True:
+        try:
+            # It gives up after trying for 10 seconds.
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def unlock_file(file: BinaryIO):
+    """
+    Release the lock taken with `lock_file`.
+
+    :param file: The open file.
+    :type file: BinaryIO
+    """
+
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        return
+
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
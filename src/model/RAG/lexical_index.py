@@ -0,0 +1,196 @@
+import math
+import os
+import sqlite3
+import threading
+
+from model.RAG.embedding_backends import tokenize
+
+CREATE_TABLE_QUERIES: list[str] = [
+    "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, length INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, chunk_id TEXT NOT NULL, frequency INTEGER NOT NULL, PRIMARY KEY (term, chunk_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS postings_chunk_id ON postings (chunk_id)",
+]
+
+# Standard BM25 parameters: term frequency saturation and length normalization.
+BM25_K1: float = 1.2
+BM25_B: float = 0.75
+
+# The terms of a query that are in more than this share of the chunks are ignored: their BM25 weight is close to 0, and their postings are most of the index.
+MAX_DOCUMENT_FREQUENCY: float = 0.5
+
+# Below this number of chunks the postings are few, and a share of the chunks is too few chunks to tell a common term, so no term is ignored.
+MIN_CHUNKS_FOR_DOCUMENT_FREQUENCY: int = 20
+
+# The most common Spanish and English words, ignored in the queries for the same reason, without counting their postings.
+STOPWORDS: frozenset[str] = frozenset(tokenize(
+    "a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el él ella ellas ellos en entre era es esa esas ese eso esos esta está están estas este esto estos fue fueron ha han hasta hay la las le les lo los más me mi muy no nos o otra otras otro otros para pero poco por porque qué que quien quienes se sea ser si sí sin sobre son su sus también tanto te todo todos tu un una uno unos y ya yo "
+    "an and are as at be by for from has have in is it its of on or that the their this to was were which who will with"
+))
+
+SEARCH_QUERY: str = """
+WITH query_terms (term, idf) AS (VALUES {values})
+SELECT postings.chunk_id, SUM(query_terms.idf * postings.frequency * ? / (postings.frequency + ? * (1 - ? + ? * chunks.length / ?))) AS score
+FROM query_terms
+JOIN postings ON postings.term = query_terms.term
+JOIN chunks ON chunks.id = postings.chunk_id
+GROUP BY postings.chunk_id
+ORDER BY score DESC, postings.chunk_id
+"""
+
+
+class LexicalIndex:
+    """
+    LexicalIndex is an inverted index of the chunks of the knowledge base, saved in a single SQLite file next to the Chroma collection.
+
+    For each term it stores the chunks that contain it and how many times, and for each chunk its length in terms. The chunks are ranked with BM25, which rewards the exact names, places and dates of the query that dense embeddings tend to blur. The terms are lowercase words without accents, as in `tokenize`.
+
+    The stopwords and the terms in most chunks are left out of the queries, and the scores are added up and ranked by SQLite, so a query only reads the postings of its rare terms and returns just the best chunks.
+    """
+
+    def __init__(self, index_path: str):
+        self.INDEX_PATH: str = index_path
+
+        index_dir: str = os.path.dirname(self.INDEX_PATH)
+
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+
+        self.connection: sqlite3.Connection = sqlite3.connect(self.INDEX_PATH, check_same_thread=False)
+        self.lock: threading.Lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+
+            for query in CREATE_TABLE_QUERIES:
+                self.connection.execute(query)
+
+    def add(self, ids: list[str], texts: list[str]):
+        """
+        Index the given chunks, replacing the chunks with the same IDs.
+
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        :param texts: The texts of the chunks.
+        :type texts: list[str]
+        """
+
+        chunk_rows: list[tuple[str, int]] = []
+        posting_rows: list[tuple[str, str, int]] = []
+
+        for chunk_id, text in zip(ids, texts):
+            terms: list[str] = tokenize(text)
+            frequencies: dict[str, int] = {}
+
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+
+            chunk_rows.append((chunk_id, len(terms)))
+            posting_rows += [(term, chunk_id, frequency) for term, frequency in frequencies.items()]
+
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM postings WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+            self.connection.executemany("INSERT OR REPLACE INTO chunks (id, length) VALUES (?, ?)", chunk_rows)
+            self.connection.executemany("INSERT INTO postings (term, chunk_id, frequency) VALUES (?, ?, ?)", posting_rows)
+
+    def delete(self, ids: list[str]):
+        """
+        Remove the given chunks from the index.
+
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        """
+
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM postings WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+            self.connection.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def clear(self):
+        """
+        Remove every chunk from the index.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM postings")
+            self.connection.execute("DELETE FROM chunks")
+
+    def count(self) -> int:
+        """
+        Count the indexed chunks.
+
+        :return: The number of chunks.
+        :rtype: int
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, query: str, k: int = 10, ids: set[str] | None = None) -> list[tuple[str, float]]:
+        """
+        Rank the chunks for the given query with BM25.
+
+        :param query: The query.
+        :type query: str
+        :param k: The maximum number of chunks to return.
+        :type k: int
+        :param ids: The IDs of the chunks to rank, or None to rank every chunk. The statistics of the terms are still those of the whole index.
+        :type ids: set[str] | None
+        :return: The IDs and scores of the best chunks, from best to worst. Chunks that share no term with the query, other than the stopwords and the terms in most chunks (unless every term of the query is), are not returned.
+        :rtype: list[tuple[str, float]]
+        """
+
+        terms: list[str] = [term for term in dict.fromkeys(tokenize(query)) if term not in STOPWORDS]
+
+        if len(terms) == 0:
+            return []
+
+        with self.lock:
+            chunk_count, average_length = self.connection.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+
+            if chunk_count == 0:
+                return []
+
+            document_frequencies: dict[str, int] = {}
+
+            for term in terms:
+                # Counted on the primary key, without reading the postings.
+                document_frequency: int = self.connection.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+
+                if document_frequency > 0:
+                    document_frequencies[term] = document_frequency
+
+            if len(document_frequencies) == 0:
+                return []
+
+            searched_terms: list[str] = [
+                term for term, document_frequency in document_frequencies.items()
+                if chunk_count < MIN_CHUNKS_FOR_DOCUMENT_FREQUENCY or document_frequency <= MAX_DOCUMENT_FREQUENCY * chunk_count
+            ]
+
+            # If every term is common, the rarest one still ranks the chunks.
+            if len(searched_terms) == 0:
+                searched_terms = [min(document_frequencies, key=document_frequencies.get)]
+
+            term_idfs: list[tuple[str, float]] = [
+                (term, math.log(1 + (chunk_count - document_frequencies[term] + 0.5) / (document_frequencies[term] + 0.5)))
+                for term in searched_terms
+            ]
+
+            search_query: str = SEARCH_QUERY.format(values=", ".join("(?, ?)" for _ in term_idfs))
+            parameters: list = [value for term_idf in term_idfs for value in term_idf]
+            parameters += [BM25_K1 + 1, BM25_K1, BM25_B, BM25_B, average_length or 1.0]
+
+            # With a filter, the chunks that pass it are taken from the whole ranking.
+            if ids is None:
+                return self.connection.execute(f"{search_query} LIMIT ?", parameters + [k]).fetchall()
+
+            rows: list[tuple[str, float]] = self.connection.execute(search_query, parameters).fetchall()
+
+        return [row for row in rows if row[0] in ids][:k]
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,106 @@
+import json
+import os
+
+
+class KnowledgeBaseManifest:
+    """
+    KnowledgeBaseManifest keeps track of what is indexed in the knowledge base.
+
+    For each source URL it stores the hash of the article content, the IDs of its chunks in the Chroma collection and the version of the format of its document (see `article_to_document`). The extracted data itself is kept in the article store. It is what allows refreshing the knowledge base incrementally.
+    """
+
+    def __init__(self, manifest_path: str):
+        self.MANIFEST_PATH: str = manifest_path
+        self.entries: dict[str, dict] = {}
+
+        if os.path.exists(self.MANIFEST_PATH):
+            with open(self.MANIFEST_PATH, "r", encoding="utf-8") as file:
+                self.entries = json.load(file)
+
+    def exists(self) -> bool:
+        """
+        Check if the manifest has been saved before.
+
+        :return: True if the manifest file exists, False otherwise.
+        :rtype: bool
+        """
+
+        return os.path.exists(self.MANIFEST_PATH)
+
+    def get(self, url: str) -> dict | None:
+        """
+        Get the entry of the given URL.
+
+        :param url: The source URL.
+        :type url: str
+        :return: The entry, with the keys content_hash, chunk_ids and document_format (missing for the entries of the first format), or None if the URL is not indexed.
+        :rtype: dict | None
+        """
+
+        return self.entries.get(url)
+
+    def set(self, url: str, content_hash: str, chunk_ids: list[str], document_format: int):
+        """
+        Set the entry of the given URL.
+
+        :param url: The source URL.
+        :type url: str
+        :param content_hash: The hash of the article content.
+        :type content_hash: str
+        :param chunk_ids: The IDs of the chunks of the article.
+        :type chunk_ids: list[str]
+        :param document_format: The version of the format of the document of the article.
+        :type document_format: int
+        """
+
+        self.entries[url] = {
+            "content_hash": content_hash,
+            "chunk_ids": chunk_ids,
+            "document_format": document_format,
+        }
+
+    def remove(self, url: str) -> dict | None:
+        """
+        Remove the entry of the given URL.
+
+        :param url: The source URL.
+        :type url: str
+        :return: The removed entry, or None if the URL was not indexed.
+        :rtype: dict | None
+        """
+
+        return self.entries.pop(url, None)
+
+    def get_urls(self) -> list[str]:
+        """
+        Get the indexed URLs.
+
+        :return: The indexed URLs.
+        :rtype: list[str]
+        """
+
+        return list(self.entries.keys())
+
+    def clear(self):
+        """
+        Remove every entry from the manifest.
+        """
+
+        self.entries = {}
+
+    def save(self):
+        """
+        Save the manifest to disk.
+        """
+
+        manifest_dir: str = os.path.dirname(self.MANIFEST_PATH)
+
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+
+        tmp_path: str = f"{self.MANIFEST_PATH}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, indent=4, ensure_ascii=False)
+
+        os.replace(tmp_path, self.MANIFEST_PATH)
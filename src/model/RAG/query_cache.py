@@ -0,0 +1,232 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from model.RAG.embedding_backends import tokenize
+
+# The cache of each knowledge base, shared by every model of this process (see `get_shared_query_cache`).
+shared_caches: dict[str, "QueryCache"] = {}
+shared_caches_lock: threading.Lock = threading.Lock()
+
+
+class QueryCache:
+    """
+    QueryCache remembers the chunks retrieved for recent queries, so a repeated question skips the query embedding and the search.
+
+    The queries are keyed by their normalized text (lowercase words without accents or punctuation), so "¿Qué pasó en Jamundí?" and "que paso en jamundi" are the same query. Optionally, a query with no exact match can reuse the chunks of a cached query whose embedding is similar enough. Only the chunk IDs are stored, and the entries are evicted when they expire (TTL) or when the cache is full (least recently used first). The cache must be cleared whenever the knowledge base changes.
+
+    A cache can be shared by every model that queries the same knowledge base (see `get_shared_query_cache`), so the questions of one user are answered from the cache for the others. The models tell it which version of the index they use, and it is cleared when they switch to another one.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0, similarity_threshold: float | None = None):
+        self.MAX_ENTRIES: int = max_entries
+        self.TTL_SECONDS: float = ttl_seconds
+        self.SIMILARITY_THRESHOLD: float | None = similarity_threshold
+
+        self.entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self.version: str | None = None
+        self.stats: dict[str, float] = {"hits": 0, "semantic_hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def get(self, query: str, scope: str, get_query_embedding: Callable[[], list[float]] | None = None) -> list[str] | None:
+        """
+        Get the chunk IDs cached for the given query.
+
+        :param query: The query.
+        :type query: str
+        :param scope: The retrieval settings the chunks depend on (e.g. the mode and number of results). Only entries with the same scope match.
+        :type scope: str
+        :param get_query_embedding: The function that embeds the query. It is only called to find a similar query, if there is no exact match and a similarity threshold is set.
+        :type get_query_embedding: Callable[[], list[float]] | None
+        :return: The cached chunk IDs, or None if the query is not cached.
+        :rtype: list[str] | None
+        """
+
+        key: tuple[str, str] = (normalize_query(query), scope)
+
+        with self.lock:
+            self.evict_expired()
+            entry: dict | None = self.entries.get(key)
+
+        # Embedding the query may take a request to the embedding backend, so it is done without holding the lock.
+        if entry is None and self.SIMILARITY_THRESHOLD is not None and get_query_embedding is not None:
+            query_embedding: list[float] = get_query_embedding()
+
+            with self.lock:
+                entry = self.find_similar(scope, query_embedding)
+
+                if entry is not None:
+                    self.stats["semantic_hits"] += 1
+
+        with self.lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            if entry["key"] in self.entries:
+                self.entries.move_to_end(entry["key"])
+
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += entry["latency"]
+
+            return list(entry["chunk_ids"])
+
+    def put(self, query: str, scope: str, chunk_ids: list[str], latency: float, query_embedding: list[float] | None = None):
+        """
+        Cache the chunk IDs retrieved for the given query.
+
+        :param query: The query.
+        :type query: str
+        :param scope: The retrieval settings the chunks depend on.
+        :type scope: str
+        :param chunk_ids: The IDs of the retrieved chunks, in order.
+        :type chunk_ids: list[str]
+        :param latency: The time it took to retrieve them, in seconds; it is what each hit saves.
+        :type latency: float
+        :param query_embedding: The embedding of the query, to match similar queries later.
+        :type query_embedding: list[float] | None
+        """
+
+        key: tuple[str, str] = (normalize_query(query), scope)
+
+        with self.lock:
+            self.entries[key] = {
+                "key": key,
+                "chunk_ids": list(chunk_ids),
+                "embedding": query_embedding,
+                "latency": latency,
+                "expires_at": time.monotonic() + self.TTL_SECONDS,
+            }
+
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+    def find_similar(self, scope: str, query_embedding: list[float]) -> dict | None:
+        """
+        Find the cached query of the given scope most similar to the given embedding, if it is above the similarity threshold. The lock must be held by the caller.
+
+        :param scope: The retrieval settings.
+        :type scope: str
+        :param query_embedding: The embedding of the query.
+        :type query_embedding: list[float]
+        :return: The entry of the most similar query, or None if no query is similar enough.
+        :rtype: dict | None
+        """
+
+        best_entry: dict | None = None
+        best_similarity: float = self.SIMILARITY_THRESHOLD
+
+        for (_, entry_scope), entry in self.entries.items():
+            if entry_scope != scope or entry["embedding"] is None:
+                continue
+
+            similarity: float = cosine_similarity(query_embedding, entry["embedding"])
+
+            if similarity >= best_similarity:
+                best_entry, best_similarity = entry, similarity
+
+        return best_entry
+
+    def evict_expired(self):
+        """
+        Remove the expired entries. The lock must be held by the caller.
+        """
+
+        now: float = time.monotonic()
+
+        for key in [key for key, entry in self.entries.items() if entry["expires_at"] <= now]:
+            del self.entries[key]
+
+    def set_version(self, version: str | None):
+        """
+        Set the version of the index whose chunks are cached, removing every entry if it is another one.
+
+        :param version: The version, e.g. the directory of the index, or None if there is no index yet.
+        :type version: str | None
+        """
+
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+    def clear(self):
+        """
+        Remove every entry, e.g. because the knowledge base changed.
+        """
+
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> dict[str, float]:
+        """
+        Get the hits, misses and saved time of the cache since it was created.
+
+        :return: The hits (semantic hits included), semantic hits, misses, hit rate, seconds of retrieval saved and current entries.
+        :rtype: dict[str, float]
+        """
+
+        with self.lock:
+            lookups: float = self.stats["hits"] + self.stats["misses"]
+
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups > 0 else 0.0,
+                "saved_seconds": round(self.stats["saved_seconds"], 3),
+                "entries": len(self.entries),
+            }
+
+
+def get_shared_query_cache(index_root: str) -> QueryCache:
+    """
+    Get the query cache of the knowledge base with the given index directory, shared by every model of this process, creating it on the first call.
+
+    :param index_root: The root directory of the index (the Chroma path of the model).
+    :type index_root: str
+    :return: The shared query cache.
+    :rtype: QueryCache
+    """
+
+    key: str = os.path.abspath(index_root)
+
+    with shared_caches_lock:
+        if key not in shared_caches:
+            shared_caches[key] = QueryCache()
+
+        return shared_caches[key]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize the given query, so the same question written differently gets the same key.
+
+    :param query: The query.
+    :type query: str
+    :return: The lowercase words of the query, without accents or punctuation, separated by spaces.
+    :rtype: str
+    """
+
+    return " ".join(tokenize(query))
+
+
+def cosine_similarity(first: list[float], second: list[float]) -> float:
+    """
+    Get the cosine similarity of two vectors.
+
+    :param first: The first vector.
+    :type first: list[float]
+    :param second: The second vector.
+    :type second: list[float]
+    :return: The cosine similarity, or 0 if any vector is zero.
+    :rtype: float
+    """
+
+    norms: float = math.sqrt(sum(value * value for value in first)) * math.sqrt(sum(value * value for value in second))
+
+    return sum(a * b for a, b in zip(first, second)) / norms if norms > 0 else 0.0
@@ -1,25 +1,91 @@
 import os
+import copy
 import json
+import hashlib
+import time
+from datetime import date
+from typing import Iterable, Iterator
 
 import unstructured
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
+from langchain_core.embeddings import Embeddings
 from langchain.prompts import ChatPromptTemplate
 from langchain_community.document_loaders import DirectoryLoader
 from langchain_chroma import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from chromadb.api.shared_system_client import SharedSystemClient
 from langchain.schema import Document
 
+from model.RAG.article_documents import article_to_document, build_filter
+from model.RAG.context_packer import ContextPacker
+from model.RAG.document_stream import create_text_splitter, iter_batches, iter_chunks
+from model.RAG.embedding_backends import DEFAULT_EMBEDDING_BACKEND, LOCAL_EMBEDDING_BACKENDS, create_embeddings
+from model.RAG.embedding_cache import CachedEmbeddings, EmbeddingCache
+from model.RAG.embedding_scheduler import EmbeddingScheduler
+from model.RAG.flat_vector_store import FlatVectorStore
+from model.RAG.index_versions import IndexVersions
+from model.RAG.lexical_index import LexicalIndex
+from model.RAG.query_cache import QueryCache, get_shared_query_cache
+from model.web_scraper.article_store import ArticleStore, ARTICLE_STORE_FILE_NAME
+from model.web_scraper.prompt_compactor import count_tokens
+
+EMBEDDING_BACKEND_FILE_NAME: str = "embedding_backend.json"
+LEXICAL_INDEX_FILE_NAME: str = "lexical_index.db"
+
+# Chunks embedded and added to the store at a time while building it, so the memory does not grow with the corpus.
+INDEX_BATCH_SIZE: int = 1024
+
+RETRIEVAL_MODES: list[str] = ["vector", "hybrid"]
+DEFAULT_RETRIEVAL_MODE: str = "vector"
+VECTOR_STORES: list[str] = ["chroma", "flat"]
+DEFAULT_VECTOR_STORE: str = "chroma"
+
+# Constant of the reciprocal rank fusion: the higher, the less the top ranks of each list dominate.
+RRF_K: int = 60
+
 class RAG:
     """
     Retrieval Augmented Generation (RAG) model.
 
     This class is used to generate embeddings for a set of documents, retrieve relevant information based on a query, and augment the query with the relevant information.
+
+    The embedding backend is chosen when the store is created (by argument, or the EMBEDDING_BACKEND environment variable) and saved next to it, so the store is always queried with the backend that built it. Changing it requires a rebuild. The same goes for the vector store (by argument, or the VECTOR_STORE environment variable): "chroma", or "flat" for a `FlatVectorStore`, which is faster to open and to query for corpora of up to a few hundred thousand chunks. A flat store can be searched on int8 embeddings (by argument, or the VECTOR_QUANTIZATION environment variable), which the store remembers.
+
+    The chunks are retrieved by vector search, or by vector and BM25 search fused (by argument, or the RETRIEVAL_MODE environment variable set to "hybrid"), which costs one more search per query but does not lose the exact names, places and dates of the question. The retrieved chunks are cached by query in a `QueryCache` shared by every model of the process that queries the same index (unless one is given), so the users asking about the same news share the hits.
+
+    The index is versioned (see `IndexVersions`): a build or a refresh writes a new version, next to the active one, and activates it once it is complete and checked. The model switches to the active version before each query, so a reload never leaves it querying a half-built index.
     """
 
-    def __init__(self, data_path: str = "data", chroma_path: str = "db", documents_type: str = "json", reload_db: bool = False):
+    def __init__(self, data_path: str = "data", chroma_path: str = "db", documents_type: str = "articles", reload_db: bool = False, embedding_cache_path: str = ".cache/embeddings.db", max_embedding_requests: int = 4, embedding_backend: str | None = None, retrieval_mode: str | None = None, query_cache: QueryCache | None = None, vector_store: str | None = None, quantization: str | None = None, quantized_dimensions: int | None = None, split_workers: int = 0, context_packer: ContextPacker | None = None):
+        retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE") or DEFAULT_RETRIEVAL_MODE
+
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Invalid retrieval mode: {retrieval_mode}. Expected one of: {', '.join(RETRIEVAL_MODES)}")
+
+        if vector_store is not None and vector_store not in VECTOR_STORES:
+            raise ValueError(f"Invalid vector store: {vector_store}. Expected one of: {', '.join(VECTOR_STORES)}")
+
         self.DATA_PATH: str = data_path
         self.CHROMA_PATH: str = chroma_path
+        self.EMBEDDING_CACHE_PATH: str = embedding_cache_path
+        self.MAX_EMBEDDING_REQUESTS: int = max_embedding_requests
+        self.RETRIEVAL_MODE: str = retrieval_mode
+        self.QUANTIZATION: str | None = quantization or os.getenv("VECTOR_QUANTIZATION")
+        self.QUANTIZED_DIMENSIONS: int | None = quantized_dimensions
+        self.SPLIT_WORKERS: int = split_workers
         self.is_data: bool = False
+        self.db: Chroma | FlatVectorStore | None = None
+        self.lexical_index: LexicalIndex | None = None
+        self.query_cache: QueryCache = query_cache or get_shared_query_cache(chroma_path)
+        self.context_packer: ContextPacker = context_packer or ContextPacker()
+
+        self.index_versions: IndexVersions = IndexVersions(chroma_path)
+        self.index_path: str | None = None
+        self.staged: bool = False
+        self.set_index_path(self.index_versions.get_current_path())
+
+        self.EMBEDDING_BACKEND: str = self.resolve_embedding_backend(embedding_backend, reload_db)
+        self.VECTOR_STORE: str = self.resolve_vector_store(vector_store, reload_db)
+        self.embeddings: Embeddings = self.create_embedding_function(embedding_cache_path, max_embedding_requests)
         
         self.PROMPT_TEMPLATE: str = """
 Answer the question based only on the context below:
@@ -31,42 +97,218 @@ Answer the question based only on the context below:
 Answer the question based on the above context: {question}
 """
 
-        if not os.path.exists(self.CHROMA_PATH) or reload_db:
+        if self.index_path is None or reload_db:
             if os.path.exists(self.DATA_PATH):
-                documents: list[Document] = self.load_documents(documents_type)
-                chunks: list[Document] = self.split_documents(documents)
-                self.db: Chroma = self.generate_n_save_embeddings(chunks, reload_db)
+                chunks: Iterator[Document] = iter_chunks(self.iter_documents(documents_type), self.SPLIT_WORKERS)
+                self.db: Chroma | FlatVectorStore = self.generate_n_save_embeddings(chunks, reload_db)
             
         else:
-            self.db: Chroma = self.generate_n_save_embeddings([], reload_db)
+            self.db: Chroma | FlatVectorStore = self.generate_n_save_embeddings([], reload_db)
+
+    def resolve_embedding_backend(self, embedding_backend: str | None, reload_db: bool) -> str:
+        """
+        Get the embedding backend of the store.
+
+        An existing store keeps the backend that built it; stores built before the backend was saved were built with OpenAI. A new or rebuilt store uses the requested backend, or the EMBEDDING_BACKEND environment variable, or OpenAI.
+
+        :param embedding_backend: The requested backend, or None to use the one of the store.
+        :type embedding_backend: str | None
+        :param reload_db: Whether the store is rebuilt.
+        :type reload_db: bool
+        :return: The name of the backend.
+        :rtype: str
+        :raises ValueError: If the requested backend is not the one that built the existing store.
+        """
+
+        stored_backend: str | None = self.load_embedding_backend()
+
+        if stored_backend is None or reload_db:
+            return embedding_backend or os.getenv("EMBEDDING_BACKEND") or stored_backend or DEFAULT_EMBEDDING_BACKEND
+
+        if embedding_backend is not None and embedding_backend != stored_backend:
+            raise ValueError(f"The store in {self.CHROMA_PATH} was built with the {stored_backend} embedding backend. Rebuild it to use {embedding_backend}.")
+
+        return stored_backend
+
+    def load_embedding_backend(self) -> str | None:
+        """
+        Load the name of the embedding backend that built the store.
+
+        :return: The name of the backend, or None if there is no store yet.
+        :rtype: str | None
+        """
+
+        if self.index_path is None:
+            return None
+
+        backend_path: str = os.path.join(self.index_path, EMBEDDING_BACKEND_FILE_NAME)
+
+        if os.path.exists(backend_path):
+            with open(backend_path, "r", encoding="utf-8") as file:
+                return json.load(file)["backend"]
+
+        return DEFAULT_EMBEDDING_BACKEND
+
+    def resolve_vector_store(self, vector_store: str | None, reload_db: bool) -> str:
+        """
+        Get the vector store engine of the store, in the same way as `resolve_embedding_backend`.
+
+        :param vector_store: The requested engine, or None to use the one of the store.
+        :type vector_store: str | None
+        :param reload_db: Whether the store is rebuilt.
+        :type reload_db: bool
+        :return: The name of the engine.
+        :rtype: str
+        :raises ValueError: If the requested engine is not the one of the existing store, or the VECTOR_STORE environment variable is not a valid engine.
+        """
+
+        stored_vector_store: str | None = self.load_vector_store()
+
+        if stored_vector_store is None or reload_db:
+            vector_store = vector_store or os.getenv("VECTOR_STORE") or stored_vector_store or DEFAULT_VECTOR_STORE
+
+            if vector_store not in VECTOR_STORES:
+                raise ValueError(f"Invalid vector store: {vector_store}. Expected one of: {', '.join(VECTOR_STORES)}")
+
+            return vector_store
+
+        if vector_store is not None and vector_store != stored_vector_store:
+            raise ValueError(f"The store in {self.CHROMA_PATH} is a {stored_vector_store} store. Rebuild it to use {vector_store}.")
+
+        return stored_vector_store
+
+    def load_vector_store(self) -> str | None:
+        """
+        Load the name of the vector store engine of the store.
+
+        :return: The name of the engine, or None if there is no store yet.
+        :rtype: str | None
+        """
+
+        if self.index_path is None:
+            return None
+
+        backend_path: str = os.path.join(self.index_path, EMBEDDING_BACKEND_FILE_NAME)
 
+        if os.path.exists(backend_path):
+            with open(backend_path, "r", encoding="utf-8") as file:
+                return json.load(file).get("vector_store", DEFAULT_VECTOR_STORE)
+
+        return DEFAULT_VECTOR_STORE
+
+    def save_embedding_backend(self):
+        """
+        Save the name of the embedding backend, and the vector store engine, next to the store.
+        """
+
+        if not os.path.exists(self.index_path):
+            os.makedirs(self.index_path)
+
+        with open(os.path.join(self.index_path, EMBEDDING_BACKEND_FILE_NAME), "w", encoding="utf-8") as file:
+            json.dump({"backend": self.EMBEDDING_BACKEND, "model": getattr(self.embeddings, "model", None), "vector_store": self.VECTOR_STORE}, file, indent=4)
+
+    def create_embedding_function(self, embedding_cache_path: str, max_embedding_requests: int) -> Embeddings:
+        """
+        Create the embedding function of the store backend.
+
+        The embeddings of remote backends are cached on disk, since byte-identical chunks do not need to be requested again, and the rest are requested in concurrent batches. Local backends are used directly.
+
+        :param embedding_cache_path: The path of the embedding cache.
+        :type embedding_cache_path: str
+        :param max_embedding_requests: The maximum number of concurrent requests to a remote backend.
+        :type max_embedding_requests: int
+        :return: The embedding function.
+        :rtype: Embeddings
+        """
+
+        embeddings: Embeddings = create_embeddings(self.EMBEDDING_BACKEND)
+
+        if self.EMBEDDING_BACKEND in LOCAL_EMBEDDING_BACKENDS:
+            return embeddings
+
+        return CachedEmbeddings(
+            EmbeddingScheduler(embeddings, max_in_flight=max_embedding_requests),
+            EmbeddingCache(embedding_cache_path)
+        )
+
+    def get_embedding_stats(self) -> dict[str, int]:
+        """
+        Get the stats of the embedding cache.
+
+        :return: The hits, misses, evictions, entries and size of the cache, or an empty dictionary if the backend is not cached.
+        :rtype: dict[str, int]
+        """
+
+        return self.embeddings.get_stats() if isinstance(self.embeddings, CachedEmbeddings) else {}
 
     def load_documents(self, documents_type: str) -> list[Document]:
         """	
         Load the documents from the data directory.
 
-        :param documents_type: The type of documents to load.
+        :param documents_type: The type of documents to load: "articles" for the article store of the scraper, or a file extension.
         :type documents_type: str
         :return: The documents.
         :rtype: list[Document]
         """
-        
-        if documents_type == "json":
-            documents: list[Document] = []
 
+        return list(self.iter_documents(documents_type))
+
+    def iter_documents(self, documents_type: str) -> Iterator[Document]:
+        """
+        Iterate over the documents of the data directory, loading them one at a time so they are never all in memory at once.
+
+        :param documents_type: The type of documents to load: "articles" for the article store of the scraper, or a file extension.
+        :type documents_type: str
+        :return: The documents.
+        :rtype: Iterator[Document]
+        """
+
+        if documents_type == "articles":
+            yield from self.iter_stored_articles()
+            return
+
+        if documents_type == "json":
             for file in os.listdir(self.DATA_PATH):
                 file_path = os.path.join(self.DATA_PATH, file)
 
-                document_content = str(self.load_json_document(file_path))
-                documents.append(Document(page_content=document_content))
-            
-            return documents
+                yield article_to_document(self.load_json_document(file_path), file_path)
+
+            return
 
         loader: DirectoryLoader = DirectoryLoader(self.DATA_PATH, glob=f"*.{documents_type}")
-        documents: list[Document] = loader.load()
-        
-        return documents
 
+        yield from loader.lazy_load()
+
+    def load_stored_articles(self) -> list[Document]:
+        """
+        Load the articles saved by the scraper in the article store of the data directory.
+
+        :return: The documents, one per article, made with `article_to_document`.
+        :rtype: list[Document]
+        """
+
+        return list(self.iter_stored_articles())
+
+    def iter_stored_articles(self) -> Iterator[Document]:
+        """
+        Iterate over the articles saved by the scraper in the article store of the data directory, reading them in batches.
+
+        :return: The documents, one per article, made with `article_to_document`.
+        :rtype: Iterator[Document]
+        """
+
+        store_path: str = os.path.join(self.DATA_PATH, ARTICLE_STORE_FILE_NAME)
+
+        if not os.path.exists(store_path):
+            return
+
+        store: ArticleStore = ArticleStore(store_path)
+
+        try:
+            for article in store.iter_articles():
+                yield article_to_document(article["data"], article["url"])
+        finally:
+            store.close()
 
     def load_json_document(self, file_path: str) -> dict:
         """
@@ -93,88 +335,647 @@ Answer the question based on the above context: {question}
         :rtype: list[Document]
         """
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100,
-            length_function=len,
-            add_start_index=True,
-        )
-
-        chunks = text_splitter.split_documents(documents)
-
-        return chunks
+        return create_text_splitter().split_documents(documents)
 
-    def generate_n_save_embeddings(self, chunks: list[Document], reload_db: bool) -> Chroma:
+    def generate_n_save_embeddings(self, chunks: Iterable[Document], reload_db: bool) -> Chroma | FlatVectorStore:
         """
         Generate and save the embeddings for the documents in a Chroma database.
 
+        The chunks are consumed in batches of `INDEX_BATCH_SIZE`, so they can come from a stream (see `iter_chunks`) and only one batch is in memory at a time. They are indexed in a new version of the index, which is activated once it is built.
+
         :param chunks: The documents to generate embeddings for.
-        :type chunks: list[Document]
-        :return: The Chroma database.
-        :rtype: Chroma
+        :type chunks: Iterable[Document]
+        :return: The vector store.
+        :rtype: Chroma | FlatVectorStore
         """
 
-        if os.path.exists(self.CHROMA_PATH) and not reload_db:
-            db: Chroma = Chroma(
-                persist_directory=self.CHROMA_PATH,
-                embedding_function=OpenAIEmbeddings(),
-            )
-
+        if self.index_path is not None and not reload_db:
+            db: Chroma | FlatVectorStore = self.open_db()
             self.is_data = True
 
             return db
 
-        db: Chroma = Chroma.from_documents(
-            documents=chunks, 
-            embedding=OpenAIEmbeddings(),
-            persist_directory=self.CHROMA_PATH,
+        with self.index_versions.lock_updates():
+            self.set_index_path(self.index_versions.create_version())
+
+            for batch in iter_batches(chunks, INDEX_BATCH_SIZE):
+                self.upsert_chunks(batch, self.get_chunk_ids(batch))
+
+            self.publish_index()
+            self.is_data = True
+
+        print(f"Caché de embeddings: {self.get_embedding_stats()}")
+
+        return self.open_db()
+
+    def open_db(self) -> Chroma | FlatVectorStore:
+        """
+        Open the vector store, creating an empty one if it does not exist.
+
+        If the model has no index yet, a new version is created for it, which is not active until it is published.
+
+        :return: The Chroma database, or the flat vector store.
+        :rtype: Chroma | FlatVectorStore
+        """
+
+        if self.index_path is None:
+            self.set_index_path(self.index_versions.create_version())
+
+        if self.db is None:
+            if self.VECTOR_STORE == "flat":
+                self.db = FlatVectorStore(self.index_path, self.embeddings, self.QUANTIZATION, self.QUANTIZED_DIMENSIONS)
+            else:
+                self.db = Chroma(
+                    persist_directory=self.index_path,
+                    embedding_function=self.embeddings,
+                )
+
+            self.save_embedding_backend()
+
+        return self.db
+
+    def set_index_path(self, index_path: str | None):
+        """
+        Use the given version of the index, closing the one in use.
+
+        :param index_path: The directory of the version, or None to use no version.
+        :type index_path: str | None
+        """
+
+        self.close_index()
+
+        self.index_path = index_path
+        self.index_versions.use(self, index_path)
+
+        # The cache may be shared with the models of other sessions: it is cleared when the first of them switches to a new version.
+        if index_path is not None:
+            self.query_cache.set_version(index_path)
+
+    def close_index(self):
+        """
+        Close the vector store and the lexical index. They are opened again when they are needed.
+
+        Chroma keeps the connections of each directory open for the whole process, shared by every client of that directory, so they are only released if no other model of this process uses the version.
+        """
+
+        if isinstance(self.db, FlatVectorStore):
+            self.db.close()
+        elif self.db is not None and not self.index_versions.is_used_by_others(self, self.index_path):
+            release_chroma(self.db)
+
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+
+        self.db = None
+        self.lexical_index = None
+
+    def refresh_index_version(self) -> bool:
+        """
+        Switch to the active version of the index, if another version was activated since the model opened its own.
+
+        It is called before each query, and it only reads a small file when the active version changes. The version left is garbage collected if no other model uses it.
+
+        :return: True if the model switched to another version, False otherwise.
+        :rtype: bool
+        """
+
+        current_path: str | None = self.index_versions.get_current_path()
+
+        if self.staged or current_path is None or current_path == self.index_path:
+            return False
+
+        self.set_index_path(current_path)
+        self.load_index_settings()
+
+        self.index_versions.collect_garbage()
+
+        print(f"Índice actualizado a la versión {os.path.basename(current_path)}.")
+
+        return True
+
+    def load_index_settings(self):
+        """
+        Use the embedding backend and the vector store of the version of the model, which may have been built with other ones.
+        """
+
+        stored_backend: str | None = self.load_embedding_backend()
+
+        if stored_backend is not None and stored_backend != self.EMBEDDING_BACKEND:
+            self.EMBEDDING_BACKEND = stored_backend
+            self.embeddings = self.create_embedding_function(self.EMBEDDING_CACHE_PATH, self.MAX_EMBEDDING_REQUESTS)
+
+        self.VECTOR_STORE = self.load_vector_store() or self.VECTOR_STORE
+        self.is_data = get_collection(self.open_db()).count() > 0
+
+    def stage_index(self, copy_current: bool = True) -> "RAG":
+        """
+        Create a model on a new version of the index, to update the knowledge base without touching the version being queried.
+
+        The staged model shares the embedding function of this model. Its version is not active until it is published with `publish_index`, or deleted with `discard_index`. It should be staged, updated and published while holding `IndexVersions.lock_updates`, so no other update is published in between.
+
+        :param copy_current: Whether the new version starts as a copy of the active version, to update it incrementally, or empty, to rebuild it. The active version is read from disk, since this model only switches to the last activated version on its next query.
+        :type copy_current: bool
+        :return: The staged model.
+        :rtype: RAG
+        """
+
+        staged_rag: RAG = copy.copy(self)
+        staged_rag.staged = True
+        staged_rag.db = None
+        staged_rag.lexical_index = None
+        staged_rag.index_path = None
+        staged_rag.query_cache = QueryCache()
+
+        if copy_current:
+            staged_rag.set_index_path(self.index_versions.create_version(self.index_versions.get_current_path()))
+            staged_rag.load_index_settings()
+        else:
+            staged_rag.set_index_path(self.index_versions.create_version())
+            staged_rag.is_data = False
+
+        return staged_rag
+
+    def check_index(self, expected_ids: list[str] | None = None):
+        """
+        Check that the version of the model is complete before publishing it.
+
+        :param expected_ids: The IDs of the chunks that must be in the index, and the only ones, or None to only check that the vector store and the lexical index agree.
+        :type expected_ids: list[str] | None
+        :raises ValueError: If the index is not consistent.
+        """
+
+        count: int = get_collection(self.open_db()).count()
+        lexical_count: int = self.get_lexical_index().count()
+
+        if lexical_count != count:
+            raise ValueError(f"The index in {self.index_path} has {count} chunks in the vector store and {lexical_count} in the lexical index.")
+
+        if expected_ids is None:
+            return
+
+        expected_set: set[str] = set(expected_ids)
+        existing_count: int = sum(len(self.get_existing_ids(batch)) for batch in iter_batches(expected_set, INDEX_BATCH_SIZE))
+
+        if existing_count != len(expected_set) or count != len(expected_set):
+            raise ValueError(f"The index in {self.index_path} has {count} chunks, {existing_count} of the {len(expected_set)} expected.")
+
+    def publish_index(self, expected_ids: list[str] | None = None):
+        """
+        Check the version of the model and make it the active version, so every model switches to it on its next query. The versions no longer needed are garbage collected.
+
+        :param expected_ids: The IDs of the chunks that must be in the index (see `check_index`).
+        :type expected_ids: list[str] | None
+        :raises ValueError: If the index is not consistent. The version is not activated.
+        """
+
+        self.check_index(expected_ids)
+        self.index_versions.activate(self.index_path)
+        self.index_versions.collect_garbage()
+
+    def discard_index(self):
+        """
+        Delete the version of a staged model that will not be published.
+        """
+
+        index_path: str | None = self.index_path
+
+        self.set_index_path(None)
+
+        if index_path is not None:
+            self.index_versions.discard(index_path)
+
+    def index_documents(self, documents: list[Document]) -> list[str]:
+        """
+        Index the given documents incrementally.
+
+        The documents are split into chunks with stable IDs (see `get_chunk_id`). Only the chunks that are not in the database yet are embedded; the chunks of the same sources that are no longer part of the documents are deleted. Indexing a new or changed article costs that article's embeddings, not a rebuild of the database.
+
+        :param documents: The documents to index. Their `source` metadata identifies them.
+        :type documents: list[Document]
+        :return: The IDs of the chunks of the documents.
+        :rtype: list[str]
+        """
+
+        chunks: list[Document] = self.split_documents(documents)
+        ids: list[str] = self.get_chunk_ids(chunks)
+        id_set: set[str] = set(ids)
+
+        for source in dict.fromkeys(document.metadata.get("source", "") for document in documents):
+            self.delete_chunks([chunk_id for chunk_id in self.get_source_chunk_ids(source) if chunk_id not in id_set])
+
+        self.upsert_chunks(chunks, ids)
+
+        return ids
+
+    def upsert_chunks(self, chunks: list[Document], ids: list[str]):
+        """
+        Add the given chunks to the Chroma database under the given IDs, embedding only the chunks whose IDs are not in the database yet.
+
+        Since the IDs include the hash of the chunk content, a chunk that is already in the database does not need to be embedded again.
+
+        :param chunks: The chunks to add.
+        :type chunks: list[Document]
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        """
+
+        existing_ids: set[str] = self.get_existing_ids(ids)
+        new_chunks: dict[str, Document] = {
+            chunk_id: chunk for chunk_id, chunk in zip(ids, chunks) if chunk_id not in existing_ids
+        }
+
+        if len(new_chunks) == 0:
+            return
+
+        chunks_to_add: list[Document] = list(new_chunks.values())
+
+        self.upsert_embedded_chunks(chunks_to_add, list(new_chunks.keys()), self.embed_chunks(chunks_to_add))
+
+    def get_chunk_ids(self, chunks: list[Document]) -> list[str]:
+        """
+        Get the stable IDs of the given chunks.
+
+        :param chunks: The chunks, split with `split_documents`.
+        :type chunks: list[Document]
+        :return: The IDs, in the same order as the chunks.
+        :rtype: list[str]
+        """
+
+        return [self.get_chunk_id(chunk) for chunk in chunks]
+
+    def get_chunk_id(self, chunk: Document) -> str:
+        """
+        Get the stable ID of the given chunk, derived from its source, its position in the source and its content.
+
+        The same chunk always gets the same ID, so indexing it again replaces it instead of duplicating it, and a changed chunk gets a new ID.
+
+        :param chunk: The chunk, with the `source` and `start_index` metadata.
+        :type chunk: Document
+        :return: The ID, in the format «source hash»:«start index»:«content hash».
+        :rtype: str
+        """
+
+        source_hash: str = hashlib.sha256(chunk.metadata.get("source", "").encode("utf-8")).hexdigest()[:16]
+        content_hash: str = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:16]
+
+        return f"{source_hash}:{chunk.metadata.get('start_index', 0)}:{content_hash}"
+
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        """
+        Get which of the given chunk IDs are in the Chroma database.
+
+        :param ids: The chunk IDs.
+        :type ids: list[str]
+        :return: The IDs that are in the database.
+        :rtype: set[str]
+        """
+
+        if len(ids) == 0:
+            return set()
+
+        return set(get_collection(self.open_db()).get(ids=ids, include=[])["ids"])
+
+    def get_source_chunk_ids(self, source: str) -> list[str]:
+        """
+        Get the IDs of the chunks of the given source in the Chroma database.
+
+        :param source: The source, usually the URL of the article.
+        :type source: str
+        :return: The chunk IDs.
+        :rtype: list[str]
+        """
+
+        return get_collection(self.open_db()).get(where={"source": source}, include=[])["ids"]
+
+    def delete_source(self, source: str):
+        """
+        Delete every chunk of the given source from the Chroma database.
+
+        :param source: The source, usually the URL of the article.
+        :type source: str
+        """
+
+        self.delete_chunks(self.get_source_chunk_ids(source))
+
+    def embed_chunks(self, chunks: list[Document]) -> list[list[float]]:
+        """
+        Generate the embeddings for the given chunks, without adding them to the database.
+
+        :param chunks: The chunks to embed.
+        :type chunks: list[Document]
+        :return: The embeddings, in the same order as the chunks.
+        :rtype: list[list[float]]
+        """
+
+        if len(chunks) == 0:
+            return []
+
+        return self.open_db().embeddings.embed_documents([chunk.page_content for chunk in chunks])
+
+    def upsert_embedded_chunks(self, chunks: list[Document], ids: list[str], embeddings: list[list[float]]):
+        """
+        Add the given chunks, with their already generated embeddings, to the Chroma database, replacing the chunks with the same IDs.
+
+        :param chunks: The chunks to add.
+        :type chunks: list[Document]
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        :param embeddings: The embeddings of the chunks.
+        :type embeddings: list[list[float]]
+        """
+
+        if len(chunks) == 0:
+            return
+
+        get_collection(self.open_db()).upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=[chunk.metadata for chunk in chunks],
+            documents=[chunk.page_content for chunk in chunks],
         )
-        
+
+        self.get_lexical_index().add(ids, [chunk.page_content for chunk in chunks])
+        self.query_cache.clear()
+
         self.is_data = True
 
-        return db
+    def delete_chunks(self, ids: list[str]):
+        """
+        Delete the chunks with the given IDs from the Chroma database.
 
-    def retrieve_relevant_info(self, db: Chroma, query: str, n: int = 3) -> list[Document]:
+        :param ids: The IDs of the chunks to delete.
+        :type ids: list[str]
+        """
+
+        if len(ids) == 0:
+            return
+
+        get_collection(self.open_db()).delete(ids=ids)
+        self.get_lexical_index().delete(ids)
+        self.query_cache.clear()
+
+    def clear_db(self):
+        """
+        Delete every chunk from the Chroma database.
+        """
+
+        db: Chroma | FlatVectorStore = self.open_db()
+
+        if isinstance(db, FlatVectorStore):
+            db.clear()
+        else:
+            db.delete_collection()
+
+        self.get_lexical_index().clear()
+        self.query_cache.clear()
+
+        self.db = None
+        self.is_data = False
+        self.open_db()
+
+    def get_lexical_index(self) -> LexicalIndex:
+        """
+        Open the lexical index of the chunks, saved next to the Chroma database.
+
+        If the index is empty but the database is not (e.g. the database was built before the index existed), the index is built from the chunks in the database.
+
+        :return: The lexical index.
+        :rtype: LexicalIndex
+        """
+
+        if self.lexical_index is None:
+            self.lexical_index = LexicalIndex(os.path.join(self.index_path, LEXICAL_INDEX_FILE_NAME))
+
+            if self.lexical_index.count() == 0 and get_collection(self.open_db()).count() > 0:
+                chunks: dict = get_collection(self.open_db()).get(include=["documents"])
+                self.lexical_index.add(chunks["ids"], chunks["documents"])
+
+        return self.lexical_index
+
+    def retrieve_relevant_info(self, db: Chroma | FlatVectorStore, query: str, n: int = 3, mode: str | None = None, sources: list[str] | None = None, published_after: date | None = None, published_before: date | None = None) -> list[Document]:
         """
         Retrieve relevant information based on a query.
 
-        :param db: The Chroma database.
-        :type db: Chroma
+        The search can be restricted to some sources and to a publication date range. The filters are applied by the vector store before the search, so a question about the news of a site or a week only searches their chunks. The chunks without a publication date are excluded by the date filters.
+
+        The IDs of the retrieved chunks are cached by query (see `QueryCache`), so a repeated query only fetches its chunks from the database, without embedding the query or searching again.
+
+        :param db: The vector store.
+        :type db: Chroma | FlatVectorStore
         :param query: The query to search for.
         :type query: str
         :param n: The number of results to return. Defaults to 3.
         :type n: int
+        :param mode: The retrieval mode: "vector" (only embeddings) or "hybrid" (embeddings and BM25). Defaults to the mode of the model.
+        :type mode: str | None
+        :param sources: The sites (e.g. "elpais.com.co") or URLs of the articles to search, or None to search every article.
+        :type sources: list[str] | None
+        :param published_after: The first publication day of the articles to search, included.
+        :type published_after: date | None
+        :param published_before: The last publication day of the articles to search, included.
+        :type published_before: date | None
         :return: The relevant information.
         :rtype: list[Document]
         """
 
-        results: list[Document] = db.similarity_search(
-            query=query,
-            k=n,
-        )
+        if self.refresh_index_version():
+            db = self.open_db()
 
-        if len(results) == 0:
+        if self.index_path is None:
             return []
 
+        mode = mode or self.RETRIEVAL_MODE
+        where: dict | None = build_filter(sources, published_after, published_before)
+        # The version is part of the scope, so a model that did not switch to a new version yet never shares its entries.
+        scope: str = f"{os.path.basename(self.index_path)}:{mode}:{n}:{json.dumps(where, sort_keys=True)}"
+        start: float = time.perf_counter()
+
+        # The query is embedded at most once: for the similarity lookup of the cache, if needed, and for the search.
+        query_embedding: list[list[float]] = []
+
+        def get_query_embedding() -> list[float]:
+            if len(query_embedding) == 0:
+                query_embedding.append(self.embeddings.embed_query(query))
+
+            return query_embedding[0]
+
+        cached_ids: list[str] | None = self.query_cache.get(query, scope, get_query_embedding)
+
+        if cached_ids is not None:
+            return self.get_chunks(cached_ids)
+
+        if mode == "hybrid":
+            results: list[Document] = self.retrieve_hybrid(query, n, query_embedding=get_query_embedding(), where=where)
+        else:
+            results: list[Document] = self.search_vector(db, get_query_embedding(), n, where)
+
+        self.query_cache.put(
+            query,
+            scope,
+            [document.id for document in results],
+            time.perf_counter() - start,
+            query_embedding[0] if query_embedding else None
+        )
+
         return results
 
-    def augment_query(self, query: str) -> str:
+    def retrieve_hybrid(self, query: str, n: int = 3, candidates: int = 20, query_embedding: list[float] | None = None, where: dict | None = None) -> list[Document]:
+        """
+        Retrieve the chunks that best match the query by meaning and by exact terms.
+
+        The candidates of the vector search and of the BM25 search are fused with reciprocal rank fusion: each chunk scores the sum of 1 / (RRF_K + rank) over the lists it appears in. A chunk that ranks well in both lists goes first, and the exact names, places and dates of the query are not lost when the embeddings do not capture them.
+
+        :param query: The query to search for.
+        :type query: str
+        :param n: The number of results to return.
+        :type n: int
+        :param candidates: The number of candidates taken from each search.
+        :type candidates: int
+        :param query_embedding: The embedding of the query, if it is already computed.
+        :type query_embedding: list[float] | None
+        :param where: The metadata filter of the chunks, in the `where` syntax of Chroma, or None to search every chunk.
+        :type where: dict | None
+        :return: The relevant chunks, from best to worst.
+        :rtype: list[Document]
+        """
+
+        candidates = max(candidates, n)
+        db: Chroma | FlatVectorStore = self.open_db()
+
+        if get_collection(db).count() == 0:
+            return []
+
+        vector_results: list[Document] = self.search_vector(db, query_embedding or self.embeddings.embed_query(query), candidates, where)
+        allowed_ids: set[str] | None = set(get_collection(db).get(where=where, include=[])["ids"]) if where else None
+
+        vector_ids: list[str] = [document.id for document in vector_results]
+        lexical_ids: list[str] = [chunk_id for chunk_id, _ in self.get_lexical_index().search(query, candidates, allowed_ids)]
+
+        scores: dict[str, float] = {}
+
+        for ranking in (vector_ids, lexical_ids):
+            for rank, chunk_id in enumerate(ranking, start=1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (RRF_K + rank)
+
+        best_ids: list[str] = sorted(scores, key=scores.get, reverse=True)[:n]
+
+        documents: dict[str, Document] = {document.id: document for document in vector_results}
+        missing_ids: list[str] = [chunk_id for chunk_id in best_ids if chunk_id not in documents]
+
+        for document in self.get_chunks(missing_ids):
+            documents[document.id] = document
+
+        return [documents[chunk_id] for chunk_id in best_ids if chunk_id in documents]
+
+    def search_vector(self, db: Chroma | FlatVectorStore, query_embedding: list[float], k: int, where: dict | None = None) -> list[Document]:
+        """
+        Get the chunks nearest to the given query embedding.
+
+        :param db: The vector store.
+        :type db: Chroma | FlatVectorStore
+        :param query_embedding: The embedding of the query.
+        :type query_embedding: list[float]
+        :param k: The maximum number of chunks to return.
+        :type k: int
+        :param where: The metadata filter of the chunks, in the `where` syntax of Chroma, or None to search every chunk.
+        :type where: dict | None
+        :return: The chunks, with their IDs, from nearest to farthest.
+        :rtype: list[Document]
+        """
+
+        collection = get_collection(db)
+        count: int = collection.count()
+
+        if count == 0:
+            return []
+
+        results: dict = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(k, count),
+            where=where,
+            include=["documents", "metadatas"],
+        )
+
+        return [
+            Document(id=chunk_id, page_content=content, metadata=metadata or {})
+            for chunk_id, content, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def get_chunks(self, ids: list[str]) -> list[Document]:
+        """
+        Get the chunks with the given IDs from the Chroma database.
+
+        :param ids: The IDs of the chunks.
+        :type ids: list[str]
+        :return: The chunks, with their IDs, in the same order as the IDs. The IDs that are not in the database are skipped.
+        :rtype: list[Document]
+        """
+
+        if len(ids) == 0:
+            return []
+
+        results: dict = get_collection(self.open_db()).get(ids=ids, include=["documents", "metadatas"])
+        documents: dict[str, Document] = {
+            chunk_id: Document(id=chunk_id, page_content=content, metadata=metadata or {})
+            for chunk_id, content, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+
+        return [documents[chunk_id] for chunk_id in ids if chunk_id in documents]
+
+    def get_query_cache_stats(self) -> dict[str, float]:
+        """
+        Get the stats of the query cache.
+
+        :return: The hits, misses, hit rate, seconds of retrieval saved and entries of the cache.
+        :rtype: dict[str, float]
+        """
+
+        return self.query_cache.get_stats()
+
+    def get_context_stats(self) -> dict[str, int]:
+        """
+        Get the stats of the context packer.
+
+        :return: The tokens of the contexts before and after packing, the tokens saved and the chunks removed, in total and for the last query.
+        :rtype: dict[str, int]
+        """
+
+        return self.context_packer.get_stats()
+
+    def augment_query(self, query: str, sources: list[str] | None = None, published_after: date | None = None, published_before: date | None = None) -> str:
         """
         Augment the query with relevant information.
 
+        The context is assembled by the `ContextPacker` from more candidates than it uses, so it carries no duplicated or overlapping text and the prompt stays within its token budget.
+
         :param query: The query to augment.
         :type query: str
+        :param sources: The sites or URLs of the articles to search, or None to search every article.
+        :type sources: list[str] | None
+        :param published_after: The first publication day of the articles to search, included.
+        :type published_after: date | None
+        :param published_before: The last publication day of the articles to search, included.
+        :type published_before: date | None
         :return: The augmented query.
         :rtype: str
         """
 
+        self.refresh_index_version()
+
         if not self.is_data:
             return "No data available."
 
-        relevant_info: list[Document] = self.retrieve_relevant_info(self.db, query)
+        relevant_info: list[Document] = self.retrieve_relevant_info(
+            self.db,
+            query,
+            self.context_packer.get_candidates_count(),
+            sources=sources,
+            published_after=published_after,
+            published_before=published_before
+        )
 
-        context: str = "\n\n---\n\n".join([doc.page_content for doc in relevant_info])
         prompt_template: ChatPromptTemplate = ChatPromptTemplate.from_template(self.PROMPT_TEMPLATE)
+        context: str = self.context_packer.pack(relevant_info, count_tokens(prompt_template.format(context="", question=query)))
 
         augmented_query: str = prompt_template.format(
             context=context,
@@ -185,10 +986,37 @@ Answer the question based on the above context: {question}
     
     def get_db(self):
         """
-        Get the Chroma database.
+        Get the vector store.
 
-        :return: The Chroma database.
-        :rtype: Chroma
+        :return: The Chroma database, or the flat vector store.
+        :rtype: Chroma | FlatVectorStore
         """
 
-        return self.db
\ No newline at end of file
+        return self.db
+
+
+def get_collection(db: Chroma | FlatVectorStore):
+    """
+    Get the collection of the given vector store, on which the chunks are read and written.
+
+    :param db: The vector store.
+    :type db: Chroma | FlatVectorStore
+    :return: The Chroma collection, or the flat vector store itself, which has the same methods.
+    :rtype: chromadb.Collection | FlatVectorStore
+    """
+
+    return db if isinstance(db, FlatVectorStore) else db._collection
+
+def release_chroma(db: Chroma):
+    """
+    Stop the Chroma system of the directory of the given vector store, closing its database and its HNSW segments. A new one is started if the directory is opened again.
+
+    :param db: The vector store.
+    :type db: Chroma
+    """
+
+    client = db._client
+    system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+
+    if system is not None:
+        system.stop()
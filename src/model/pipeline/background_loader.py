@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Any, Callable
+
+LOADER_STATUSES: tuple[str, ...] = ("loading", "ready", "failed")
+
+
+class BackgroundLoader:
+    """
+    BackgroundLoader creates an object in a background thread, so a slow start (opening a vector store, importing a client library) does not block the caller.
+
+    The loader starts as soon as it is created. Its status can be checked without waiting, and `get` waits for the object. If the creation fails, `get` raises its error, every time it is called.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Any]):
+        self.NAME: str = name
+        self.LOAD: Callable[[], Any] = load
+
+        self.value: Any = None
+        self.error: Exception | None = None
+        self.start_time: float = time.perf_counter()
+        self.end_time: float | None = None
+
+        self.ready: threading.Event = threading.Event()
+        self.thread: threading.Thread = threading.Thread(target=self.run, name=f"load-{name}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """
+        Create the object, saving it or the error of its creation.
+        """
+
+        try:
+            self.value = self.LOAD()
+        except Exception as error:
+            self.error = error
+        finally:
+            self.end_time = time.perf_counter()
+            self.ready.set()
+
+    def get_status(self) -> str:
+        """
+        Get the status of the loader, without waiting.
+
+        :return: "loading", "ready" or "failed".
+        :rtype: str
+        """
+
+        if not self.ready.is_set():
+            return "loading"
+
+        return "failed" if self.error is not None else "ready"
+
+    def is_ready(self) -> bool:
+        """
+        Check if the object is created, without waiting.
+
+        :return: True if the object is ready to use, False if it is loading or failed.
+        :rtype: bool
+        """
+
+        return self.get_status() == "ready"
+
+    def get(self, timeout: float | None = None) -> Any:
+        """
+        Get the object, waiting for it to be created.
+
+        :param timeout: The maximum seconds to wait, or None to wait until it is created.
+        :type timeout: float | None
+        :return: The object.
+        :rtype: Any
+        :raises TimeoutError: If the object is not created within the timeout.
+        :raises Exception: The error raised while creating the object.
+        """
+
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f"{self.NAME} is still loading after {timeout} seconds")
+
+        if self.error is not None:
+            raise self.error
+
+        return self.value
+
+    def get_seconds(self) -> float:
+        """
+        Get the seconds the creation took, or has taken so far.
+
+        :return: The seconds.
+        :rtype: float
+        """
+
+        return (self.end_time or time.perf_counter()) - self.start_time
@@ -0,0 +1,293 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+# Marks the end of the input of a worker.
+END_OF_STREAM: object = object()
+
+
+class PipelineStage:
+    """
+    PipelineStage is a step of a `Pipeline`: a function applied by a pool of worker threads to every item that reaches the stage.
+
+    The function returns the item for the next stage, or None to drop it (e.g. when there is nothing left to do for it). The stage keeps count of its items and busy time, to expose its throughput.
+    """
+
+    def __init__(self, name: str, function: Callable[[Any], Any], workers: int = 1):
+        self.NAME: str = name
+        self.FUNCTION: Callable[[Any], Any] = function
+        self.WORKERS: int = workers
+
+        self.processed: int = 0
+        self.dropped: int = 0
+        self.failed: int = 0
+        self.busy_time: float = 0.0
+        self.start_time: float | None = None
+        self.end_time: float | None = None
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def process(self, item: Any) -> Any:
+        """
+        Apply the function of the stage to the given item, updating the stage counters.
+
+        :param item: The item.
+        :type item: Any
+        :return: The item for the next stage, or None if it was dropped.
+        :rtype: Any
+        :raises Exception: The error raised by the function.
+        """
+
+        start: float = time.perf_counter()
+
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = start
+
+        try:
+            result: Any = self.FUNCTION(item)
+
+        except Exception:
+            with self.lock:
+                self.failed += 1
+
+            raise
+
+        finally:
+            end: float = time.perf_counter()
+
+            with self.lock:
+                self.busy_time += end - start
+                self.end_time = end
+
+        with self.lock:
+            self.processed += 1
+
+            if result is None:
+                self.dropped += 1
+
+        return result
+
+    def get_stats(self) -> dict:
+        """
+        Get the throughput of the stage.
+
+        :return: The name, workers, processed, dropped and failed items, busy seconds (summed over the workers), items per second (over the time the stage was active) and utilization of the workers.
+        :rtype: dict
+        """
+
+        with self.lock:
+            elapsed: float = (self.end_time - self.start_time) if self.start_time is not None else 0.0
+
+            return {
+                "stage": self.NAME,
+                "workers": self.WORKERS,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "busy_seconds": round(self.busy_time, 3),
+                "items_per_second": round(self.processed / elapsed, 3) if elapsed > 0 else 0.0,
+                "utilization": round(self.busy_time / (elapsed * self.WORKERS), 3) if elapsed > 0 else 0.0,
+            }
+
+
+class BatchPipelineStage(PipelineStage):
+    """
+    BatchPipelineStage is a step of a `Pipeline` whose function is applied to batches of items instead of single items, e.g. to send them in a single request.
+
+    Each worker groups the items it takes until their total weight reaches the maximum, no item arrives for `max_wait` seconds, or the input ends. The function takes the list of items and returns the list of items for the next stage, with None for the dropped ones. If it fails, every item of the batch fails.
+    """
+
+    def __init__(self, name: str, function: Callable[[list[Any]], list[Any]], workers: int = 1, max_batch_weight: float = 1, get_weight: Callable[[Any], float] | None = None, max_wait: float = 1.0):
+        super().__init__(name, function, workers)
+
+        self.MAX_BATCH_WEIGHT: float = max_batch_weight
+        self.GET_WEIGHT: Callable[[Any], float] = get_weight or (lambda item: 1)
+        self.MAX_WAIT: float = max_wait
+
+    def process(self, items: list[Any]) -> list[Any]:
+        """
+        Apply the function of the stage to the given batch, updating the stage counters.
+
+        :param items: The items of the batch.
+        :type items: list[Any]
+        :return: The items for the next stage, or None for the dropped ones, in the same order.
+        :rtype: list[Any]
+        :raises Exception: The error raised by the function.
+        """
+
+        start: float = time.perf_counter()
+
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = start
+
+        try:
+            results: list[Any] = self.FUNCTION(items)
+
+        except Exception:
+            with self.lock:
+                self.failed += len(items)
+
+            raise
+
+        finally:
+            end: float = time.perf_counter()
+
+            with self.lock:
+                self.busy_time += end - start
+                self.end_time = end
+
+        with self.lock:
+            self.processed += len(items)
+            self.dropped += sum(1 for result in results if result is None)
+
+        return results
+
+
+class Pipeline:
+    """
+    Pipeline runs a sequence of stages over a stream of items, with bounded queues between them.
+
+    All the stages run at the same time, so the items flow through the pipeline as soon as each stage is done with them. Since the queues are bounded, a slow stage makes the previous ones wait (backpressure), and the items in memory do not grow with the number of input items.
+    """
+
+    def __init__(self, stages: list[PipelineStage], queue_size: int = 16, on_error: Callable[[Any, PipelineStage, Exception], None] | None = None):
+        self.STAGES: list[PipelineStage] = stages
+        self.QUEUE_SIZE: int = queue_size
+        self.ON_ERROR: Callable[[Any, PipelineStage, Exception], None] | None = on_error
+
+    def run(self, items: Iterable[Any]):
+        """
+        Run the pipeline over the given items and wait until every item went through it.
+
+        An item that fails in a stage is passed to the error callback and dropped; it does not stop the rest of the items.
+
+        :param items: The input items of the first stage. It can be a generator, which is consumed lazily.
+        :type items: Iterable[Any]
+        """
+
+        queues: list[queue.Queue] = [queue.Queue(maxsize=self.QUEUE_SIZE) for _ in self.STAGES]
+        workers: list[list[threading.Thread]] = []
+
+        for index, stage in enumerate(self.STAGES):
+            output_queue: queue.Queue | None = queues[index + 1] if index + 1 < len(self.STAGES) else None
+
+            stage_workers: list[threading.Thread] = [
+                threading.Thread(target=self.work, args=(stage, queues[index], output_queue), daemon=True)
+                for _ in range(stage.WORKERS)
+            ]
+
+            for worker in stage_workers:
+                worker.start()
+
+            workers.append(stage_workers)
+
+        for item in items:
+            queues[0].put(item)
+
+        # Close the stages in order: a stage only ends once every worker of the previous one is done.
+        for index, stage in enumerate(self.STAGES):
+            for _ in range(stage.WORKERS):
+                queues[index].put(END_OF_STREAM)
+
+            for worker in workers[index]:
+                worker.join()
+
+    def work(self, stage: PipelineStage, input_queue: queue.Queue, output_queue: queue.Queue | None):
+        """
+        Worker loop of a stage: take items from the input queue until the end of the stream, and put the results in the output queue.
+
+        :param stage: The stage.
+        :type stage: PipelineStage
+        :param input_queue: The queue to take the items from.
+        :type input_queue: queue.Queue
+        :param output_queue: The queue of the next stage, or None if this is the last stage.
+        :type output_queue: queue.Queue | None
+        """
+
+        if isinstance(stage, BatchPipelineStage):
+            self.work_batches(stage, input_queue, output_queue)
+            return
+
+        while True:
+            item: Any = input_queue.get()
+
+            if item is END_OF_STREAM:
+                return
+
+            try:
+                result: Any = stage.process(item)
+
+            except Exception as e:
+                if self.ON_ERROR is not None:
+                    self.ON_ERROR(item, stage, e)
+
+                continue
+
+            if result is not None and output_queue is not None:
+                output_queue.put(result)
+
+    def work_batches(self, stage: BatchPipelineStage, input_queue: queue.Queue, output_queue: queue.Queue | None):
+        """
+        Worker loop of a batch stage: group the items of the input queue into batches until the end of the stream, and put the results in the output queue.
+
+        :param stage: The stage.
+        :type stage: BatchPipelineStage
+        :param input_queue: The queue to take the items from.
+        :type input_queue: queue.Queue
+        :param output_queue: The queue of the next stage, or None if this is the last stage.
+        :type output_queue: queue.Queue | None
+        """
+
+        batch: list[Any] = []
+        batch_weight: float = 0
+        ended: bool = False
+
+        while not ended:
+            idle: bool = False
+
+            try:
+                # An incomplete batch is not kept waiting for items that are slow to come.
+                item: Any = input_queue.get(timeout=stage.MAX_WAIT if batch else None)
+
+            except queue.Empty:
+                idle = True
+
+            else:
+                if item is END_OF_STREAM:
+                    ended = True
+                else:
+                    batch.append(item)
+                    batch_weight += stage.GET_WEIGHT(item)
+
+            if not batch or not (ended or idle or batch_weight >= stage.MAX_BATCH_WEIGHT):
+                continue
+
+            try:
+                results: list[Any] = stage.process(batch)
+
+            except Exception as e:
+                if self.ON_ERROR is not None:
+                    for failed_item in batch:
+                        self.ON_ERROR(failed_item, stage, e)
+
+                results = []
+
+            if output_queue is not None:
+                for result in results:
+                    if result is not None:
+                        output_queue.put(result)
+
+            batch, batch_weight = [], 0
+
+    def get_stats(self) -> list[dict]:
+        """
+        Get the throughput of every stage.
+
+        :return: The stats of each stage, in order.
+        :rtype: list[dict]
+        """
+
+        return [stage.get_stats() for stage in self.STAGES]
@@ -0,0 +1,271 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator
+from urllib.parse import urlsplit, urlunsplit
+
+ARTICLE_STORE_FILE_NAME: str = "articles.db"
+
+DEFAULT_PORTS: dict[str, int] = {"http": 80, "https": 443}
+
+CREATE_TABLE_QUERY: str = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    date TEXT,
+    content TEXT,
+    links TEXT,
+    content_hash TEXT,
+    fetched_at REAL
+)
+"""
+
+UPSERT_QUERY: str = """
+INSERT INTO articles (url, title, author, date, content, links, content_hash, fetched_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(url) DO UPDATE SET
+    title = excluded.title,
+    author = excluded.author,
+    date = excluded.date,
+    content = excluded.content,
+    links = excluded.links,
+    content_hash = excluded.content_hash,
+    fetched_at = excluded.fetched_at
+"""
+
+SELECT_COLUMNS: str = "url, title, author, date, content, links, content_hash, fetched_at"
+
+
+class ArticleStore:
+    """
+    ArticleStore keeps the extracted articles in a single SQLite file, one row per canonical URL.
+
+    Each row has the title, author, date, content and links of the article, plus the hash of its content and the time it was fetched. Saving an article that is already stored replaces it, so the store never keeps stale articles from an earlier list of URLs.
+
+    The connection is shared by the threads of the scraper, so every access is serialized with a lock.
+    """
+
+    def __init__(self, store_path: str):
+        self.STORE_PATH: str = store_path
+
+        store_dir: str = os.path.dirname(self.STORE_PATH)
+
+        if store_dir and not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+
+        self.connection: sqlite3.Connection = sqlite3.connect(self.STORE_PATH, check_same_thread=False)
+        self.lock: threading.Lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(CREATE_TABLE_QUERY)
+
+    def save(self, url: str, data: dict, content_hash: str | None = None):
+        """
+        Save the extracted data of the given URL, replacing the stored article if there is one.
+
+        :param url: The URL of the article.
+        :type url: str
+        :param data: The extracted data, with the keys Título, Autor, Fecha, Contenido and Enlaces.
+        :type data: dict
+        :param content_hash: The hash of the article content.
+        :type content_hash: str | None
+        """
+
+        self.save_many([(url, data, content_hash)])
+
+    def save_many(self, articles: Iterable[tuple[str, dict, str | None]]):
+        """
+        Save the given articles in a single transaction.
+
+        :param articles: The URL, extracted data and content hash of each article.
+        :type articles: Iterable[tuple[str, dict, str | None]]
+        """
+
+        self.apply_changes(articles, [])
+
+    def apply_changes(self, saved_articles: Iterable[tuple[str, dict, str | None]], deleted_urls: Iterable[str], clear: bool = False):
+        """
+        Save and delete the given articles in a single transaction, so the readers of the store never see only part of the changes.
+
+        :param saved_articles: The URL, extracted data and content hash of each article to save.
+        :type saved_articles: Iterable[tuple[str, dict, str | None]]
+        :param deleted_urls: The URLs of the articles to delete.
+        :type deleted_urls: Iterable[str]
+        :param clear: Whether to delete every stored article before saving the given ones.
+        :type clear: bool
+        """
+
+        fetched_at: float = time.time()
+
+        rows: list[tuple] = [
+            (
+                canonicalize_url(url),
+                str(data.get("Título") or ""),
+                str(data.get("Autor") or ""),
+                str(data.get("Fecha") or ""),
+                str(data.get("Contenido") or ""),
+                json.dumps(data.get("Enlaces", []), ensure_ascii=False),
+                content_hash,
+                fetched_at,
+            )
+            for url, data, content_hash in saved_articles
+        ]
+
+        with self.lock, self.connection:
+            if clear:
+                self.connection.execute("DELETE FROM articles")
+
+            self.connection.executemany("DELETE FROM articles WHERE url = ?", [(canonicalize_url(url),) for url in deleted_urls])
+            self.connection.executemany(UPSERT_QUERY, rows)
+
+    def get(self, url: str) -> dict | None:
+        """
+        Get the stored article of the given URL.
+
+        :param url: The URL of the article.
+        :type url: str
+        :return: The article (see `row_to_article`), or None if the URL is not stored.
+        :rtype: dict | None
+        """
+
+        with self.lock:
+            row: tuple | None = self.connection.execute(
+                f"SELECT {SELECT_COLUMNS} FROM articles WHERE url = ?", (canonicalize_url(url),)
+            ).fetchone()
+
+        return row_to_article(row) if row is not None else None
+
+    def iter_articles(self, batch_size: int = 256) -> Iterator[dict]:
+        """
+        Iterate over the stored articles, reading them from the database in batches so they are never all in memory at once.
+
+        :param batch_size: The number of articles read from the database at a time.
+        :type batch_size: int
+        :return: The articles, in the order they were first stored.
+        :rtype: Iterator[dict]
+        """
+
+        last_rowid: int = 0
+
+        while True:
+            with self.lock:
+                rows: list[tuple] = self.connection.execute(
+                    f"SELECT rowid, {SELECT_COLUMNS} FROM articles WHERE rowid > ? ORDER BY rowid LIMIT ?", (last_rowid, batch_size)
+                ).fetchall()
+
+            if len(rows) == 0:
+                return
+
+            last_rowid = rows[-1][0]
+
+            for row in rows:
+                yield row_to_article(row[1:])
+
+    def delete(self, url: str):
+        """
+        Delete the stored article of the given URL.
+
+        :param url: The URL of the article.
+        :type url: str
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM articles WHERE url = ?", (canonicalize_url(url),))
+
+    def clear(self):
+        """
+        Delete every stored article.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM articles")
+
+    def count(self) -> int:
+        """
+        Count the stored articles.
+
+        :return: The number of articles.
+        :rtype: int
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+
+        with self.lock:
+            self.connection.close()
+
+
+def row_to_article(row: tuple) -> dict:
+    """
+    Convert a row of the articles table into an article.
+
+    :param row: The row, with the columns in the order of `SELECT_COLUMNS`.
+    :type row: tuple
+    :return: The article, with the keys url, content_hash, fetched_at and data (the extracted data, in the format returned by the scraper).
+    :rtype: dict
+    """
+
+    url, title, author, date, content, links, content_hash, fetched_at = row
+
+    return {
+        "url": url,
+        "content_hash": content_hash,
+        "fetched_at": fetched_at,
+        "data": {
+            "Título": title or "",
+            "Autor": author or "",
+            "Fecha": date or "",
+            "Contenido": content or "",
+            "Enlaces": json.loads(links) if links else [],
+        },
+    }
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Get the canonical form of the given URL, so the same article is stored once however its URL is written.
+
+    The scheme and host are lowercased, the default port and the fragment are removed, and an empty path becomes "/".
+
+    :param url: The URL.
+    :type url: str
+    :return: The canonical URL.
+    :rtype: str
+    """
+
+    parts = urlsplit(url.strip())
+    scheme: str = parts.scheme.lower()
+    netloc: str = (parts.hostname or "").lower()
+
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+
+    if parts.username:
+        credentials: str = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{credentials}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def get_site(url: str) -> str:
+    """
+    Get the site of the given URL: its host, without the "www." prefix.
+
+    :param url: The URL.
+    :type url: str
+    :return: The site.
+    :rtype: str
+    """
+
+    host: str = urlsplit(canonicalize_url(url)).hostname or ""
+
+    return host.removeprefix("www.")
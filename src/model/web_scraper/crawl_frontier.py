@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+
+from model.web_scraper.article_store import canonicalize_url
+
+FRONTIER_FILE_NAME: str = "frontier.db"
+
+PRIORITIES: dict[str, str] = {
+    "links": "inlinks DESC, discovered_at DESC",
+    "newest": "discovered_at DESC, inlinks DESC",
+}
+
+CREATE_TABLE_QUERY: str = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    inlinks INTEGER NOT NULL DEFAULT 0,
+    discovered_at REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    visited_at REAL,
+    error TEXT
+)
+"""
+
+# The visited-set index: the state lookups and the pending queue in priority order are served from it.
+CREATE_INDEX_QUERIES: list[str] = [
+    "CREATE INDEX IF NOT EXISTS frontier_links ON frontier (state, inlinks DESC, discovered_at DESC)",
+    "CREATE INDEX IF NOT EXISTS frontier_newest ON frontier (state, discovered_at DESC, inlinks DESC)",
+]
+
+ADD_LINK_QUERY: str = """
+INSERT INTO frontier (url, depth, inlinks, discovered_at) VALUES (?, ?, 1, ?)
+ON CONFLICT(url) DO UPDATE SET
+    inlinks = inlinks + 1,
+    depth = MIN(depth, excluded.depth)
+"""
+
+ADD_SEED_QUERY: str = """
+INSERT INTO frontier (url, depth, discovered_at) VALUES (?, 0, ?)
+ON CONFLICT(url) DO UPDATE SET
+    depth = 0,
+    state = 'pending'
+"""
+
+
+class CrawlFrontier:
+    """
+    CrawlFrontier is the persistent queue of a crawl, saved in a single SQLite file.
+
+    Every URL is stored once, in its canonical form, with the depth at which it was found, the number of visited pages that link to it and its state: pending, visited or failed. The pending URLs are taken in priority order, either the most linked or the most recently discovered first. Since visited URLs are kept, a page is never fetched twice, even across crawls; only the seeds are visited again, to discover new links.
+    """
+
+    def __init__(self, frontier_path: str):
+        self.FRONTIER_PATH: str = frontier_path
+
+        frontier_dir: str = os.path.dirname(self.FRONTIER_PATH)
+
+        if frontier_dir and not os.path.exists(frontier_dir):
+            os.makedirs(frontier_dir)
+
+        self.connection: sqlite3.Connection = sqlite3.connect(self.FRONTIER_PATH, check_same_thread=False)
+        self.lock: threading.Lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(CREATE_TABLE_QUERY)
+
+            for query in CREATE_INDEX_QUERIES:
+                self.connection.execute(query)
+
+    def add_seeds(self, urls: list[str]):
+        """
+        Add the given URLs as seeds of the crawl, at depth 0. Seeds are pending again even if they were visited before.
+
+        :param urls: The seed URLs.
+        :type urls: list[str]
+        """
+
+        discovered_at: float = time.time()
+
+        with self.lock, self.connection:
+            self.connection.executemany(ADD_SEED_QUERY, [(canonicalize_url(url), discovered_at) for url in urls])
+
+    def add_links(self, urls: list[str], depth: int):
+        """
+        Add the links found in a visited page. A link that is already in the frontier is not added again, but its link count goes up.
+
+        :param urls: The links, already filtered.
+        :type urls: list[str]
+        :param depth: The depth of the links, one more than the page where they were found.
+        :type depth: int
+        """
+
+        discovered_at: float = time.time()
+        canonical_urls: list[str] = list(dict.fromkeys(canonicalize_url(url) for url in urls))
+
+        with self.lock, self.connection:
+            self.connection.executemany(ADD_LINK_QUERY, [(url, depth, discovered_at) for url in canonical_urls])
+
+    def get_pending(self, limit: int, priority: str = "links") -> list[tuple[str, int]]:
+        """
+        Get the next pending URLs, in priority order.
+
+        :param limit: The maximum number of URLs.
+        :type limit: int
+        :param priority: "links" to get the most linked URLs first, or "newest" to get the most recently discovered first.
+        :type priority: str
+        :return: The URLs and their depth.
+        :rtype: list[tuple[str, int]]
+        :raises ValueError: If the priority is not valid.
+        """
+
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority: {priority}. Expected one of: {', '.join(PRIORITIES)}")
+
+        with self.lock:
+            return self.connection.execute(
+                f"SELECT url, depth FROM frontier WHERE state = 'pending' ORDER BY {PRIORITIES[priority]} LIMIT ?", (limit,)
+            ).fetchall()
+
+    def mark_visited(self, url: str):
+        """
+        Mark the given URL as visited.
+
+        :param url: The URL.
+        :type url: str
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE frontier SET state = 'visited', visited_at = ?, error = NULL WHERE url = ?", (time.time(), canonicalize_url(url))
+            )
+
+    def mark_failed(self, url: str, error: str):
+        """
+        Mark the given URL as failed, so it is not taken again.
+
+        :param url: The URL.
+        :type url: str
+        :param error: The error message.
+        :type error: str
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE frontier SET state = 'failed', visited_at = ?, error = ? WHERE url = ?", (time.time(), error, canonicalize_url(url))
+            )
+
+    def is_visited(self, url: str) -> bool:
+        """
+        Check if the given URL was already visited.
+
+        :param url: The URL.
+        :type url: str
+        :return: True if the URL was visited, False otherwise.
+        :rtype: bool
+        """
+
+        with self.lock:
+            row: tuple | None = self.connection.execute(
+                "SELECT 1 FROM frontier WHERE url = ? AND state = 'visited'", (canonicalize_url(url),)
+            ).fetchone()
+
+        return row is not None
+
+    def get_urls(self, state: str) -> list[str]:
+        """
+        Get the URLs in the given state.
+
+        :param state: The state: pending, visited or failed.
+        :type state: str
+        :return: The URLs, in the order they were discovered.
+        :rtype: list[str]
+        """
+
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT url FROM frontier WHERE state = ? ORDER BY rowid", (state,))]
+
+    def count(self, state: str) -> int:
+        """
+        Count the URLs in the given state.
+
+        :param state: The state: pending, visited or failed.
+        :type state: str
+        :return: The number of URLs.
+        :rtype: int
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM frontier WHERE state = ?", (state,)).fetchone()[0]
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+
+        with self.lock:
+            self.connection.close()
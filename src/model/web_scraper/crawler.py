@@ -0,0 +1,174 @@
+"""
+Crawl mode of the scraper.
+
+Starting from the seed URLs, scrapes the pages in batches and follows the links extracted from each article (`Enlaces`), so the corpus grows without maintaining the list of URLs by hand. The frontier is persistent, so a crawl can be resumed, and the visited pages are never fetched again by the crawler; only the seeds are, to find the new articles they link to. The refresh of the knowledge base (see `refresh_knowledge_base`) indexes the visited pages along with its list of URLs, and keeps them up to date.
+
+Usage (from the src directory):
+
+    python -m model.web_scraper.crawler --seeds ../source_urls.txt --data ../data --max-pages 100 --max-depth 2
+"""
+
+from colorama import Fore
+
+import argparse
+import os
+from urllib.parse import urljoin, urlsplit
+
+from model.web_scraper.article_store import ArticleStore, ARTICLE_STORE_FILE_NAME, get_site
+from model.web_scraper.crawl_frontier import CrawlFrontier, FRONTIER_FILE_NAME, PRIORITIES
+from model.web_scraper.response_cache import ResponseCache
+from model.web_scraper.scrape_metrics import ScrapeMetrics
+from model.web_scraper.web_scraper import is_data_path, load_urls, scrape_pages_concurrently
+
+SKIPPED_EXTENSIONS: tuple[str, ...] = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".pdf", ".zip",
+    ".mp3", ".mp4", ".avi", ".mov", ".css", ".js", ".xml", ".rss",
+)
+
+
+def crawl_pages(data_path: str, seeds_path: str | list[str], max_pages: int = 100, max_depth: int = 2, same_site: bool = True, priority: str = "links", batch_size: int = 8, retry: bool = True, cache: ResponseCache | None = None, metrics: ScrapeMetrics | None = None) -> dict:
+    """
+    Crawl the pages reachable from the seed URLs, saving the extracted articles in the article store of the data path.
+
+    The pending URLs are scraped in batches with `scrape_pages_concurrently`. The links of every scraped article are resolved, canonicalized and added to the frontier, unless they are deeper than the depth limit, point to another site (if `same_site`) or are not web pages.
+
+    :param data_path: The path to save the extracted data and the frontier.
+    :type data_path: str
+    :param seeds_path: The path to the file containing the seed URLs or a list with the urls.
+    :type seeds_path: str | list[str]
+    :param max_pages: The maximum number of pages to scrape in this crawl, seeds included.
+    :type max_pages: int
+    :param max_depth: The maximum number of links between a seed and a scraped page.
+    :type max_depth: int
+    :param same_site: Whether to follow only the links to the sites of the seeds.
+    :type same_site: bool
+    :param priority: The order of the pending URLs: "links" (most linked first) or "newest" (most recently discovered first).
+    :type priority: str
+    :param batch_size: The number of pages scraped concurrently.
+    :type batch_size: int
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param cache: The response cache used to skip the pages that did not change. If None, every page is downloaded and extracted.
+    :type cache: ResponseCache | None
+    :param metrics: The metrics where the duration of each stage, and the counters, of every URL are recorded.
+    :type metrics: ScrapeMetrics | None
+    :return: The summary of the crawl, with the visited URLs, the failed URLs mapped to their error message, and the number of URLs still pending in the frontier.
+    :rtype: dict
+    :raises ValueError: If the priority is not valid.
+    """
+
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid priority: {priority}. Expected one of: {', '.join(PRIORITIES)}")
+
+    is_data_path(data_path)
+
+    SEED_URLS: list[str] = load_urls(seeds_path) if isinstance(seeds_path, str) else seeds_path
+    SEED_URLS = [url for url in SEED_URLS if url]
+
+    allowed_hosts: set[str] = {get_site(url) for url in SEED_URLS}
+
+    frontier: CrawlFrontier = CrawlFrontier(os.path.join(data_path, FRONTIER_FILE_NAME))
+    frontier.add_seeds(SEED_URLS)
+
+    summary: dict = {
+        "visited": [],
+        "failed": {},
+        "pending": 0,
+    }
+
+    try:
+        while len(summary["visited"]) + len(summary["failed"]) < max_pages:
+            remaining: int = max_pages - len(summary["visited"]) - len(summary["failed"])
+            batch: list[tuple[str, int]] = frontier.get_pending(min(batch_size, remaining), priority)
+
+            if len(batch) == 0:
+                break
+
+            failed_urls: dict[str, str] = scrape_pages_concurrently(
+                data_path, [url for url, _ in batch], retry, cache=cache, metrics=metrics
+            )
+
+            store: ArticleStore = ArticleStore(os.path.join(data_path, ARTICLE_STORE_FILE_NAME))
+
+            for url, depth in batch:
+                if url in failed_urls:
+                    frontier.mark_failed(url, failed_urls[url])
+                    summary["failed"][url] = failed_urls[url]
+                    continue
+
+                frontier.mark_visited(url)
+                summary["visited"].append(url)
+
+                article: dict | None = store.get(url)
+
+                if article is None or depth >= max_depth:
+                    continue
+
+                links: list[str] = [
+                    link for link in (urljoin(url, href) for href in article["data"]["Enlaces"])
+                    if is_crawlable(link, allowed_hosts if same_site else None)
+                ]
+
+                frontier.add_links(links, depth + 1)
+
+            store.close()
+
+        summary["pending"] = frontier.count("pending")
+
+    finally:
+        frontier.close()
+
+    print(Fore.CYAN, f"Rastreo terminado: {len(summary['visited'])} visitadas, {len(summary['failed'])} fallidas, {summary['pending']} pendientes.")
+
+    return summary
+
+
+def is_crawlable(url: str, allowed_hosts: set[str] | None = None) -> bool:
+    """
+    Check if the given link should be added to the frontier.
+
+    :param url: The absolute URL of the link.
+    :type url: str
+    :param allowed_hosts: The sites the link can point to. If None, any site is allowed.
+    :type allowed_hosts: set[str] | None
+    :return: True if the link is an HTTP(S) web page on an allowed site, False otherwise.
+    :rtype: bool
+    """
+
+    parts = urlsplit(url)
+
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False
+
+    if parts.path.lower().endswith(SKIPPED_EXTENSIONS):
+        return False
+
+    return allowed_hosts is None or get_site(url) in allowed_hosts
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Crawl the pages linked from the seed URLs.")
+    parser.add_argument("--seeds", default="source_urls.txt", help="File with the seed URLs.")
+    parser.add_argument("--data", default="data", help="Directory of the article store and the frontier.")
+    parser.add_argument("--cache", default=".cache/responses", help="Directory of the response cache.")
+    parser.add_argument("--max-pages", type=int, default=100, help="Maximum number of pages to scrape.")
+    parser.add_argument("--max-depth", type=int, default=2, help="Maximum number of links from a seed.")
+    parser.add_argument("--priority", choices=list(PRIORITIES), default="links", help="Order of the pending URLs.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of pages scraped concurrently.")
+    parser.add_argument("--all-sites", action="store_true", help="Follow links to other sites.")
+    args: argparse.Namespace = parser.parse_args()
+
+    crawl_pages(
+        args.data,
+        args.seeds,
+        max_pages=args.max_pages,
+        max_depth=args.max_depth,
+        same_site=not args.all_sites,
+        priority=args.priority,
+        batch_size=args.batch_size,
+        cache=ResponseCache(args.cache),
+    )
+
+
+if __name__ == "__main__":
+    main()
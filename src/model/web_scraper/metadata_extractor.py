@@ -0,0 +1,158 @@
+from bs4 import BeautifulSoup
+
+import json
+
+ARTICLE_TYPES: frozenset[str] = frozenset([
+    "NewsArticle", "Article", "ReportageNewsArticle", "AnalysisNewsArticle",
+    "OpinionNewsArticle", "BackgroundNewsArticle", "BlogPosting", "Report"
+])
+
+TITLE_META_KEYS: list[str] = ["og:title", "twitter:title", "title"]
+AUTHOR_META_KEYS: list[str] = ["author", "article:author", "og:article:author", "parsely-author", "sailthru.author", "dc.creator"]
+DATE_META_KEYS: list[str] = [
+    "article:published_time", "og:article:published_time", "datepublished", "publish-date",
+    "pubdate", "parsely-pub-date", "sailthru.date", "dc.date", "date"
+]
+
+
+def extract_structured_metadata(soup: BeautifulSoup) -> dict[str, str]:
+    """
+    Extract the title, author and publication date of a news article from the structured metadata of its page.
+
+    The JSON-LD `NewsArticle` (or any other article type) is read first, and the OpenGraph and `article:*` meta tags are used for the fields it does not have. It must be called before the page is cleaned, since the cleaning removes the `script` and `meta` tags.
+
+    :param soup: The parsed page.
+    :type soup: BeautifulSoup
+    :return: The fields found, with the keys Título, Autor and Fecha. The fields that were not found are not included.
+    :rtype: dict[str, str]
+    """
+
+    metadata: dict[str, str] = extract_json_ld_metadata(soup)
+
+    for field, value in extract_meta_tags_metadata(soup).items():
+        metadata.setdefault(field, value)
+
+    return metadata
+
+
+def extract_json_ld_metadata(soup: BeautifulSoup) -> dict[str, str]:
+    """
+    Extract the title, author and publication date from the JSON-LD blocks of the page.
+
+    :param soup: The parsed page.
+    :type soup: BeautifulSoup
+    :return: The fields found, with the keys Título, Autor and Fecha.
+    :rtype: dict[str, str]
+    """
+
+    metadata: dict[str, str] = {}
+
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except json.JSONDecodeError:
+            continue
+
+        for item in iter_json_ld_items(data):
+            item_types: str | list[str] = item.get("@type", [])
+            item_types = [item_types] if isinstance(item_types, str) else item_types
+
+            if not ARTICLE_TYPES.intersection(item_types):
+                continue
+
+            title: str = item.get("headline") or item.get("name") or ""
+            author: str = get_json_ld_author(item.get("author"))
+            date: str = item.get("datePublished") or item.get("dateCreated") or ""
+
+            if isinstance(title, str) and title.strip():
+                metadata.setdefault("Título", title.strip())
+
+            if author:
+                metadata.setdefault("Autor", author)
+
+            if isinstance(date, str) and date.strip():
+                metadata.setdefault("Fecha", date.strip())
+
+    return metadata
+
+
+def iter_json_ld_items(data) -> list[dict]:
+    """
+    Flatten the given JSON-LD data into the list of its objects, following lists, `@graph` and `mainEntity`.
+
+    :param data: The parsed JSON-LD data.
+    :return: The JSON-LD objects.
+    :rtype: list[dict]
+    """
+
+    items: list[dict] = []
+    pending: list = [data]
+
+    while pending:
+        current = pending.pop(0)
+
+        if isinstance(current, list):
+            pending.extend(current)
+
+        elif isinstance(current, dict):
+            items.append(current)
+
+            for key in ("@graph", "mainEntity"):
+                if key in current:
+                    pending.append(current[key])
+
+    return items
+
+
+def get_json_ld_author(author) -> str:
+    """
+    Get the author names from the `author` property of a JSON-LD article.
+
+    :param author: The author property: a string, an object with a name, or a list of them.
+    :return: The author names, separated by commas, or an empty string.
+    :rtype: str
+    """
+
+    authors: list = author if isinstance(author, list) else [author]
+    names: list[str] = []
+
+    for item in authors:
+        name = item.get("name") if isinstance(item, dict) else item
+
+        if isinstance(name, str) and name.strip() and not name.startswith("http"):
+            names.append(name.strip())
+
+    return ", ".join(dict.fromkeys(names))
+
+
+def extract_meta_tags_metadata(soup: BeautifulSoup) -> dict[str, str]:
+    """
+    Extract the title, author and publication date from the meta tags of the page (OpenGraph, `article:*` and similar).
+
+    :param soup: The parsed page.
+    :type soup: BeautifulSoup
+    :return: The fields found, with the keys Título, Autor and Fecha.
+    :rtype: dict[str, str]
+    """
+
+    meta_values: dict[str, str] = {}
+
+    for meta in soup.find_all("meta"):
+        key: str = meta.get("property") or meta.get("name") or meta.get("itemprop") or ""
+        content: str = meta.get("content") or meta.get("datetime") or ""
+
+        if key and content.strip():
+            meta_values.setdefault(key.lower(), content.strip())
+
+    metadata: dict[str, str] = {}
+
+    for field, keys in (("Título", TITLE_META_KEYS), ("Autor", AUTHOR_META_KEYS), ("Fecha", DATE_META_KEYS)):
+        for key in keys:
+            value: str | None = meta_values.get(key)
+
+            # article:author is often the URL of the author profile instead of the name.
+            if value and not value.startswith("http"):
+                metadata[field] = value
+                break
+
+    return metadata
@@ -0,0 +1,176 @@
+from bs4.element import Tag
+
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DATE_PATTERN: re.Pattern = re.compile(
+    r"\b("
+    r"\d{1,2} de [a-záéíóú]+ de \d{4}"
+    r"|[a-záéíóú]+ \d{1,2} (?:de )?\d{4}"
+    r"|[a-z]+ \d{1,2}, \d{4}"
+    r"|\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2})?)?"
+    r"|\d{1,2}/\d{1,2}/\d{2,4}"
+    r")\b",
+    re.IGNORECASE,
+)
+
+BYLINE_PATTERN: re.Pattern = re.compile(r"^(por|by|autor|autora|redacción|redactado por)\b", re.IGNORECASE)
+
+MAX_CANDIDATES: int = 5
+MAX_CANDIDATE_LENGTH: int = 120
+
+# Input tokens of the extraction prompts, before and after compacting them.
+prompt_stats: dict[str, int] = {"pages": 0, "tokens_before": 0, "tokens_after": 0}
+prompt_stats_lock: threading.Lock = threading.Lock()
+
+encoding = None
+encoding_loaded: bool = False
+
+
+def get_encoding():
+    """
+    Get the tiktoken encoding used to count tokens, loading it on the first call.
+
+    :return: The encoding, or None if tiktoken is not installed or its encoding files could not be loaded (e.g. offline).
+    """
+
+    global encoding, encoding_loaded
+
+    if not encoding_loaded:
+        encoding_loaded = True
+
+        try:
+            encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+        except Exception:
+            encoding = None
+
+    return encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of the given text.
+
+    The count is exact for the OpenAI tokenizer and a close estimate for the Llama models, which is enough to keep the prompts within a budget. If tiktoken is not available, it is estimated as one token every 4 characters.
+
+    :param text: The text.
+    :type text: str
+    :return: The number of tokens.
+    :rtype: int
+    """
+
+    token_encoding = get_encoding()
+
+    if token_encoding is None:
+        return (len(text) + 3) // 4
+
+    return len(token_encoding.encode(text, disallowed_special=()))
+
+
+def is_author_link(href: str) -> bool:
+    """
+    Check if the given link points to the profile of an author.
+
+    :param href: The link.
+    :type href: str
+    :return: True if the link looks like an author profile, False otherwise.
+    :rtype: bool
+    """
+
+    href = str(href).lower()
+
+    return "author" in href or "autor" in href
+
+
+def compact_page_content(clean_content: Tag, link_tags: list[Tag], token_budget: int) -> str:
+    """
+    Build a compact, plain-text representation of the page for the extraction prompt.
+
+    Instead of the whole cleaned HTML, it contains only what is needed to find the title, author and date: the headline, the author links, the byline and date candidates, and the beginning of the text (the headline region). The result is cut at the given token budget, in that order of priority.
+
+    :param clean_content: The cleaned page content.
+    :type clean_content: Tag
+    :param link_tags: The links of the cleaned page.
+    :type link_tags: list[Tag]
+    :param token_budget: The maximum number of tokens of the result.
+    :type token_budget: int
+    :return: The compact representation of the page.
+    :rtype: str
+    """
+
+    h1: Tag | None = clean_content.find("h1")
+    headline: str = h1.get_text(" ", strip=True) if h1 else ""
+
+    text_lines: list[str] = [line.strip() for line in clean_content.get_text("\n").split("\n") if line.strip()]
+
+    author_links: list[str] = [
+        f"{a.get_text(' ', strip=True)} ({a['href']})" for a in link_tags if is_author_link(a["href"])
+    ]
+
+    bylines: list[str] = [
+        line for line in text_lines if len(line) <= MAX_CANDIDATE_LENGTH and BYLINE_PATTERN.match(line)
+    ]
+
+    dates: list[str] = [time_tag.get("datetime") or time_tag.get_text(" ", strip=True) for time_tag in clean_content.find_all("time")]
+    dates += DATE_PATTERN.findall("\n".join(text_lines))
+
+    lines: list[str] = []
+
+    if headline:
+        lines.append(f"Titular: {headline}")
+
+    for label, candidates in (("Enlaces de autor", author_links), ("Posibles autores", bylines), ("Posibles fechas", dates)):
+        candidates = [candidate for candidate in dict.fromkeys(candidates) if candidate][:MAX_CANDIDATES]
+
+        if candidates:
+            lines.append(f"{label}: " + " | ".join(candidates))
+
+    lines.append("Inicio del texto:")
+    lines += text_lines
+
+    compact_lines: list[str] = []
+    used_tokens: int = 0
+
+    for line in lines:
+        line_tokens: int = count_tokens(line) + 1
+
+        if used_tokens + line_tokens > token_budget:
+            break
+
+        compact_lines.append(line)
+        used_tokens += line_tokens
+
+    return "\n".join(compact_lines)
+
+
+def record_prompt_tokens(tokens_before: int, tokens_after: int):
+    """
+    Record the input tokens of an extraction prompt, before and after compacting it.
+
+    :param tokens_before: The tokens of the prompt with the whole cleaned HTML.
+    :type tokens_before: int
+    :param tokens_after: The tokens of the compacted prompt.
+    :type tokens_after: int
+    """
+
+    with prompt_stats_lock:
+        prompt_stats["pages"] += 1
+        prompt_stats["tokens_before"] += tokens_before
+        prompt_stats["tokens_after"] += tokens_after
+
+
+def get_prompt_stats() -> dict[str, int]:
+    """
+    Get the input tokens of the extraction prompts sent since the process started, before and after compacting them. Only the prompts of the pages scraped with metrics are measured (see `parse_page`).
+
+    :return: The number of prompts and the total tokens before and after compacting them.
+    :rtype: dict[str, int]
+    """
+
+    with prompt_stats_lock:
+        return dict(prompt_stats)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+
+
+class ResponseCache:
+    """
+    ResponseCache is an on-disk cache of the scraped pages.
+
+    For each URL it stores the validators sent by the server (ETag and Last-Modified) and the data extracted from the page. They are used to send conditional requests, so an unchanged page answers with a 304 and its data can be reused without downloading, parsing or extracting it again.
+    """
+
+    def __init__(self, cache_path: str = ".cache/responses"):
+        self.CACHE_PATH: str = cache_path
+
+        if not os.path.exists(self.CACHE_PATH):
+            os.makedirs(self.CACHE_PATH)
+
+    def get(self, url: str) -> dict | None:
+        """
+        Get the cached entry of the given URL.
+
+        :param url: The URL of the page.
+        :type url: str
+        :return: The cached entry, with the keys url, etag, last_modified and data, or None if the URL is not cached.
+        :rtype: dict | None
+        """
+
+        file_path: str = self.get_entry_path(url)
+
+        if not os.path.exists(file_path):
+            return None
+
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                entry: dict = json.load(file)
+
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        return entry if entry.get("url") == url else None
+
+    def get_conditional_headers(self, url: str) -> dict[str, str]:
+        """
+        Get the headers to make a conditional request for the given URL.
+
+        :param url: The URL of the page.
+        :type url: str
+        :return: The If-None-Match and If-Modified-Since headers, if the URL is cached.
+        :rtype: dict[str, str]
+        """
+
+        entry: dict | None = self.get(url)
+        headers: dict[str, str] = {}
+
+        if entry is None:
+            return headers
+
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def save(self, url: str, etag: str | None, last_modified: str | None, data: dict):
+        """
+        Save the validators and the extracted data of the given URL.
+
+        Nothing is saved if the server did not send any validator, since the page could never be revalidated.
+
+        :param url: The URL of the page.
+        :type url: str
+        :param etag: The ETag header sent by the server.
+        :type etag: str | None
+        :param last_modified: The Last-Modified header sent by the server.
+        :type last_modified: str | None
+        :param data: The data extracted from the page.
+        :type data: dict
+        """
+
+        if not etag and not last_modified:
+            return
+
+        entry: dict = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "data": data,
+        }
+
+        file_path: str = self.get_entry_path(url)
+        tmp_path: str = f"{file_path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file, ensure_ascii=False)
+
+        os.replace(tmp_path, file_path)
+
+    def get_entry_path(self, url: str) -> str:
+        """
+        Get the path of the file that stores the entry of the given URL.
+
+        :param url: The URL of the page.
+        :type url: str
+        :return: The path of the entry file.
+        :rtype: str
+        """
+
+        url_hash: str = hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+        return os.path.join(self.CACHE_PATH, f"{url_hash}.json")
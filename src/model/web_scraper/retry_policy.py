@@ -0,0 +1,138 @@
+from colorama import Fore
+
+import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES: frozenset[int] = frozenset([408, 409, 429, 500, 502, 503, 504])
+
+
+class RetryPolicy:
+    """
+    RetryPolicy retries a call that can fail, waiting between attempts according to the kind of error.
+
+    - Malformed JSON responses from the model are retried right away, since asking again is enough.
+    - Rate limit (429) responses wait for the time in their Retry-After header.
+    - Other transport and server errors wait with exponential backoff and jitter.
+    - Client errors that will not succeed on retry (e.g. 400 or 401) are raised right away.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.MAX_ATTEMPTS: int = max_attempts
+        self.BASE_DELAY: float = base_delay
+        self.MAX_DELAY: float = max_delay
+
+    def run(self, function: Callable[[], T], on_retry: Callable[[int, Exception], None] | None = None) -> T:
+        """
+        Call the given function until it succeeds or the attempts run out.
+
+        :param function: The function to call.
+        :type function: Callable[[], T]
+        :param on_retry: The function called with the attempt number and the error before each retry.
+        :type on_retry: Callable[[int, Exception], None] | None
+        :return: The result of the function.
+        :rtype: T
+        :raises Exception: The last error, if every attempt failed or the error is not retryable.
+        """
+
+        attempt: int = 1
+
+        while True:
+            try:
+                return function()
+
+            except Exception as e:
+                if attempt >= self.MAX_ATTEMPTS or not self.is_retryable(e):
+                    raise
+
+                delay: float = self.get_delay(attempt, e)
+
+                if on_retry is not None:
+                    on_retry(attempt, e)
+
+                print(Fore.RED, f"\nError (intento {attempt}/{self.MAX_ATTEMPTS}): {e}\nReintentando en {delay:.1f} segs...")
+
+                time.sleep(delay)
+                attempt += 1
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Check if the given error can succeed on retry.
+
+        :param error: The error.
+        :type error: Exception
+        :return: False for HTTP errors with a non-retryable status code, True otherwise.
+        :rtype: bool
+        """
+
+        status_code: int | None = getattr(error, "status_code", None)
+
+        return status_code is None or status_code in RETRYABLE_STATUS_CODES
+
+    def get_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Get the time to wait before the next attempt.
+
+        :param attempt: The number of the attempt that failed, starting at 1.
+        :type attempt: int
+        :param error: The error of the attempt.
+        :type error: Exception
+        :return: The delay, in seconds.
+        :rtype: float
+        """
+
+        if isinstance(error, json.JSONDecodeError):
+            return 0.0
+
+        retry_after: float | None = get_retry_after(error)
+
+        if retry_after is not None:
+            return min(retry_after, self.MAX_DELAY)
+
+        backoff: float = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** (attempt - 1))
+
+        # Equal jitter: at least half the backoff, so retries from concurrent workers spread out without retrying too early.
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """
+    Get the Retry-After header of the response of the given error.
+
+    :param error: The error, usually an API status error with a `response` attribute.
+    :type error: Exception
+    :return: The time to wait, in seconds, or None if the header is missing or invalid.
+    :rtype: float | None
+    """
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+
+    if not headers:
+        return None
+
+    retry_after: str | None = headers.get("retry-after")
+
+    if retry_after is None:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        retry_date: datetime = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+    # A date in the "-0000" zone is parsed without a time zone, but it is still UTC.
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
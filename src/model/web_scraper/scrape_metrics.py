@@ -0,0 +1,221 @@
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import ContextManager, Iterator
+
+COUNTERS: list[str] = ["bytes_downloaded", "tokens_sent", "tokens_received", "retries"]
+
+
+class UrlMetrics:
+    """
+    UrlMetrics holds the measurements of a single URL during a scraping run: the duration of each stage and the counters (bytes downloaded, tokens sent and received, and retries).
+    """
+
+    def __init__(self, url: str):
+        self.URL: str = url
+        self.durations: dict[str, float] = {}
+        self.counters: dict[str, int] = {counter: 0 for counter in COUNTERS}
+        self.error: str | None = None
+
+        self.lock: threading.Lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """
+        Measure the duration of the code inside the `with` block as the given stage. If the stage is measured more than once, the durations are added.
+
+        :param stage: The name of the stage.
+        :type stage: str
+        """
+
+        start: float = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed: float = time.perf_counter() - start
+
+            with self.lock:
+                self.durations[stage] = self.durations.get(stage, 0.0) + elapsed
+
+    def add(self, counter: str, value: int):
+        """
+        Add the given value to a counter.
+
+        :param counter: The name of the counter: bytes_downloaded, tokens_sent, tokens_received or retries.
+        :type counter: str
+        :param value: The value to add.
+        :type value: int
+        """
+
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set_error(self, error: Exception):
+        """
+        Mark the URL as failed.
+
+        :param error: The error that made it fail.
+        :type error: Exception
+        """
+
+        with self.lock:
+            self.error = str(error)
+
+    def to_dict(self) -> dict:
+        """
+        Get the measurements as a dictionary.
+
+        :return: The URL, the duration of each stage, the counters and the error, if any.
+        :rtype: dict
+        """
+
+        with self.lock:
+            return {
+                "url": self.URL,
+                "durations": {stage: round(duration, 4) for stage, duration in self.durations.items()},
+                **self.counters,
+                "error": self.error,
+            }
+
+
+class ScrapeMetrics:
+    """
+    ScrapeMetrics collects the per-URL measurements of a scraping run and summarizes them.
+
+    The summary has, for each stage, the p50, p95, mean and total duration, and the totals of the counters. The run can be saved as a JSON report (summary and measurements) and a CSV report (one row per URL) to track the ingest performance over time.
+    """
+
+    def __init__(self):
+        self.started_at: datetime = datetime.now()
+        self.records: dict[str, UrlMetrics] = {}
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_record(self, url: str) -> UrlMetrics:
+        """
+        Get the measurements of the given URL, creating them if needed.
+
+        :param url: The URL.
+        :type url: str
+        :return: The measurements of the URL.
+        :rtype: UrlMetrics
+        """
+
+        with self.lock:
+            if url not in self.records:
+                self.records[url] = UrlMetrics(url)
+
+            return self.records[url]
+
+    def get_summary(self) -> dict:
+        """
+        Summarize the measurements of the run.
+
+        :return: The number of URLs and failed URLs, the duration stats of each stage and the totals of the counters.
+        :rtype: dict
+        """
+
+        with self.lock:
+            records: list[dict] = [record.to_dict() for record in self.records.values()]
+
+        stages: dict[str, list[float]] = {}
+
+        for record in records:
+            for stage, duration in record["durations"].items():
+                stages.setdefault(stage, []).append(duration)
+
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "urls": len(records),
+            "failed": sum(1 for record in records if record["error"]),
+            "stages": {
+                stage: {
+                    "count": len(durations),
+                    "p50": round(percentile(durations, 50), 4),
+                    "p95": round(percentile(durations, 95), 4),
+                    "mean": round(sum(durations) / len(durations), 4),
+                    "total": round(sum(durations), 4),
+                }
+                for stage, durations in stages.items()
+            },
+            "totals": {counter: sum(record[counter] for record in records) for counter in COUNTERS},
+        }
+
+    def save_report(self, reports_path: str) -> str:
+        """
+        Save the run as a JSON report and a CSV report in the given directory. Both files are named after the start time of the run.
+
+        :param reports_path: The directory to save the reports.
+        :type reports_path: str
+        :return: The path of the JSON report. The CSV report has the same path with the .csv extension.
+        :rtype: str
+        """
+
+        if not os.path.exists(reports_path):
+            os.makedirs(reports_path)
+
+        with self.lock:
+            records: list[dict] = [record.to_dict() for record in self.records.values()]
+
+        base_path: str = os.path.join(reports_path, f"scrape_report_{self.started_at.strftime('%Y%m%d_%H%M%S')}")
+        stage_names: list[str] = sorted({stage for record in records for stage in record["durations"]})
+
+        with open(f"{base_path}.json", "w", encoding="utf-8") as file:
+            json.dump({"summary": self.get_summary(), "urls": records}, file, indent=4, ensure_ascii=False)
+
+        with open(f"{base_path}.csv", "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["url", *[f"{stage}_seconds" for stage in stage_names], *COUNTERS, "error"])
+
+            for record in records:
+                writer.writerow([
+                    record["url"],
+                    *[record["durations"].get(stage, "") for stage in stage_names],
+                    *[record[counter] for counter in COUNTERS],
+                    record["error"] or "",
+                ])
+
+        return f"{base_path}.json"
+
+
+def measure(url_metrics: UrlMetrics | None, stage: str) -> ContextManager:
+    """
+    Measure a stage of the given URL, if its measurements are being collected.
+
+    :param url_metrics: The measurements of the URL, or None if the run is not being measured.
+    :type url_metrics: UrlMetrics | None
+    :param stage: The name of the stage.
+    :type stage: str
+    :return: The context manager that measures the stage.
+    :rtype: ContextManager
+    """
+
+    return url_metrics.measure(stage) if url_metrics is not None else nullcontext()
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+    Get the given percentile of the values, interpolating between the closest ranks.
+
+    :param values: The values.
+    :type values: list[float]
+    :param percent: The percentile, between 0 and 100.
+    :type percent: float
+    :return: The percentile, or 0 if there are no values.
+    :rtype: float
+    """
+
+    if len(values) == 0:
+        return 0.0
+
+    ordered: list[float] = sorted(values)
+    rank: float = (len(ordered) - 1) * percent / 100
+    lower: int = int(rank)
+    upper: int = min(lower + 1, len(ordered) - 1)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
@@ -0,0 +1,15 @@
+def load_urls(urls_path: str) -> list[str]:
+    """
+    Load the URLs to scrape from the given file path.
+
+    :param urls_path: The path to the file containing the URLs.
+    :type urls_path: str
+    :return: list of URLs to scrape.
+    :rtype: list[str]
+    """
+
+    with open(urls_path, "r") as file:
+        urls: list[str] = file.readlines()
+        urls = [url.strip() for url in urls]
+
+    return urls
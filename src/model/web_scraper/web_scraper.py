@@ -1,22 +1,70 @@
-from groq import Groq, APIStatusError
+from groq import Groq
 from groq.types.chat.chat_completion import ChatCompletion
-from openai import OpenAI
 
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 
 import requests
 from requests import Response
+from requests.adapters import HTTPAdapter
 
-from colorama import Fore, init
+import aiohttp
 
+from colorama import Fore
+
+import asyncio
+import hashlib
 import json
 import os
-import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+from model.web_scraper.article_store import ArticleStore, ARTICLE_STORE_FILE_NAME
+from model.web_scraper.response_cache import ResponseCache
+from model.web_scraper.retry_policy import RetryPolicy
+from model.web_scraper.metadata_extractor import extract_structured_metadata
+from model.web_scraper.prompt_compactor import compact_page_content, count_tokens, is_author_link, record_prompt_tokens, get_prompt_stats
+from model.web_scraper.scrape_metrics import ScrapeMetrics, UrlMetrics, measure
+from model.web_scraper.source_urls import load_urls
+
 load_dotenv()
 
+REQUEST_TIMEOUT: int = 30
+
+METADATA_FIELDS: list[str] = ["Título", "Autor", "Fecha"]
+
+PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "1024"))
+
+# How many pages took each extraction path: only structured metadata, structured metadata plus the LLM, or only the LLM.
+extraction_stats: dict[str, int] = {"structured": 0, "partial": 0, "llm": 0}
+extraction_stats_lock: threading.Lock = threading.Lock()
+
+# lxml parses faster, but its tree can differ from the one of html.parser on malformed pages, so it is opt-in.
+HTML_PARSER: str = os.getenv("HTML_PARSER", "html.parser")
+
+ATTRS_TO_REMOVE: frozenset[str] = frozenset([
+    "id", "class", "style", "data-fusion-component", "rel", 
+    "data-index", "data-type", "data-custom-type", "target", 
+    "dir", "lang"
+])
+
+TAGS_TO_REMOVE: frozenset[str] = frozenset([
+    "script", "svg", "img", "header", "footer", "iframe", 
+    "nav", "figure", "noscript", "meta", "button", "input", 
+    "style", "picture", "figcaption", "data-autor", "data-bloqueo", 
+    "data-board", "data-category", "data-clasecontenido", "data-editorial", 
+    "data-id", "data-name", "data-position", "data-publicacion", "data-redactorvisible", 
+    "data-seccion", "data-subseccion", "data-tipocontenido"
+])
+
+http_session: requests.Session | None = None
+
+groq_client: Groq | None = None
+groq_client_lock: threading.Lock = threading.Lock()
+
 CONTEXT_LLM: str = """
 Tu tarea es extraer información específica del siguiente texto (contenido scrapeado de una página web de una noticia): \n{page_content}
 Por favor, sigue estas instrucciones al pie de la letra:
@@ -28,14 +76,20 @@ Por favor, sigue estas instrucciones al pie de la letra:
 """
 
 
-def scrape_pages(data_path: str, urls_path: str | list[str], retry: bool = True) -> bool:
+def scrape_pages(data_path: str, urls_path: str | list[str], retry: bool = True, cache: ResponseCache | None = None, metrics: ScrapeMetrics | None = None) -> bool:
     """
     Scrape the pages from the URLs in the source_urls.txt file.
 
+    The extracted data is saved in the article store of the data path, keyed by URL.
+
     :param data_path: The path to save the extracted data or a list with the urls.
     :type data_path: str | list[str]
     :param urls_path: The path to the file containing the URLs.
     :type urls_path: str
+    :param cache: The response cache used to skip the pages that did not change. If None, every page is downloaded and extracted.
+    :type cache: ResponseCache | None
+    :param metrics: The metrics where the duration of each stage, and the counters, of every URL are recorded.
+    :type metrics: ScrapeMetrics | None
     :return: True if the data was saved successfully, False otherwise.
     :rtype: bool
     """
@@ -44,27 +98,251 @@ def scrape_pages(data_path: str, urls_path: str | list[str], retry: bool = True)
     is_data_path(data_path)
 
     SOURCE_URLS: list[str] = load_urls(urls_path) if isinstance(urls_path, str) else urls_path
-    counter: int = 0
+    store: ArticleStore = ArticleStore(os.path.join(data_path, ARTICLE_STORE_FILE_NAME))
+    url_metrics: UrlMetrics | None = None
 
     try:
         for url in SOURCE_URLS:
-            page_content: str = scrape_page(url)
+            url_metrics = metrics.get_record(url) if metrics is not None else None
+
+            with measure(url_metrics, "fetch"):
+                response: Response = fetch_page(url, cache)
 
-            relevant_data: dict = extract_relevant_data(page_content, retry)
-            file_path: str = f"{data_path}/output_{counter}.json"
-            counter += 1
+            if response.status_code == 304:
+                relevant_data: dict = cache.get(url)["data"]
+                print(Fore.CYAN, f"La página {url} no ha cambiado desde la última extracción.")
 
-            save_data(relevant_data, file_path)
+            else:
+                if url_metrics is not None:
+                    url_metrics.add("bytes_downloaded", len(response.content))
 
-            print(Fore.MAGENTA, f"Datos extraídos de {url} guardados en {file_path} correctamente.")
+                relevant_data: dict = extract_relevant_data(response.text, retry, url_metrics=url_metrics)
+
+                if cache is not None:
+                    cache.save(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), relevant_data)
+
+            with measure(url_metrics, "save"):
+                store.save(url, relevant_data, hash_text(relevant_data.get("Contenido", "")))
+
+            print(Fore.MAGENTA, f"Datos extraídos de {url} guardados en {store.STORE_PATH} correctamente.")
+
+        print(Fore.CYAN, f"Rutas de extracción: {get_extraction_stats()}")
+        print(Fore.CYAN, f"Tokens de entrada del prompt de extracción: {get_prompt_stats()}")
 
         return True 
     
     except Exception as e:
+        if url_metrics is not None:
+            url_metrics.set_error(e)
+
         print(Fore.RED, f"\nError: {e}")
         return False
+
+    finally:
+        store.close()
     
 
+def scrape_pages_concurrently(data_path: str, urls_path: str | list[str], retry: bool = True, max_concurrency: int = 8, max_concurrency_per_host: int = 2, cache: ResponseCache | None = None, parse_workers: int = 0, metrics: ScrapeMetrics | None = None) -> dict[str, str]:
+    """
+    Scrape the pages from the given URLs concurrently.
+
+    Network fetches, content cleaning and LLM extraction of different pages overlap, so the batch takes roughly as long as its slowest pages instead of the sum of all of them. The articles are saved in the same store as the ones of `scrape_pages`, in a single transaction at the end of the batch.
+
+    :param data_path: The path to save the extracted data.
+    :type data_path: str
+    :param urls_path: The path to the file containing the URLs or a list with the urls.
+    :type urls_path: str | list[str]
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param max_concurrency: The maximum number of pages being fetched, and extracted, at the same time.
+    :type max_concurrency: int
+    :param max_concurrency_per_host: The maximum number of pages being fetched from the same host at the same time.
+    :type max_concurrency_per_host: int
+    :param cache: The response cache used to skip the pages that did not change. If None, every page is downloaded and extracted.
+    :type cache: ResponseCache | None
+    :param parse_workers: The number of processes used to parse and clean the pages. If 0, they are parsed in threads, which only use one core.
+    :type parse_workers: int
+    :param metrics: The metrics where the duration of each stage, and the counters, of every URL are recorded.
+    :type metrics: ScrapeMetrics | None
+    :return: The URLs that could not be scraped, mapped to their error message.
+    :rtype: dict[str, str]
+    """
+
+    return asyncio.run(scrape_pages_async(data_path, urls_path, retry, max_concurrency, max_concurrency_per_host, cache, parse_workers, metrics))
+
+
+async def scrape_pages_async(data_path: str, urls_path: str | list[str], retry: bool = True, max_concurrency: int = 8, max_concurrency_per_host: int = 2, cache: ResponseCache | None = None, parse_workers: int = 0, metrics: ScrapeMetrics | None = None) -> dict[str, str]:
+    """
+    Asynchronous version of `scrape_pages`. A failing URL does not stop the rest of the batch.
+
+    :param data_path: The path to save the extracted data.
+    :type data_path: str
+    :param urls_path: The path to the file containing the URLs or a list with the urls.
+    :type urls_path: str | list[str]
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param max_concurrency: The maximum number of pages being fetched, and extracted, at the same time.
+    :type max_concurrency: int
+    :param max_concurrency_per_host: The maximum number of pages being fetched from the same host at the same time.
+    :type max_concurrency_per_host: int
+    :param cache: The response cache used to skip the pages that did not change. If None, every page is downloaded and extracted.
+    :type cache: ResponseCache | None
+    :param parse_workers: The number of processes used to parse and clean the pages. If 0, they are parsed in threads, which only use one core.
+    :type parse_workers: int
+    :param metrics: The metrics where the duration of each stage, and the counters, of every URL are recorded.
+    :type metrics: ScrapeMetrics | None
+    :return: The URLs that could not be scraped, mapped to their error message.
+    :rtype: dict[str, str]
+    """
+
+    is_data_path(data_path)
+
+    SOURCE_URLS: list[str] = load_urls(urls_path) if isinstance(urls_path, str) else urls_path
+
+    fetch_semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+    extract_semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+    host_semaphores: defaultdict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max_concurrency_per_host))
+
+    connector: aiohttp.TCPConnector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=max_concurrency_per_host)
+    parse_pool: ProcessPoolExecutor | None = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks: list[asyncio.Task] = [
+            asyncio.create_task(
+                scrape_url_async(
+                    session, 
+                    url, 
+                    retry, 
+                    fetch_semaphore, 
+                    host_semaphores[urlparse(url).netloc], 
+                    extract_semaphore,
+                    cache,
+                    parse_pool,
+                    metrics.get_record(url) if metrics is not None else None
+                )
+            )
+            for url in SOURCE_URLS
+        ]
+
+        results: list = await asyncio.gather(*tasks, return_exceptions=True)
+
+    if parse_pool is not None:
+        parse_pool.shutdown()
+
+    failed_urls: dict[str, str] = {}
+    articles: list[tuple[str, dict, str]] = []
+
+    for url, result in zip(SOURCE_URLS, results):
+        if not isinstance(result, BaseException):
+            articles.append((url, result, hash_text(result.get("Contenido", ""))))
+
+        else:
+            failed_urls[url] = str(result)
+
+            if metrics is not None:
+                metrics.get_record(url).set_error(result)
+
+            print(Fore.RED, f"\nError al procesar {url}: {result}")
+
+    store: ArticleStore = ArticleStore(os.path.join(data_path, ARTICLE_STORE_FILE_NAME))
+    store.save_many(articles)
+    store.close()
+
+    print(Fore.MAGENTA, f"Datos extraídos de {len(articles)} páginas guardados en {store.STORE_PATH} correctamente.")
+    print(Fore.CYAN, f"Rutas de extracción: {get_extraction_stats()}")
+    print(Fore.CYAN, f"Tokens de entrada del prompt de extracción: {get_prompt_stats()}")
+
+    return failed_urls
+
+
+async def scrape_url_async(session: aiohttp.ClientSession, url: str, retry: bool, fetch_semaphore: asyncio.Semaphore, host_semaphore: asyncio.Semaphore, extract_semaphore: asyncio.Semaphore, cache: ResponseCache | None = None, parse_pool: ProcessPoolExecutor | None = None, url_metrics: UrlMetrics | None = None) -> dict:
+    """
+    Fetch and extract the data of a single URL.
+
+    The fetch is bounded by the global and per-host semaphores. The extraction runs in a worker thread, bounded by its own semaphore, so it overlaps with the fetches of other pages. If there is a parse pool, the page is parsed in one of its processes, and only the parsed data comes back.
+
+    :param session: The HTTP session to use.
+    :type session: aiohttp.ClientSession
+    :param url: The URL to scrape.
+    :type url: str
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param fetch_semaphore: The semaphore bounding the number of concurrent fetches.
+    :type fetch_semaphore: asyncio.Semaphore
+    :param host_semaphore: The semaphore bounding the number of concurrent fetches to the URL host.
+    :type host_semaphore: asyncio.Semaphore
+    :param extract_semaphore: The semaphore bounding the number of concurrent extractions.
+    :type extract_semaphore: asyncio.Semaphore
+    :param cache: The response cache used to skip the page if it did not change.
+    :type cache: ResponseCache | None
+    :param parse_pool: The process pool used to parse the page. If None, it is parsed in a worker thread.
+    :type parse_pool: ProcessPoolExecutor | None
+    :param url_metrics: The measurements of the URL.
+    :type url_metrics: UrlMetrics | None
+    :return: The extracted data.
+    :rtype: dict
+    """
+
+    headers: dict[str, str] = cache.get_conditional_headers(url) if cache is not None else {}
+
+    async with host_semaphore, fetch_semaphore:
+        with measure(url_metrics, "fetch"):
+            status, page_content, response_headers, downloaded_bytes = await scrape_page_async(session, url, headers)
+
+    if url_metrics is not None:
+        url_metrics.add("bytes_downloaded", downloaded_bytes)
+
+    if status == 304:
+        relevant_data: dict = cache.get(url)["data"]
+        print(Fore.CYAN, f"La página {url} no ha cambiado desde la última extracción.")
+
+    else:
+        async with extract_semaphore:
+            if parse_pool is not None:
+                with measure(url_metrics, "clean"):
+                    parsed_page: dict = await asyncio.get_running_loop().run_in_executor(parse_pool, parse_page, page_content, PROMPT_TOKEN_BUDGET, url_metrics is not None)
+
+                relevant_data: dict = await asyncio.to_thread(extract_from_parsed_page, parsed_page, retry, url_metrics)
+
+            else:
+                relevant_data: dict = await asyncio.to_thread(extract_relevant_data, page_content, retry, PROMPT_TOKEN_BUDGET, url_metrics)
+
+        if cache is not None:
+            cache.save(url, response_headers.get("ETag"), response_headers.get("Last-Modified"), relevant_data)
+
+    print(Fore.MAGENTA, f"Datos extraídos de {url} correctamente.")
+
+    return relevant_data
+
+
+async def scrape_page_async(session: aiohttp.ClientSession, url: str, headers: dict[str, str] | None = None) -> tuple[int, str, dict[str, str], int]:
+    """
+    Asynchronous version of `fetch_page`.
+
+    :param session: The HTTP session to use.
+    :type session: aiohttp.ClientSession
+    :param url: The URL to scrape.
+    :type url: str
+    :param headers: The extra headers to send, e.g. the conditional request headers.
+    :type headers: dict[str, str] | None
+    :return: The status code, the page content (empty if the page did not change), the response headers and the number of bytes downloaded.
+    :rtype: tuple[int, str, dict[str, str], int]
+    """
+
+    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    async with session.get(url, headers=headers, timeout=timeout) as response:
+        if response.status == 304 and headers:
+            return response.status, "", dict(response.headers), 0
+
+        if response.status != 200:
+            raise Exception(f"Failed to load page: {url} Error: {response.status}")
+
+        body: bytes = await response.read()
+
+        return response.status, await response.text(), dict(response.headers), len(body)
+
+
 def is_data_path(data_path: str) -> bool:
     """
     Check if the data path exists.
@@ -83,21 +361,52 @@ def is_data_path(data_path: str) -> bool:
     return True
 
 
-def load_urls(urls_path: str) -> list[str]:
+def get_session() -> requests.Session:
     """
-    Load the URLs to scrape from the given file path.
+    Get the HTTP session shared by all the fetches, creating it on the first call.
 
-    :param urls_path: The path to the file containing the URLs.
-    :type urls_path: str
-    :return: list of URLs to scrape.
-    :rtype: list[str]
+    The session keeps the connections alive in a pool, so consecutive fetches to the same host reuse the TCP/TLS connection.
+
+    :return: The shared HTTP session.
+    :rtype: requests.Session
     """
 
-    with open(urls_path, "r") as file:
-        urls: list[str] = file.readlines()
-        urls = [url.strip() for url in urls]
+    global http_session
 
-    return urls
+    if http_session is None:
+        adapter: HTTPAdapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+
+        http_session = requests.Session()
+        http_session.mount("http://", adapter)
+        http_session.mount("https://", adapter)
+
+    return http_session
+
+
+def fetch_page(url: str, cache: ResponseCache | None = None) -> Response:
+    """
+    Fetch the given URL with the shared session.
+
+    If the URL is in the cache, a conditional request is sent, and the response can be a 304 with no content.
+
+    :param url: The URL to fetch.
+    :type url: str
+    :param cache: The response cache to take the conditional request headers from.
+    :type cache: ResponseCache | None
+    :return: The response, with status code 200 or 304.
+    :rtype: Response
+    """
+
+    headers: dict[str, str] = cache.get_conditional_headers(url) if cache is not None else {}
+    response: Response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 304 and headers:
+        return response
+
+    if response.status_code != 200:
+        raise Exception(f"Failed to load page: {url} Error: {response.status_code}")
+
+    return response
 
 
 def scrape_page(url: str) -> str:
@@ -110,68 +419,223 @@ def scrape_page(url: str) -> str:
     :rtype: str
     """
 
-    response: Response = requests.get(url)
-
-    if response.status_code != 200:
-        raise Exception(Fore.RED, f"\nFailed to load page: {url}\Error: {response.status_code}")
+    response: Response = fetch_page(url)
 
     return response.text
 
 
-def extract_relevant_data(page_content: str, retry: bool = True) -> dict:
+def extract_relevant_data(page_content: str, retry: bool = True, token_budget: int = PROMPT_TOKEN_BUDGET, url_metrics: UrlMetrics | None = None) -> dict:
     """
     Extract the relevant data from the page content.
 
     :param page_content: The content of the page.
     :type page_content: str
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param token_budget: The maximum number of tokens of the page content sent to the LLM.
+    :type token_budget: int
+    :param url_metrics: The measurements of the page URL.
+    :type url_metrics: UrlMetrics | None
     :return: The extracted data.
     :rtype: dict
     """
-    
-    GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
 
-    client: Groq = Groq(
-        api_key=GROQ_API_KEY,
-    )
+    with measure(url_metrics, "clean"):
+        parsed_page: dict = parse_page(page_content, token_budget, url_metrics is not None)
+
+    return extract_from_parsed_page(parsed_page, retry, url_metrics)
+
+
+def parse_page(page_content: str, token_budget: int = PROMPT_TOKEN_BUDGET, measure_prompt: bool = False) -> dict:
+    """
+    Parse and clean the page content, and prepare everything the extraction needs.
+
+    This is the CPU-bound part of the extraction. The result only has plain data, not the parsed tree, so it is cheap to pass between stages, threads or processes.
+
+    :param page_content: The content of the page.
+    :type page_content: str
+    :param token_budget: The maximum number of tokens of the page content sent to the LLM.
+    :type token_budget: int
+    :param measure_prompt: Whether to measure the tokens the prompt would have with the whole cleaned HTML, to report the tokens saved by compacting it. It serializes and tokenizes the whole page, so it is only done when the metrics are recorded.
+    :type measure_prompt: bool
+    :return: The parsed page, with the keys metadata (the fields found in the structured metadata), Contenido, Enlaces, content_hash, prompt_content (None if the LLM is not needed) and prompt_tokens (the tokens of the prompt content before and after compacting it, or None if they are not measured).
+    :rtype: dict
+    """
+
+    soup: BeautifulSoup = BeautifulSoup(page_content, HTML_PARSER)
+
+    # The structured metadata must be read before cleaning, which removes the script and meta tags.
+    metadata: dict[str, str] = extract_structured_metadata(soup)
+    missing_fields: list[str] = [field for field in METADATA_FIELDS if field not in metadata]
 
-    clean_content: Tag = clean_page_content(page_content)
+    clean_content, link_tags = clean_soup(soup)
 
-    new_content: str = clean_content.main.get_text("\n") if clean_content.main else clean_content.article.get_text("\n")
-    links: list[str] = [a["href"] for a in clean_content.find_all("a", href=True)]
+    new_content: str = get_page_text(clean_content)
 
-    for a in clean_content.find_all("a", href=True):
-        if "author" in str(a["href"]).lower() or "autor" in str(a["href"]).lower(): # skip author links
+    parsed_page: dict = {
+        "metadata": metadata,
+        "Contenido": new_content,
+        "Enlaces": [a["href"] for a in link_tags],
+        "content_hash": hash_text(new_content),
+        "prompt_content": None,
+        "prompt_tokens": None,
+    }
+
+    if not missing_fields:
+        return parsed_page
+
+    compact_content: str = compact_page_content(clean_content, link_tags, token_budget)
+
+    parsed_page["prompt_content"] = compact_content
+
+    if not measure_prompt:
+        return parsed_page
+
+    # Measure what the prompt would have cost with the whole cleaned HTML, as it was sent before.
+    for a in link_tags:
+        if is_author_link(a["href"]): # skip author links
             continue
         
         a.decompose()
 
-    page_content = str(clean_content).replace("<div>", "").replace("</div>", "") # remove div tags
+    full_content: str = str(clean_content).replace("<div>", "").replace("</div>", "") # remove div tags
+
+    parsed_page["prompt_tokens"] = (count_tokens(full_content), count_tokens(compact_content))
+
+    return parsed_page
+
+
+def extract_from_parsed_page(parsed_page: dict, retry: bool = True, url_metrics: UrlMetrics | None = None) -> dict:
+    """
+    Extract the relevant data from a page parsed with `parse_page`, calling the LLM for the fields that are not in the structured metadata.
+
+    :param parsed_page: The parsed page.
+    :type parsed_page: dict
+    :param retry: Whether to retry the extraction if there is an error.
+    :type retry: bool
+    :param url_metrics: The measurements of the page URL.
+    :type url_metrics: UrlMetrics | None
+    :return: The extracted data.
+    :rtype: dict
+    """
+
+    metadata: dict[str, str] = parsed_page["metadata"]
+
+    if parsed_page["prompt_content"] is None:
+        record_extraction_path("structured")
+
+        return {**metadata, "Contenido": parsed_page["Contenido"], "Enlaces": parsed_page["Enlaces"]}
+
+    record_extraction_path("partial" if metadata else "llm")
+
+    if parsed_page["prompt_tokens"] is not None:
+        record_prompt_tokens(*parsed_page["prompt_tokens"])
+
+    client: Groq = get_groq_client()
 
     context: str = CONTEXT_LLM.format(
-        page_content=page_content,
+        page_content=parsed_page["prompt_content"],
     )
 
-    # Send the context to the model and get the response. Retry if there is an error.
-    while True:
-        try:
-            response: str = chat_groq(context, client)
-            
-            result: dict = json.loads(response)
-            result["Contenido"] = new_content
-            result["Enlaces"] = links
+    def request_metadata() -> dict:
+        response: str = chat_groq(context, client, url_metrics)
+        result: dict = json.loads(response)
 
-            break
-        except Exception as e:
-            if not retry:
-                raise Exception(f"\nError: {e}")
+        # Valid JSON that is not an object is as malformed as invalid JSON, and is retried right away.
+        if not isinstance(result, dict):
+            raise json.JSONDecodeError(f"Expected a JSON object, got {type(result).__name__}", response, 0)
 
-            print(Fore.RED, f"\nError: {e}\nEsperando 10 segs para continuar...")
+        return result
+
+    def count_retry(attempt: int, error: Exception):
+        if url_metrics is not None:
+            url_metrics.add("retries", 1)
+
+    # Send the context to the model and get the response. Retry if there is an error.
+    retry_policy: RetryPolicy = RetryPolicy() if retry else RetryPolicy(max_attempts=1)
+
+    try:
+        with measure(url_metrics, "llm"):
+            result: dict = retry_policy.run(request_metadata, count_retry)
+    except Exception as e:
+        raise Exception(f"\nError: {e}")
 
-            time.sleep(10)
+    result.update(metadata) # the structured metadata is preferred over the LLM output
+    result["Contenido"] = parsed_page["Contenido"]
+    result["Enlaces"] = parsed_page["Enlaces"]
 
     return result
+
+
+def record_extraction_path(path: str):
+    """
+    Count a page in the given extraction path.
+
+    :param path: The extraction path: structured, partial or llm.
+    :type path: str
+    """
+
+    with extraction_stats_lock:
+        extraction_stats[path] += 1
+
+
+def get_extraction_stats() -> dict[str, int]:
+    """
+    Get how many pages took each extraction path since the process started.
+
+    - structured: the title, author and date were found in the structured metadata, and the LLM was not called.
+    - partial: some fields were found in the structured metadata, and the LLM was called for the rest.
+    - llm: no field was found in the structured metadata.
+
+    :return: The number of pages per extraction path.
+    :rtype: dict[str, int]
+    """
+
+    with extraction_stats_lock:
+        return dict(extraction_stats)
     
 
+def get_page_text(clean_content: Tag) -> str:
+    """
+    Get the text of the news article from the cleaned page content.
+
+    :param clean_content: The cleaned page content.
+    :type clean_content: Tag
+    :return: The text of the main (or article) element of the page.
+    :rtype: str
+    """
+
+    return clean_content.main.get_text("\n") if clean_content.main else clean_content.article.get_text("\n")
+
+
+def get_content_hash(page_content: str) -> str:
+    """
+    Get a hash of the text of the news article in the given page.
+
+    The hash is computed over the cleaned text instead of the raw HTML, so changes in ads, scripts or tracking attributes do not count as changes in the article.
+
+    :param page_content: The content of the page.
+    :type page_content: str
+    :return: The SHA-256 hex digest of the article text.
+    :rtype: str
+    """
+
+    return hash_text(get_page_text(clean_page_content(page_content)))
+
+
+def hash_text(text: str) -> str:
+    """
+    Get the SHA-256 hex digest of the given text.
+
+    :param text: The text.
+    :type text: str
+    :return: The hex digest.
+    :rtype: str
+    """
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def clean_page_content(page_content: str) -> Tag:
     """
     Clean the page content by removing unwanted characters and tags.
@@ -182,49 +646,92 @@ def clean_page_content(page_content: str) -> Tag:
     :rtype: Tag
     """
 
-    soup: BeautifulSoup = BeautifulSoup(page_content, "html.parser")
+    clean_content, _ = clean_page(page_content)
 
-    attrs_to_remove: list[str] = [
-        "id", "class", "style", "data-fusion-component", "rel", 
-        "data-index", "data-type", "data-custom-type", "target", 
-        "dir", "lang"
-    ]
+    return clean_content
 
-    tags_to_remove: list[str] = [
-        "script", "svg", "img", "header", "footer", "iframe", 
-        "nav", "figure", "noscript", "meta", "button", "input", 
-        "style", "picture", "figcaption", "data-autor", "data-bloqueo", 
-        "data-board", "data-category", "data-clasecontenido", "data-editorial", 
-        "data-id", "data-name", "data-position", "data-publicacion", "data-redactorvisible", 
-        "data-seccion", "data-subseccion", "data-tipocontenido"
-    ]
 
-    for trash_tag in soup(tags_to_remove):
-        trash_tag.extract()
+def clean_page(page_content: str, parser: str = HTML_PARSER) -> tuple[Tag, list[Tag]]:
+    """
+    Clean the page content and collect its links in a single walk over the tree.
+
+    The unwanted tags are removed with their whole subtree, so it is never visited, and the unwanted attributes are removed from the tags that are kept.
+
+    :param page_content: The content of the page.
+    :type page_content: str
+    :param parser: The parser used by BeautifulSoup. Defaults to the HTML_PARSER environment variable, or html.parser.
+    :type parser: str
+    :return: The cleaned page content and its links (the `a` tags with an `href` in the body), in document order.
+    :rtype: tuple[Tag, list[Tag]]
+    """
+
+    return clean_soup(BeautifulSoup(page_content, parser))
+
+
+def clean_soup(soup: BeautifulSoup) -> tuple[Tag, list[Tag]]:
+    """
+    Clean the given parsed page and collect its links in a single walk over the tree. The page is modified in place.
+
+    :param soup: The parsed page.
+    :type soup: BeautifulSoup
+    :return: The cleaned page content and its links (the `a` tags with an `href` in the body, or in the whole page if it has no body), in document order.
+    :rtype: tuple[Tag, list[Tag]]
+    """
+
+    links: list[Tag] = []
+    body: Tag | None = soup.body
 
-    for tag in soup.find_all(True):
-        for attr in attrs_to_remove:
-            if attr in tag.attrs:
+    # Each tag goes with whether it is inside the body, so only the links of the content are collected.
+    stack: list[tuple[Tag, bool]] = [(soup, body is None)]
+
+    while stack:
+        tag, in_body = stack.pop()
+        in_body = in_body or tag is body
+
+        if tag.attrs:
+            for attr in ATTRS_TO_REMOVE.intersection(tag.attrs):
                 del tag.attrs[attr]
 
-    return soup.body
+            if in_body and tag.name == "a" and "href" in tag.attrs:
+                links.append(tag)
+
+        children: list[Tag] = [child for child in tag.contents if isinstance(child, Tag)]
 
+        # Children are pushed in reverse so they are visited in document order.
+        for child in reversed(children):
+            if child.name in TAGS_TO_REMOVE:
+                child.extract()
+            else:
+                stack.append((child, in_body))
 
-def save_data(data: dict, file_path: str):
+    return body, links
+
+
+def get_groq_client() -> Groq:
     """
-    Save the extracted data to a JSON file.
+    Get the Groq client shared by all the extractions, creating it on the first call.
+
+    Sharing the client keeps its connection pool alive between pages. Its own retries are disabled, since the retries are handled by `RetryPolicy`.
 
-    :param data: The extracted data.
-    :type data: dict
-    :param file_path: The path to save the data.
-    :type file_path: str
+    :return: The shared Groq client.
+    :rtype: Groq
     """
 
-    with open(file_path, "w", encoding="utf-8") as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+    global groq_client
 
+    with groq_client_lock:
+        if groq_client is None:
+            GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
 
-def chat_groq(context: str, client: Groq) -> str:
+            groq_client = Groq(
+                api_key=GROQ_API_KEY,
+                max_retries=0,
+            )
+
+    return groq_client
+
+
+def chat_groq(context: str, client: Groq, url_metrics: UrlMetrics | None = None) -> str:
     """
     Sends a message to the llama3 model and returns the response.
 
@@ -232,6 +739,8 @@ def chat_groq(context: str, client: Groq) -> str:
     :type context: str
     :param client: The Groq client.
     :type client: Groq
+    :param url_metrics: The measurements where the tokens sent and received are recorded.
+    :type url_metrics: UrlMetrics | None
     :return: The response from the model.
     :rtype: str
     """
@@ -251,8 +760,19 @@ def chat_groq(context: str, client: Groq) -> str:
     )
 
     response: str = ""
+    usage = None
 
     for chunk in completion:
         response += chunk.choices[0].delta.content or ""
 
+        # Groq sends the token usage in the last chunk of the stream.
+        x_groq = getattr(chunk, "x_groq", None)
+
+        if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+            usage = x_groq.usage
+
+    if url_metrics is not None:
+        url_metrics.add("tokens_sent", usage.prompt_tokens if usage is not None else count_tokens(context))
+        url_metrics.add("tokens_received", usage.completion_tokens if usage is not None else count_tokens(response))
+
     return response
@@ -1,7 +1,10 @@
-from model.chat.chatbot import Bot
-from model.RAG.rag import RAG
-from model.web_scraper.web_scraper import load_urls, scrape_pages
-from model.speech.text_to_speech import TextToSpeech
+from __future__ import annotations
+
+from model.pipeline.background_loader import BackgroundLoader
+from model.web_scraper.source_urls import load_urls
+from model.web_scraper.article_store import ArticleStore, ARTICLE_STORE_FILE_NAME
+from model.web_scraper.response_cache import ResponseCache
+from model.web_scraper.scrape_metrics import ScrapeMetrics
 
 import streamlit as st
 import tkinter as tk
@@ -10,10 +13,20 @@ from tkinter import messagebox
 from dotenv import load_dotenv
 import os
 import json
+from functools import partial
+from typing import TYPE_CHECKING
+
+# The chatbot, the RAG model and the text to speech import heavy libraries (LLM clients, LangChain, Google Cloud), so they are imported when they are created, in the background (see `init_config`).
+if TYPE_CHECKING:
+    from model.chat.chatbot import Bot
+    from model.RAG.rag import RAG
+    from model.speech.text_to_speech import TextToSpeech
 
 load_dotenv()
 
 DATA_PATH: str = "data"
+RESPONSE_CACHE_PATH: str = ".cache/responses"
+REPORTS_PATH: str = "reports"
 SOURCE_URLS_PATH: str = "source_urls.txt"
 SOURCE_URLS: list[str] = load_urls(SOURCE_URLS_PATH)
 
@@ -95,6 +108,8 @@ def init_config():
     Initialize the configuration of the chatbot.
 
     Save each configuration parameter in the Streamlit session state to keep the state between Streamlit runs.
+
+    The chatbot, the RAG model and the text to speech are created in background threads (see `BackgroundLoader`), so the UI renders right away instead of waiting for their libraries to be imported and for the knowledge base to be opened. They are used through `get_bot`, `get_rag` and `get_text2speech`, which wait for them if needed.
     """
 
     if "current_screen" not in st.session_state:
@@ -118,19 +133,18 @@ def init_config():
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
-    if not "bot" in st.session_state:
-        chatbot: Bot = Bot(
+    if not "bot_loader" in st.session_state:
+        st.session_state.bot_loader = BackgroundLoader("bot", partial(
+            create_bot,
             st.session_state.api_key,
             st.session_state.selected_model,
             st.session_state.selected_provider,
             st.session_state.selected_language,
             st.session_state.temperature 
-        )
-        st.session_state.bot = chatbot
+        ))
     
-    if not "rag" in st.session_state:
-        rag: RAG = RAG()
-        st.session_state.rag = rag
+    if not "rag_loader" in st.session_state:
+        st.session_state.rag_loader = BackgroundLoader("rag", create_rag)
 
 
     if not "google_api_key" in st.session_state:
@@ -142,15 +156,104 @@ def init_config():
     if not "selected_voice" in st.session_state:
         st.session_state.selected_voice = "es-US-Wavenet-B"
 
-    if not "text2speech" in st.session_state:
-        text2speech: TextToSpeech = TextToSpeech(
+    if not "text2speech_loader" in st.session_state:
+        st.session_state.text2speech_loader = BackgroundLoader("text2speech", partial(
+            create_text_to_speech,
             st.session_state.google_api_key,
             st.session_state.selected_language,
             st.session_state.selected_voice,
             st.session_state.selected_voice_gender
-        )
+        ))
+
+
+def create_bot(api_key: str, model: str, provider: str, language: str, temperature: float) -> Bot:
+    """
+    Create a chatbot, importing its module on the first call.
+
+    :param api_key: The API key of the provider.
+    :type api_key: str
+    :param model: The language model.
+    :type model: str
+    :param provider: The provider of the model: "groq" or "openai".
+    :type provider: str
+    :param language: The language of the answers.
+    :type language: str
+    :param temperature: The temperature of the answers.
+    :type temperature: float
+    :return: The chatbot.
+    :rtype: Bot
+    """
+
+    from model.chat.chatbot import Bot
+
+    return Bot(api_key, model, provider, language, temperature)
+
+
+def create_rag() -> RAG:
+    """
+    Create the RAG model, importing its module on the first call and opening (or building) the knowledge base.
+
+    :return: The RAG model.
+    :rtype: RAG
+    """
+
+    from model.RAG.rag import RAG
+
+    return RAG()
+
+
+def create_text_to_speech(google_api_key: str, language: str, voice: str, gender: str) -> TextToSpeech:
+    """
+    Create a text to speech client, importing its module on the first call.
+
+    :param google_api_key: The credentials of Google Cloud.
+    :type google_api_key: str
+    :param language: The language of the voice.
+    :type language: str
+    :param voice: The voice.
+    :type voice: str
+    :param gender: The gender of the voice.
+    :type gender: str
+    :return: The text to speech client.
+    :rtype: TextToSpeech
+    """
+
+    from model.speech.text_to_speech import TextToSpeech
 
-        st.session_state.text2speech = text2speech
+    return TextToSpeech(google_api_key, language, voice, gender)
+
+
+def get_bot() -> Bot:
+    """
+    Get the chatbot of the session, waiting for it to be created.
+
+    :return: The chatbot.
+    :rtype: Bot
+    """
+
+    return st.session_state.bot_loader.get()
+
+
+def get_rag() -> RAG:
+    """
+    Get the RAG model of the session, waiting for the knowledge base to be loaded.
+
+    :return: The RAG model.
+    :rtype: RAG
+    """
+
+    return st.session_state.rag_loader.get()
+
+
+def get_text2speech() -> TextToSpeech:
+    """
+    Get the text to speech client of the session, waiting for it to be created.
+
+    :return: The text to speech client.
+    :rtype: TextToSpeech
+    """
+
+    return st.session_state.text2speech_loader.get()
 
 
 def start_ui():
@@ -255,7 +358,12 @@ def start_main_window():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
-    prompt: str = st.chat_input("Escribe tu mensaje")
+    rag_ready: bool = st.session_state.rag_loader.is_ready()
+
+    if not rag_ready:
+        show_rag_status()
+
+    prompt: str = st.chat_input("Escribe tu mensaje", disabled=not rag_ready)
 
     if prompt:
         with st.chat_message("user"):
@@ -266,7 +374,30 @@ def start_main_window():
         with st.chat_message("assistant"):
             st.markdown(response)
 
-        speech_response(response, st.session_state.text2speech)
+        speech_response(response, get_text2speech())
+
+
+@st.fragment(run_every=1)
+def show_rag_status():
+    """
+    Show that the knowledge base is loading, checking every second until it is ready.
+
+    When it is ready, the whole app is run again to enable the chat.
+    """
+
+    rag_loader: BackgroundLoader = st.session_state.rag_loader
+    status: str = rag_loader.get_status()
+
+    if status == "loading":
+        st.info(f"Cargando el índice de la base de conocimiento... ({rag_loader.get_seconds():.0f} s)")
+        return
+
+    if status == "failed":
+        st.error(f"No se pudo cargar la base de conocimiento: {rag_loader.error}")
+        return
+
+    print(f"Base de conocimiento cargada en {rag_loader.get_seconds():.2f} s")
+    st.rerun()
 
 
 def start_main_side_bar():
@@ -334,8 +465,18 @@ def start_main_side_bar():
             )
         )
 
-        if st.button("Recargar Base de Conocimiento"):
-            reload_knowledge_base()
+        rebuild: bool = st.checkbox("Reconstruir desde cero", value=False)
+        refresh_loader: BackgroundLoader | None = st.session_state.get("refresh_loader")
+        refreshing: bool = refresh_loader is not None and refresh_loader.get_status() == "loading"
+
+        if st.button("Recargar Base de Conocimiento", disabled=refreshing):
+            reload_knowledge_base(rebuild)
+            refreshing = True
+
+        if refreshing:
+            show_refresh_status()
+        elif refresh_loader is not None:
+            show_refresh_summary(refresh_loader)
 
 
 def start_comparison_window():
@@ -362,11 +503,15 @@ def start_comparison_window():
         if st.session_state.news1 != "" and st.session_state.news2 != "":
             print("Scraping news...", st.session_state.news1, st.session_state.news2)
             try:
+                from model.web_scraper.web_scraper import scrape_pages
+
                 scraping_result: bool = scrape_pages(COMPARISON_NEWS_PATH, [st.session_state.news1, st.session_state.news2], False)
 
                 if scraping_result:
-                    news1: dict = load_json(f"{COMPARISON_NEWS_PATH}/output_0.json")
-                    news2: dict = load_json(f"{COMPARISON_NEWS_PATH}/output_1.json")
+                    store: ArticleStore = ArticleStore(os.path.join(COMPARISON_NEWS_PATH, ARTICLE_STORE_FILE_NAME))
+                    news1: dict = store.get(st.session_state.news1)["data"]
+                    news2: dict = store.get(st.session_state.news2)["data"]
+                    store.close()
 
                     message1: str = SUMARIZATION_NEWS_CONTEXT.format(page_content=news1["Contenido"])
                     message2: str = SUMARIZATION_NEWS_CONTEXT.format(page_content=news2["Contenido"])
@@ -421,7 +566,7 @@ def start_comparison_side_bar():
     """
     
     if not "comparison_bot_1" in st.session_state or not "comparison_bot_2" in st.session_state:
-        comparison_bot: Bot = Bot(
+        comparison_bot: Bot = create_bot(
             st.session_state.api_key,
             st.session_state.selected_model,
             st.session_state.selected_provider,
@@ -433,7 +578,7 @@ def start_comparison_side_bar():
         st.session_state.comparison_bot_2 = comparison_bot
 
     if not "text2speech_comparison" in st.session_state:
-        text2speech: TextToSpeech = TextToSpeech(
+        text2speech: TextToSpeech = create_text_to_speech(
             st.session_state.google_api_key,
             st.session_state.selected_language,
             st.session_state.selected_voice,
@@ -512,20 +657,92 @@ def save_urls(urls: str):
         file.write("\n".join(urls_list))
 
 
-def reload_knowledge_base():
+def reload_knowledge_base(rebuild: bool = False):
+    """
+    Reload the knowledge base with the latest data, in the background.
+
+    Only the articles that are new or changed since the last reload are extracted and embedded again, unless a rebuild is requested. The new version of the index is built next to the one being queried, and every session switches to it on its next message once it is ready, so the chat keeps working during the reload (see `refresh_knowledge_base`). The RAG model is resolved in the background as well, so a click while it is still loading does not block the page.
+
+    :param rebuild: Whether to rebuild the knowledge base from scratch.
+    :type rebuild: bool
     """
-    Reload the knowledge base with the latest data.
+
+    st.session_state.refresh_loader = BackgroundLoader("refresh", partial(refresh_and_report, st.session_state.rag_loader, rebuild))
+
+
+def refresh_and_report(rag_loader: BackgroundLoader, rebuild: bool) -> dict:
     """
+    Refresh the knowledge base, saving the timings of the run as a report in the reports directory.
 
-    scrape_pages(DATA_PATH, SOURCE_URLS_PATH)
+    The RAG model is taken from its loader here, waiting for it if it is still loading, since the session state is not available outside the Streamlit run.
 
-    rag: RAG = RAG(
-        data_path=DATA_PATH, 
-        chroma_path="db", 
-        reload_db=True
+    :param rag_loader: The loader of the RAG model of the session.
+    :type rag_loader: BackgroundLoader
+    :param rebuild: Whether to rebuild the knowledge base from scratch.
+    :type rebuild: bool
+    :return: The summary of the refresh.
+    :rtype: dict
+    """
+
+    from model.RAG.incremental_refresh import refresh_knowledge_base
+
+    rag: RAG = rag_loader.get()
+    metrics: ScrapeMetrics = ScrapeMetrics()
+
+    summary: dict = refresh_knowledge_base(
+        rag,
+        DATA_PATH,
+        SOURCE_URLS_PATH,
+        cache=ResponseCache(RESPONSE_CACHE_PATH),
+        rebuild=rebuild,
+        metrics=metrics
     )
 
-    st.session_state.rag = rag
+    report_path: str = metrics.save_report(REPORTS_PATH)
+    print(f"Informe de rendimiento guardado en {report_path}")
+
+    return summary
+
+
+@st.fragment(run_every=2)
+def show_refresh_status():
+    """
+    Show that the knowledge base is being reloaded, checking it every two seconds.
+
+    When the reload ends, the whole app is run again to show its summary and enable the reload button.
+    """
+
+    refresh_loader: BackgroundLoader = st.session_state.refresh_loader
+
+    if refresh_loader.get_status() == "loading":
+        st.info(f"Actualizando la base de conocimiento en segundo plano... ({refresh_loader.get_seconds():.0f} s)")
+        return
+
+    st.rerun()
+
+
+def show_refresh_summary(refresh_loader: BackgroundLoader):
+    """
+    Show the summary of the last reload of the knowledge base.
+
+    :param refresh_loader: The loader of the reload, which has ended.
+    :type refresh_loader: BackgroundLoader
+    """
+
+    if refresh_loader.get_status() == "failed":
+        st.error(f"No se pudo actualizar la base de conocimiento: {refresh_loader.error}")
+        return
+
+    summary: dict = refresh_loader.get()
+    failed_urls: dict[str, str] = summary["failed"]
+
+    if failed_urls:
+        st.warning(f"No se pudo extraer la información de {len(failed_urls)} enlace(s):\n\n" + "\n\n".join(failed_urls.keys()))
+
+    st.success(
+        f"Base de conocimiento actualizada: {len(summary['added'])} nuevas, {len(summary['updated'])} actualizadas, "
+        f"{len(summary['unchanged'])} sin cambios y {len(summary['removed'])} eliminadas."
+    )
 
 
 def reload_chatbot():
@@ -535,23 +752,22 @@ def reload_chatbot():
 
     st.session_state.api_key = os.getenv("OPENAI_API_KEY") if st.session_state.selected_provider == "openai" else os.getenv("GROQ_API_KEY")
 
-    chatbot: Bot = Bot(
+    st.session_state.bot_loader = BackgroundLoader("bot", partial(
+        create_bot,
         st.session_state.api_key,
         st.session_state.selected_model,
         st.session_state.selected_provider,
         st.session_state.selected_language,
         st.session_state.temperature 
-    )
+    ))
 
-    text2speech: TextToSpeech = TextToSpeech(
+    st.session_state.text2speech_loader = BackgroundLoader("text2speech", partial(
+        create_text_to_speech,
         st.session_state.google_api_key,
         st.session_state.selected_language,
         st.session_state.selected_voice,
         st.session_state.selected_voice_gender
-    )
-
-    st.session_state.bot = chatbot
-    st.session_state.text2speech = text2speech
+    ))
 
 
 def reload_comparison_model():
@@ -561,14 +777,14 @@ def reload_comparison_model():
 
     st.session_state.api_key = os.getenv("OPENAI_API_KEY") if st.session_state.selected_provider_comparison == "openai" else os.getenv("GROQ_API_KEY")
 
-    text2speech: TextToSpeech = TextToSpeech(
+    text2speech: TextToSpeech = create_text_to_speech(
         st.session_state.google_api_key,
         st.session_state.selected_language_comparison,
         st.session_state.selected_voice_comparison,
         st.session_state.selected_voice_gender_comparison
     )
 
-    comparison_bot: Bot = Bot(
+    comparison_bot: Bot = create_bot(
         st.session_state.api_key,
         st.session_state.selected_model_comparison,
         st.session_state.selected_provider_comparison,
@@ -593,13 +809,17 @@ def chat(message: str) -> str:
 
     st.session_state.messages.append({"role": "user", "content": message})
     
-    message = st.session_state.rag.augment_query(message)
+    rag: RAG = get_rag()
+
+    message = rag.augment_query(message)
     print("Mensaje a enviar al modelo:", message)
+    print(f"Caché de consultas: {rag.get_query_cache_stats()}")
+    print(f"Contexto: {rag.get_context_stats()}")
 
     if message == "No data available.":
         return message
 
-    response: str = st.session_state.bot.chat(message)
+    response: str = get_bot().chat(message)
     st.session_state.messages.append({"role": "assistant", "content": response})
 
     return response
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are imported as `model.*`, from the src directory, like the application does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,48 @@
+from datetime import date
+
+from model.RAG.article_documents import article_to_document, build_filter, get_timestamp
+
+
+def test_build_filter_without_conditions():
+    assert build_filter() is None
+    assert build_filter(sources=[]) is None
+
+
+def test_build_filter_by_sources():
+    assert build_filter(sources=["www.elpais.com.co", "https://www.bluradio.com/nacion/1"]) == {
+        "$or": [
+            {"domain": {"$in": ["elpais.com.co", "https://www.bluradio.com/nacion/1"]}},
+            {"source": {"$in": ["www.elpais.com.co", "https://www.bluradio.com/nacion/1"]}},
+        ]
+    }
+
+
+def test_build_filter_by_dates():
+    assert build_filter(published_after=date(2024, 1, 1)) == {"published_at": {"$gte": get_timestamp(date(2024, 1, 1))}}
+    assert build_filter(published_before=date(2024, 1, 31)) == {"published_at": {"$lte": get_timestamp(date(2024, 1, 31))}}
+
+
+def test_build_filter_combines_conditions():
+    where: dict = build_filter(sources=["elpais.com.co"], published_after=date(2024, 1, 1), published_before=date(2024, 1, 31))
+
+    assert list(where) == ["$and"]
+    assert where["$and"][1:] == [
+        {"published_at": {"$gte": get_timestamp(date(2024, 1, 1))}},
+        {"published_at": {"$lte": get_timestamp(date(2024, 1, 31))}},
+    ]
+
+
+def test_article_to_document_metadata():
+    document = article_to_document(
+        {"Título": " Titulo 1 ", "Autor": "", "Fecha": "3 de enero de 2024", "Contenido": "texto"},
+        "https://www.elpais.com.co/economia/1",
+    )
+
+    assert document.page_content == "texto"
+    assert document.metadata == {
+        "source": "https://www.elpais.com.co/economia/1",
+        "domain": "elpais.com.co",
+        "title": "Titulo 1",
+        "published": "2024-01-03",
+        "published_at": get_timestamp(date(2024, 1, 3)),
+    }
@@ -0,0 +1,24 @@
+from model.web_scraper.article_store import ArticleStore, canonicalize_url, get_site
+
+
+def test_canonicalize_url():
+    assert canonicalize_url(" HTTPS://WWW.ElPais.com.co:443/economia?id=1#comentarios ") == "https://www.elpais.com.co/economia?id=1"
+    assert canonicalize_url("http://bluradio.com:8080") == "http://bluradio.com:8080/"
+    assert get_site("https://www.ElPais.com.co/economia") == "elpais.com.co"
+
+
+def test_save_replaces_the_article_of_the_same_canonical_url(tmp_path):
+    store: ArticleStore = ArticleStore(str(tmp_path / "data" / "articles.db"))
+    store.save("https://elpais.com.co/a#inicio", {"Título": "Titulo 1", "Contenido": "texto", "Enlaces": ["https://elpais.com.co/b"]}, "hash1")
+    store.save("HTTPS://ELPAIS.COM.CO/a", {"Título": "Titulo 1", "Contenido": "texto nuevo"}, "hash2")
+
+    article: dict = store.get("https://elpais.com.co/a")
+
+    assert store.count() == 1
+    assert article["data"]["Contenido"] == "texto nuevo"
+    assert article["content_hash"] == "hash2"
+
+    store.delete("https://elpais.com.co/a")
+
+    assert store.get("https://elpais.com.co/a") is None
+    store.close()
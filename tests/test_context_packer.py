@@ -0,0 +1,49 @@
+from langchain_core.documents import Document
+
+from model.RAG.context_packer import ContextPacker, merge_adjacent_chunks
+
+
+def chunk(text: str, source: str, start_index: int | None = None) -> Document:
+    metadata: dict = {"source": source, "title": "Titulo 1"}
+
+    if start_index is not None:
+        metadata["start_index"] = start_index
+
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_duplicates_are_dropped():
+    text: str = "El alcalde de Jamundí anunció obras en la vía principal del municipio"
+    packer: ContextPacker = ContextPacker(max_chunks=2)
+
+    selected, duplicates = packer.select([
+        chunk(text, "https://elpais.com.co/a"),
+        chunk(text, "https://bluradio.com/a"),
+        chunk("La inflación de enero en Colombia fue menor a la esperada", "https://elpais.com.co/b"),
+    ])
+
+    assert [document.metadata["source"] for document in selected] == ["https://elpais.com.co/a", "https://elpais.com.co/b"]
+    assert duplicates == 1
+
+
+def test_overlapping_chunks_of_the_same_article_are_merged():
+    merged: list[Document] = merge_adjacent_chunks([
+        chunk("cdefgh", "https://elpais.com.co/a", start_index=2),
+        chunk("texto", "https://bluradio.com/b", start_index=0),
+        chunk("abcde", "https://elpais.com.co/a", start_index=0),
+    ])
+
+    assert [document.page_content for document in merged] == ["abcdefgh", "texto"]
+
+
+def test_context_fits_the_token_budget():
+    packer: ContextPacker = ContextPacker(max_chunks=3, token_budget=170)
+    chunks: list[Document] = [chunk(f"Noticia número {index}. " + f"tema{index} " * 30, f"https://elpais.com.co/{index}") for index in range(3)]
+
+    context: str = packer.pack(chunks)
+    stats: dict = packer.get_stats()
+
+    assert "Noticia número 0" in context
+    assert stats["queries"] == 1
+    assert stats["last_query"]["dropped"] == 1
+    assert stats["tokens_after"] <= 170
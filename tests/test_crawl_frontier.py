@@ -0,0 +1,42 @@
+import pytest
+
+from model.web_scraper.crawl_frontier import CrawlFrontier
+
+
+@pytest.fixture
+def frontier(tmp_path) -> CrawlFrontier:
+    crawl_frontier: CrawlFrontier = CrawlFrontier(str(tmp_path / "frontier.db"))
+    yield crawl_frontier
+    crawl_frontier.close()
+
+
+def test_links_are_stored_once_and_ranked_by_links(frontier):
+    frontier.add_seeds(["https://elpais.com.co/"])
+    frontier.add_links(["https://elpais.com.co/a", "https://elpais.com.co/b#comentarios"], depth=1)
+    frontier.add_links(["https://ELPAIS.com.co/b"], depth=1)
+
+    assert frontier.get_pending(2) == [("https://elpais.com.co/b", 1), ("https://elpais.com.co/a", 1)]
+    assert frontier.count("pending") == 3
+
+    with pytest.raises(ValueError):
+        frontier.get_pending(1, priority="oldest")
+
+
+def test_visited_and_failed_urls_are_not_pending(frontier):
+    frontier.add_links(["https://elpais.com.co/a", "https://elpais.com.co/b", "https://elpais.com.co/c"], depth=1)
+    frontier.mark_visited("https://elpais.com.co/b")
+    frontier.mark_visited("https://elpais.com.co/a#inicio")
+    frontier.mark_failed("https://elpais.com.co/c", "404")
+
+    assert frontier.is_visited("https://elpais.com.co/a")
+    assert frontier.get_pending(10) == []
+    assert frontier.get_urls("visited") == ["https://elpais.com.co/a", "https://elpais.com.co/b"]
+    assert frontier.get_urls("failed") == ["https://elpais.com.co/c"]
+
+
+def test_seeds_are_visited_again(frontier):
+    frontier.add_seeds(["https://elpais.com.co/"])
+    frontier.mark_visited("https://elpais.com.co/")
+    frontier.add_seeds(["https://elpais.com.co/"])
+
+    assert frontier.get_pending(10) == [("https://elpais.com.co/", 0)]
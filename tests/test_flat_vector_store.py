@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+
+from model.RAG.article_documents import build_filter, get_timestamp
+from model.RAG.embedding_backends import HashingEmbeddings
+from model.RAG.flat_vector_store import FlatVectorStore, where_to_sql
+
+TEXTS: dict[str, str] = {
+    "a": "inflacion y precios en colombia",
+    "b": "inflacion de los alimentos en cali",
+    "c": "elecciones regionales en cali",
+    "d": "partido de futbol en bogota",
+}
+
+METADATAS: dict[str, dict] = {
+    "a": {"source": "https://elpais.com.co/a", "domain": "elpais.com.co", "published_at": get_timestamp(date(2024, 1, 1))},
+    "b": {"source": "https://bluradio.com/b", "domain": "bluradio.com", "published_at": get_timestamp(date(2024, 1, 10))},
+    "c": {"source": "https://elpais.com.co/c", "domain": "elpais.com.co", "published_at": get_timestamp(date(2024, 1, 20))},
+    "d": {"source": "https://bluradio.com/d", "domain": "bluradio.com"},
+}
+
+
+@pytest.fixture(params=[None, "int8"])
+def store(request, tmp_path) -> FlatVectorStore:
+    embeddings: HashingEmbeddings = HashingEmbeddings(dimensions=64)
+    flat_store: FlatVectorStore = FlatVectorStore(str(tmp_path / "flat"), embeddings, quantization=request.param)
+    ids: list[str] = list(TEXTS)
+
+    flat_store.upsert(ids, embeddings.embed_documents([TEXTS[chunk_id] for chunk_id in ids]), [METADATAS[chunk_id] for chunk_id in ids], [TEXTS[chunk_id] for chunk_id in ids])
+    yield flat_store
+    flat_store.close()
+
+
+def query(store: FlatVectorStore, text: str, where: dict | None = None, n_results: int = 4) -> list[str]:
+    return store.query([store.embeddings.embed_query(text)], n_results=n_results, where=where)["ids"][0]
+
+
+def test_query_without_filter(store):
+    assert sorted(query(store, "inflacion", n_results=2)) == ["a", "b"]
+    assert len(query(store, "inflacion")) == 4
+
+
+def test_query_filters_by_domain(store):
+    assert sorted(query(store, "inflacion", build_filter(sources=["elpais.com.co"]))) == ["a", "c"]
+
+
+def test_query_filters_by_source(store):
+    assert query(store, "inflacion", build_filter(sources=["https://bluradio.com/b"])) == ["b"]
+
+
+def test_query_filters_by_date_range(store):
+    where: dict = build_filter(published_after=date(2024, 1, 5), published_before=date(2024, 1, 31))
+
+    # A chunk without publication date never passes a date filter.
+    assert sorted(query(store, "cali", where)) == ["b", "c"]
+
+
+def test_query_filters_by_source_and_date(store):
+    where: dict = build_filter(sources=["elpais.com.co"], published_after=date(2024, 1, 5))
+
+    assert query(store, "inflacion", where) == ["c"]
+
+
+def test_query_with_no_matching_chunk(store):
+    assert query(store, "inflacion", build_filter(sources=["elespectador.com"])) == []
+
+
+def test_get_filters_by_metadata(store):
+    assert sorted(store.get(where={"domain": "bluradio.com"})["ids"]) == ["b", "d"]
+    assert sorted(store.get(where={"domain": {"$nin": ["bluradio.com"]}})["ids"]) == ["a", "c"]
+    assert store.get(ids=["c", "a", "b"], where={"domain": {"$ne": "bluradio.com"}}, include=[])["ids"] == ["c", "a"]
+
+
+def test_filter_is_applied_after_delete(store):
+    store.delete(ids=["a"])
+
+    assert query(store, "inflacion", build_filter(sources=["elpais.com.co"])) == ["c"]
+
+
+def test_where_to_sql_rejects_unsupported_operators():
+    with pytest.raises(ValueError):
+        where_to_sql({"title": {"$contains": "cali"}})
@@ -0,0 +1,272 @@
+import hashlib
+
+import pytest
+
+from model.RAG import incremental_refresh
+from model.RAG.incremental_refresh import refresh_knowledge_base
+from model.RAG.rag import RAG
+from model.web_scraper.article_store import ArticleStore
+from model.web_scraper.crawl_frontier import CrawlFrontier
+from model.web_scraper.response_cache import ResponseCache
+
+FIRST_URL: str = "https://noticias.test/economia/1"
+SECOND_URL: str = "https://noticias.test/politica/2"
+
+
+class FakeResponse:
+    """
+    FakeResponse is the subset of a `requests` response used by the scraper.
+    """
+
+    def __init__(self, status_code: int, text: str = "", headers: dict[str, str] | None = None):
+        self.status_code: int = status_code
+        self.text: str = text
+        self.content: bytes = text.encode("utf-8")
+        self.headers: dict[str, str] = headers or {}
+
+
+class FakeSite:
+    """
+    FakeSite serves news pages from memory, with an ETag per page, so the refresh can be tested without network access.
+
+    The pages have the title, author and date in their meta tags, so they are extracted without calling the LLM.
+    """
+
+    def __init__(self):
+        self.pages: dict[str, str] = {}
+        self.fetched: list[str] = []
+
+    def set(self, url: str, title: str, content: str):
+        self.pages[url] = (
+            "<html><head>"
+            f"<meta property='og:title' content='{title}'>"
+            "<meta name='author' content='Autor'>"
+            "<meta property='article:published_time' content='2024-01-03'>"
+            f"</head><body><article><p>{content}</p></article></body></html>"
+        )
+
+    def fetch(self, url: str, cache=None) -> FakeResponse:
+        self.fetched.append(url)
+
+        if url not in self.pages:
+            raise Exception(f"Failed to load page: {url} Error: 404")
+
+        html: str = self.pages[url]
+        etag: str = hashlib.sha256(html.encode("utf-8")).hexdigest()[:12]
+        headers: dict[str, str] = cache.get_conditional_headers(url) if cache is not None else {}
+
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(304)
+
+        return FakeResponse(200, html, {"ETag": etag})
+
+
+@pytest.fixture
+def site(monkeypatch) -> FakeSite:
+    fake_site: FakeSite = FakeSite()
+    monkeypatch.setattr(incremental_refresh, "fetch_page", fake_site.fetch)
+
+    return fake_site
+
+
+@pytest.fixture
+def paths(tmp_path) -> dict[str, str]:
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+
+    return {"data": str(data_path), "db": str(tmp_path / "db"), "cache": str(tmp_path / "cache")}
+
+
+@pytest.fixture
+def rag(paths) -> RAG:
+    return RAG(data_path=paths["data"], chroma_path=paths["db"], embedding_backend="hashing", vector_store="flat")
+
+
+def refresh(rag: RAG, paths: dict[str, str], urls: list[str], cache: ResponseCache | None = None, **kwargs) -> dict:
+    return refresh_knowledge_base(rag, paths["data"], urls, cache=cache, retry=False, max_workers=2, **kwargs)
+
+
+def get_texts(rag: RAG, url: str) -> list[str]:
+    rag.refresh_index_version()
+    return [chunk.page_content for chunk in rag.get_chunks(rag.get_source_chunk_ids(url))]
+
+
+def test_refresh_adds_new_urls(site, rag, paths):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    site.set(SECOND_URL, "Titulo 2", "elecciones " * 30)
+
+    summary: dict = refresh(rag, paths, [FIRST_URL, SECOND_URL])
+
+    assert sorted(summary["added"]) == [FIRST_URL, SECOND_URL]
+    assert summary["version"] is not None
+    assert "inflacion" in " ".join(get_texts(rag, FIRST_URL))
+    assert "elecciones" in " ".join(get_texts(rag, SECOND_URL))
+
+
+def test_second_refresh_without_changes_keeps_the_version(site, rag, paths):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    cache: ResponseCache = ResponseCache(paths["cache"])
+
+    first: dict = refresh(rag, paths, [FIRST_URL], cache)
+    second: dict = refresh(rag, paths, [FIRST_URL], cache)
+
+    assert first["added"] == [FIRST_URL]
+    assert second["unchanged"] == [FIRST_URL]
+    assert second["added"] == second["updated"] == second["removed"] == []
+    assert second["version"] is None
+    assert rag.index_versions.get_current_path().endswith(first["version"])
+
+
+def test_refresh_updates_changed_urls(site, rag, paths):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    site.set(SECOND_URL, "Titulo 2", "elecciones " * 30)
+    cache: ResponseCache = ResponseCache(paths["cache"])
+
+    refresh(rag, paths, [FIRST_URL, SECOND_URL], cache)
+    site.set(FIRST_URL, "Titulo 1", "desempleo " * 30)
+    summary: dict = refresh(rag, paths, [FIRST_URL, SECOND_URL], cache)
+
+    assert summary["updated"] == [FIRST_URL]
+    assert summary["unchanged"] == [SECOND_URL]
+
+    texts: str = " ".join(get_texts(rag, FIRST_URL))
+
+    assert "desempleo" in texts and "inflacion" not in texts
+    assert ArticleStore(f"{paths['data']}/articles.db").get(FIRST_URL)["data"]["Contenido"].startswith("desempleo")
+
+
+def test_refresh_removes_urls_no_longer_listed(site, rag, paths):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    site.set(SECOND_URL, "Titulo 2", "elecciones " * 30)
+
+    refresh(rag, paths, [FIRST_URL, SECOND_URL])
+    summary: dict = refresh(rag, paths, [FIRST_URL])
+
+    assert summary["removed"] == [SECOND_URL]
+    assert get_texts(rag, SECOND_URL) == []
+    assert get_texts(rag, FIRST_URL) != []
+    assert ArticleStore(f"{paths['data']}/articles.db").get(SECOND_URL) is None
+
+
+def test_failed_url_does_not_stop_the_refresh(site, rag, paths):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+
+    summary: dict = refresh(rag, paths, [FIRST_URL, SECOND_URL])
+
+    assert summary["added"] == [FIRST_URL]
+    assert list(summary["failed"]) == [SECOND_URL]
+    assert "404" in summary["failed"][SECOND_URL]
+
+    # The failed URL is retried by the next refresh.
+    site.set(SECOND_URL, "Titulo 2", "elecciones " * 30)
+    summary = refresh(rag, paths, [FIRST_URL, SECOND_URL])
+
+    assert summary["added"] == [SECOND_URL]
+    assert summary["unchanged"] == [FIRST_URL]
+
+
+def test_new_chunks_of_several_articles_are_embedded_together(site, rag, paths, monkeypatch):
+    embedded: list[int] = []
+    embed_chunks = RAG.embed_chunks
+
+    def count_embedding(self, chunks):
+        embedded.append(len(chunks))
+        return embed_chunks(self, chunks)
+
+    monkeypatch.setattr(RAG, "embed_chunks", count_embedding)
+    urls: list[str] = [f"https://noticias.test/economia/{number}" for number in range(6)]
+
+    for number, url in enumerate(urls):
+        site.set(url, f"Titulo {number}", f"noticia{number} " * 30)
+
+    summary: dict = refresh(rag, paths, urls)
+
+    assert sorted(summary["added"]) == sorted(urls)
+    assert sum(embedded) == 6
+    assert len(embedded) <= 2
+    assert [stats["processed"] for stats in summary["stages"] if stats["stage"] == "embed"] == [6]
+
+
+def test_removal_starts_from_the_active_version(site, rag, paths):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    site.set(SECOND_URL, "Titulo 2", "elecciones " * 30)
+    cache: ResponseCache = ResponseCache(paths["cache"])
+
+    refresh(rag, paths, [FIRST_URL, SECOND_URL], cache)
+    rag.refresh_index_version()
+    site.set(FIRST_URL, "Titulo 1", "desempleo " * 30)
+    refresh(rag, paths, [FIRST_URL, SECOND_URL], cache)
+
+    # `rag` has not switched to the last version, but the next refresh must start from it.
+    refresh(rag, paths, [FIRST_URL], cache)
+
+    assert "desempleo" in " ".join(get_texts(rag, FIRST_URL))
+
+
+def test_failed_embedding_is_retried_by_the_next_refresh(site, rag, paths, monkeypatch):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    cache: ResponseCache = ResponseCache(paths["cache"])
+
+    refresh(rag, paths, [FIRST_URL], cache)
+    site.set(FIRST_URL, "Titulo 1", "desempleo " * 30)
+
+    def fail_embedding(self, chunks):
+        raise RuntimeError("embeddings API down")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(RAG, "embed_chunks", fail_embedding)
+        summary: dict = refresh(rag, paths, [FIRST_URL], cache)
+
+    assert list(summary["failed"]) == [FIRST_URL]
+
+    summary = refresh(rag, paths, [FIRST_URL], cache)
+
+    assert summary["updated"] == [FIRST_URL]
+    assert "desempleo" in " ".join(get_texts(rag, FIRST_URL))
+
+
+def test_failed_rebuild_keeps_the_stored_articles(site, rag, paths, monkeypatch):
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    site.set(SECOND_URL, "Titulo 2", "elecciones " * 30)
+
+    refresh(rag, paths, [FIRST_URL, SECOND_URL])
+    site.set(FIRST_URL, "Titulo 1", "desempleo " * 30)
+
+    def fail_publish(self, chunk_ids):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(RAG, "publish_index", fail_publish)
+
+        with pytest.raises(RuntimeError):
+            refresh(rag, paths, [FIRST_URL], rebuild=True)
+
+    store: ArticleStore = ArticleStore(f"{paths['data']}/articles.db")
+
+    assert store.count() == 2
+    assert store.get(FIRST_URL)["data"]["Contenido"].startswith("inflacion")
+
+    refresh(rag, paths, [FIRST_URL], rebuild=True)
+
+    assert store.count() == 1
+    assert store.get(FIRST_URL)["data"]["Contenido"].startswith("desempleo")
+
+
+def test_refresh_includes_crawled_urls(site, rag, paths):
+    crawled_url: str = "https://noticias.test/deportes/3"
+    site.set(FIRST_URL, "Titulo 1", "inflacion " * 30)
+    site.set(crawled_url, "Titulo 3", "futbol " * 30)
+
+    frontier: CrawlFrontier = CrawlFrontier(f"{paths['data']}/frontier.db")
+    frontier.add_seeds([crawled_url])
+    frontier.mark_visited(crawled_url)
+    frontier.close()
+
+    summary: dict = refresh(rag, paths, [FIRST_URL])
+
+    assert sorted(summary["added"]) == sorted([FIRST_URL, crawled_url])
+    assert "futbol" in " ".join(get_texts(rag, crawled_url))
+
+    summary = refresh(rag, paths, [FIRST_URL], include_crawled=False)
+
+    assert summary["removed"] == [crawled_url]
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+from model.RAG.index_versions import IndexVersions
+
+
+def create_version(versions: IndexVersions, copy_from: str | None = None, content: str | None = None) -> str:
+    version_path: str = versions.create_version(copy_from)
+
+    if content is not None:
+        with open(os.path.join(version_path, "data.txt"), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    return version_path
+
+
+def test_no_index_yet(tmp_path):
+    assert IndexVersions(str(tmp_path / "db")).get_current_path() is None
+
+
+def test_activate_and_copy_the_active_version(tmp_path):
+    versions: IndexVersions = IndexVersions(str(tmp_path / "db"))
+    first: str = create_version(versions, content="uno")
+    versions.activate(first)
+
+    second: str = create_version(versions, versions.get_current_path())
+
+    assert versions.get_current_path() == first
+    assert open(os.path.join(second, "data.txt"), encoding="utf-8").read() == "uno"
+
+    versions.activate(second)
+
+    assert versions.get_current_path() == second
+
+
+def test_legacy_index_is_the_active_version(tmp_path):
+    root = tmp_path / "db"
+    root.mkdir()
+    (root / "chroma.sqlite3").write_text("")
+    versions: IndexVersions = IndexVersions(str(root))
+
+    assert versions.get_current_path() == str(root)
+
+    version_path: str = create_version(versions, versions.get_current_path())
+
+    assert os.listdir(version_path) == ["chroma.sqlite3"]
+
+
+def test_collect_garbage_keeps_the_previous_and_used_versions(tmp_path):
+    versions: IndexVersions = IndexVersions(str(tmp_path / "db"), keep_versions=1)
+    paths: list[str] = []
+
+    for _ in range(4):
+        paths.append(create_version(versions))
+        versions.activate(paths[-1])
+
+    user: object = type("User", (), {})()
+    versions.use(user, paths[0])
+    building: str = create_version(versions)
+
+    assert sorted(versions.collect_garbage()) == [paths[1]]
+    assert all(os.path.isdir(path) for path in (paths[0], paths[2], paths[3], building))
+
+
+def test_lock_updates_serializes_the_builds(tmp_path):
+    versions: IndexVersions = IndexVersions(str(tmp_path / "db"))
+    events: list[str] = []
+
+    def build(name: str):
+        with versions.lock_updates():
+            events.append(f"{name} start")
+            time.sleep(0.05)
+            events.append(f"{name} end")
+
+    threads: list[threading.Thread] = [threading.Thread(target=build, args=(name,)) for name in ("a", "b")]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert [event.split()[1] for event in events] == ["start", "end", "start", "end"]
@@ -0,0 +1,64 @@
+import pytest
+
+from model.RAG.lexical_index import LexicalIndex
+
+
+@pytest.fixture
+def index(tmp_path) -> LexicalIndex:
+    lexical_index: LexicalIndex = LexicalIndex(str(tmp_path / "lexical.db"))
+    lexical_index.add(
+        ["a", "b", "c", "d"],
+        [
+            "El alcalde de Jamundí anunció obras en la vía",
+            "La inflación de enero en Colombia",
+            "Obras en la vía al mar",
+            "Resultados del fútbol colombiano",
+        ],
+    )
+
+    yield lexical_index
+    lexical_index.close()
+
+
+def test_search_ranks_matching_chunks(index):
+    results: list[tuple[str, float]] = index.search("obras en Jamundí", k=2)
+
+    assert [chunk_id for chunk_id, _ in results] == ["a", "c"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_search_ignores_stopwords_and_unknown_terms(index):
+    assert index.search("de la en el") == []
+    assert index.search("terremoto") == []
+
+
+def test_search_limits_to_the_given_ids(index):
+    assert [chunk_id for chunk_id, _ in index.search("obras vía", ids={"c"})] == ["c"]
+
+
+def test_add_replaces_and_delete_removes(index):
+    index.add(["a"], ["Nuevo texto sobre elecciones"])
+    index.delete(["c"])
+
+    assert index.count() == 3
+    assert index.search("obras") == []
+    assert [chunk_id for chunk_id, _ in index.search("elecciones")] == ["a"]
+
+
+def test_search_on_a_small_index(tmp_path):
+    lexical_index: LexicalIndex = LexicalIndex(str(tmp_path / "lexical.db"))
+    lexical_index.add(["a"], ["El alcalde de Jamundí anunció obras en la vía"])
+
+    assert [chunk_id for chunk_id, _ in lexical_index.search("obras en Jamundí")] == ["a"]
+    lexical_index.close()
+
+
+def test_common_terms_are_ignored_unless_every_term_is_common(tmp_path):
+    lexical_index: LexicalIndex = LexicalIndex(str(tmp_path / "lexical.db"))
+    ids: list[str] = [f"chunk-{number:02d}" for number in range(30)]
+    lexical_index.add(ids, [f"noticia de colombia número {number}" + (" jamundí" if number < 3 else "") for number in range(30)])
+
+    # "colombia" is in every chunk, so only "jamundí" ranks them.
+    assert [chunk_id for chunk_id, _ in lexical_index.search("colombia jamundí")] == ids[:3]
+    assert len(lexical_index.search("noticia colombia", k=50)) == 30
+    lexical_index.close()
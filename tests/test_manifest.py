@@ -0,0 +1,20 @@
+from model.RAG.manifest import KnowledgeBaseManifest
+
+
+def test_entries_are_saved_and_loaded(tmp_path):
+    manifest_path: str = str(tmp_path / "manifest.json")
+    manifest: KnowledgeBaseManifest = KnowledgeBaseManifest(manifest_path)
+
+    assert not manifest.exists()
+
+    manifest.set("https://elpais.com.co/a", "hash1", ["a-0", "a-1"], 2)
+    manifest.set("https://elpais.com.co/b", "hash2", ["b-0"], 2)
+    manifest.remove("https://elpais.com.co/b")
+    manifest.save()
+
+    loaded: KnowledgeBaseManifest = KnowledgeBaseManifest(manifest_path)
+
+    assert loaded.exists()
+    assert loaded.get_urls() == ["https://elpais.com.co/a"]
+    assert loaded.get("https://elpais.com.co/a")["chunk_ids"] == ["a-0", "a-1"]
+    assert loaded.get("https://elpais.com.co/b") is None
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from model.pipeline.pipeline import BatchPipelineStage, Pipeline, PipelineStage
+
+
+def test_items_flow_through_the_stages():
+    results: list[int] = []
+    lock: threading.Lock = threading.Lock()
+
+    def collect(item: int) -> int:
+        with lock:
+            results.append(item)
+
+        return item
+
+    pipeline: Pipeline = Pipeline(
+        [
+            PipelineStage("double", lambda item: item * 2, workers=3),
+            PipelineStage("drop_odd_tens", lambda item: None if item % 20 == 10 else item, workers=2),
+            PipelineStage("collect", collect),
+        ],
+        queue_size=2,
+    )
+    pipeline.run(iter(range(50)))
+
+    assert sorted(results) == [item * 2 for item in range(50) if item * 2 % 20 != 10]
+    assert [stats["processed"] for stats in pipeline.get_stats()] == [50, 50, 45]
+    assert pipeline.get_stats()[1]["dropped"] == 5
+
+
+def test_failed_items_are_reported_and_dropped():
+    errors: list[tuple[int, str]] = []
+    results: list[int] = []
+
+    def check(item: int) -> int:
+        if item == 3:
+            raise ValueError("invalid item")
+
+        return item
+
+    pipeline: Pipeline = Pipeline(
+        [PipelineStage("check", check), PipelineStage("collect", results.append)],
+        on_error=lambda item, stage, error: errors.append((item, stage.NAME)),
+    )
+    pipeline.run(range(5))
+
+    assert results == [0, 1, 2, 4]
+    assert errors == [(3, "check")]
+    assert pipeline.get_stats()[0]["failed"] == 1
+
+
+def test_batch_stage_groups_items_by_weight():
+    batches: list[list[int]] = []
+    results: list[int] = []
+
+    def double(items: list[int]) -> list[int | None]:
+        batches.append(list(items))
+        return [None if item == 4 else item * 2 for item in items]
+
+    pipeline: Pipeline = Pipeline([
+        BatchPipelineStage("double", double, max_batch_weight=10, get_weight=lambda item: item),
+        PipelineStage("collect", results.append),
+    ])
+    pipeline.run(range(1, 8))
+
+    # The batches are flushed once they weigh 10, and the last one when the input ends.
+    assert batches == [[1, 2, 3, 4], [5, 6], [7]]
+    assert results == [2, 4, 6, 10, 12, 14]
+    assert pipeline.get_stats()[0]["processed"] == 7
+    assert pipeline.get_stats()[0]["dropped"] == 1
+
+
+def test_batch_stage_flushes_when_the_input_is_idle():
+    batches: list[list[int]] = []
+
+    def items():
+        yield 1
+        time.sleep(0.3)
+        yield 2
+
+    pipeline: Pipeline = Pipeline([BatchPipelineStage("collect", lambda batch: batches.append(batch) or batch, max_batch_weight=10, max_wait=0.05)])
+    pipeline.run(items())
+
+    assert batches == [[1], [2]]
+
+
+def test_failed_batch_fails_every_item():
+    errors: list[int] = []
+
+    def fail(items: list[int]) -> list[int]:
+        raise RuntimeError("embeddings API down")
+
+    pipeline: Pipeline = Pipeline(
+        [BatchPipelineStage("fail", fail, max_batch_weight=2)],
+        on_error=lambda item, stage, error: errors.append(item),
+    )
+    pipeline.run(range(3))
+
+    assert errors == [0, 1, 2]
+    assert pipeline.get_stats()[0]["failed"] == 3
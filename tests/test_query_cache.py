@@ -0,0 +1,64 @@
+from model.RAG.query_cache import QueryCache, get_shared_query_cache, normalize_query
+
+
+def test_normalized_queries_share_the_entry():
+    cache: QueryCache = QueryCache()
+    cache.put("¿Qué pasó en Jamundí?", "vector:3", ["a", "b"], latency=0.5)
+
+    assert normalize_query("¿Qué pasó en Jamundí?") == normalize_query("que paso en jamundi")
+    assert cache.get("que paso en jamundi", "vector:3") == ["a", "b"]
+    assert cache.get("que paso en jamundi", "hybrid:3") is None
+
+    stats: dict = cache.get_stats()
+
+    assert (stats["hits"], stats["misses"], stats["saved_seconds"]) == (1, 1, 0.5)
+
+
+def test_entries_expire_and_are_evicted():
+    cache: QueryCache = QueryCache(max_entries=2, ttl_seconds=0)
+    cache.put("uno", "scope", ["a"], latency=0.1)
+
+    assert cache.get("uno", "scope") is None
+
+    cache = QueryCache(max_entries=2)
+
+    for query in ("uno", "dos", "tres"):
+        cache.put(query, "scope", [query], latency=0.1)
+
+    assert cache.get("uno", "scope") is None
+    assert cache.get("tres", "scope") == ["tres"]
+
+
+def test_similar_query_reuses_the_entry():
+    cache: QueryCache = QueryCache(similarity_threshold=0.9)
+    cache.put("inflacion en enero", "scope", ["a"], latency=0.2, query_embedding=[1.0, 0.0])
+
+    assert cache.get("inflación de enero", "scope", lambda: [0.99, 0.1]) == ["a"]
+    assert cache.get("resultados del futbol", "scope", lambda: [0.0, 1.0]) is None
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+def test_clear():
+    cache: QueryCache = QueryCache()
+    cache.put("uno", "scope", ["a"], latency=0.1)
+    cache.clear()
+
+    assert cache.get("uno", "scope") is None
+
+
+def test_changing_the_version_clears_the_cache():
+    cache: QueryCache = QueryCache()
+    cache.set_version("db/versions/1")
+    cache.put("uno", "scope", ["a"], latency=0.1)
+    cache.set_version("db/versions/1")
+
+    assert cache.get("uno", "scope") == ["a"]
+
+    cache.set_version("db/versions/2")
+
+    assert cache.get("uno", "scope") is None
+
+
+def test_shared_cache_per_index(tmp_path):
+    assert get_shared_query_cache(str(tmp_path / "db")) is get_shared_query_cache(str(tmp_path / "db" / ".." / "db"))
+    assert get_shared_query_cache(str(tmp_path / "db")) is not get_shared_query_cache(str(tmp_path / "other"))
@@ -0,0 +1,68 @@
+import os
+
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_core.documents import Document
+
+from model.RAG.rag import RAG
+
+
+def create_rag(tmp_path, vector_store: str = "flat") -> RAG:
+    return RAG(data_path=str(tmp_path / "data"), chroma_path=str(tmp_path / "db"), embedding_backend="hashing", vector_store=vector_store)
+
+
+def publish(rag: RAG, texts: list[str]):
+    staged_rag: RAG = rag.stage_index(copy_current=False)
+    ids: list[str] = staged_rag.index_documents([
+        Document(page_content=text, metadata={"source": f"https://noticias.test/{number}"}) for number, text in enumerate(texts)
+    ])
+
+    staged_rag.publish_index(ids)
+    staged_rag.close_index()
+
+
+def retrieve(rag: RAG, query: str) -> list[str]:
+    return [chunk.page_content for chunk in rag.retrieve_relevant_info(rag.open_db(), query, n=1)]
+
+
+def test_query_cache_is_shared_by_the_models_of_an_index(tmp_path):
+    first: RAG = create_rag(tmp_path)
+    publish(first, ["inflacion en enero", "elecciones en cali"])
+    second: RAG = create_rag(tmp_path)
+
+    assert first.query_cache is second.query_cache
+    assert retrieve(first, "inflacion") == ["inflacion en enero"]
+    assert retrieve(second, "inflacion") == ["inflacion en enero"]
+    assert second.get_query_cache_stats()["hits"] == 1
+
+
+def test_query_cache_is_cleared_on_a_new_version(tmp_path):
+    first: RAG = create_rag(tmp_path)
+    publish(first, ["inflacion en enero", "elecciones en cali"])
+    second: RAG = create_rag(tmp_path)
+
+    retrieve(first, "inflacion")
+    publish(first, ["inflacion en febrero", "elecciones en cali"])
+
+    # The first model to switch to the new version clears the entries of the old one.
+    assert retrieve(second, "inflacion") == ["inflacion en febrero"]
+    assert retrieve(first, "inflacion") == ["inflacion en febrero"]
+    assert first.get_query_cache_stats()["entries"] == 1
+
+
+def test_chroma_of_the_old_version_is_released(tmp_path):
+    first: RAG = create_rag(tmp_path, "chroma")
+    publish(first, ["inflacion en enero", "elecciones en cali"])
+    second: RAG = create_rag(tmp_path, "chroma")
+
+    old_path: str = first.index_versions.get_current_path()
+    retrieve(first, "inflacion")
+    retrieve(second, "inflacion")
+    publish(first, ["inflacion en febrero", "elecciones en cali"])
+
+    # The old version is still used by the second model.
+    assert retrieve(first, "inflacion") == ["inflacion en febrero"]
+    assert old_path in SharedSystemClient._identifier_to_system
+
+    assert retrieve(second, "inflacion") == ["inflacion en febrero"]
+    assert old_path not in SharedSystemClient._identifier_to_system
+    assert not os.path.exists(old_path)
@@ -0,0 +1,21 @@
+from model.web_scraper.response_cache import ResponseCache
+
+
+def test_conditional_headers_of_a_cached_page(tmp_path):
+    cache: ResponseCache = ResponseCache(str(tmp_path / "cache"))
+    url: str = "https://elpais.com.co/a"
+
+    assert cache.get(url) is None
+    assert cache.get_conditional_headers(url) == {}
+
+    cache.save(url, '"abc"', "Wed, 03 Jan 2024 10:00:00 GMT", {"Título": "Titulo 1"})
+
+    assert cache.get(url)["data"] == {"Título": "Titulo 1"}
+    assert cache.get_conditional_headers(url) == {"If-None-Match": '"abc"', "If-Modified-Since": "Wed, 03 Jan 2024 10:00:00 GMT"}
+
+
+def test_page_without_validators_is_not_cached(tmp_path):
+    cache: ResponseCache = ResponseCache(str(tmp_path / "cache"))
+    cache.save("https://elpais.com.co/a", None, None, {"Título": "Titulo 1"})
+
+    assert cache.get("https://elpais.com.co/a") is None
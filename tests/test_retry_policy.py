@@ -0,0 +1,70 @@
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from model.web_scraper import retry_policy
+from model.web_scraper.retry_policy import RetryPolicy, get_retry_after
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int, headers: dict[str, str] | None = None):
+        super().__init__(f"Error {status_code}")
+        self.status_code: int = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+@pytest.fixture
+def delays(monkeypatch) -> list[float]:
+    slept: list[float] = []
+    monkeypatch.setattr(retry_policy.time, "sleep", slept.append)
+
+    return slept
+
+
+def failing(errors: list[Exception]):
+    def function() -> str:
+        if errors:
+            raise errors.pop(0)
+
+        return "ok"
+
+    return function
+
+
+def test_retries_until_success(delays):
+    policy: RetryPolicy = RetryPolicy(max_attempts=3, base_delay=1.0)
+
+    assert policy.run(failing([StatusError(503), StatusError(500)])) == "ok"
+    assert len(delays) == 2
+    assert 0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0
+
+
+def test_malformed_json_is_retried_right_away(delays):
+    assert RetryPolicy().run(failing([json.JSONDecodeError("Expected a JSON object", "[]", 0)])) == "ok"
+    assert delays == [0.0]
+
+
+def test_rate_limit_waits_for_retry_after(delays):
+    assert RetryPolicy(max_delay=10.0).run(failing([StatusError(429, {"retry-after": "3"}), StatusError(429, {"retry-after": "30"})])) == "ok"
+    assert delays == [3.0, 10.0]
+
+
+def test_client_errors_and_last_attempt_are_raised(delays):
+    with pytest.raises(StatusError):
+        RetryPolicy().run(failing([StatusError(401)]))
+
+    with pytest.raises(StatusError):
+        RetryPolicy(max_attempts=2).run(failing([StatusError(503), StatusError(503)]))
+
+    assert len(delays) == 1
+
+
+def test_retry_after_date():
+    retry_date: datetime = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    for header in (format_datetime(retry_date, usegmt=True), format_datetime(retry_date.replace(tzinfo=None))):
+        assert 25 <= get_retry_after(StatusError(429, {"retry-after": header})) <= 30
+
+    assert get_retry_after(StatusError(429, {"retry-after": "mañana"})) is None
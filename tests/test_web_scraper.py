@@ -0,0 +1,58 @@
+import importlib.util
+
+import pytest
+
+from model.web_scraper.web_scraper import clean_page
+
+PARSERS: list = [
+    "html.parser",
+    pytest.param("lxml", marks=pytest.mark.skipif(importlib.util.find_spec("lxml") is None, reason="lxml is not installed")),
+]
+
+PAGE: str = """
+<html>
+<head>
+    <title>Titulo 1</title>
+    <a href="https://elpais.com.co/cabecera">Cabecera</a>
+</head>
+<body>
+    <nav><a href="https://elpais.com.co/menu">Menú</a></nav>
+    <article>
+        <p class="texto" style="color: red">Texto de la <a href="https://elpais.com.co/a">noticia</a>.</p>
+        <script>var a = "<a href='https://elpais.com.co/script'>";</script>
+        <a href="https://elpais.com.co/b">Otra noticia</a>
+    </article>
+</body>
+</html>
+<a href="https://elpais.com.co/pie">Pie</a>
+"""
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_links_are_the_links_of_the_content(parser):
+    content, links = clean_page(PAGE, parser)
+
+    assert links == content.find_all("a", href=True)
+
+
+def test_links_outside_the_body_are_not_collected():
+    # Unlike lxml, html.parser keeps the links of the head and after the body where they are.
+    _, links = clean_page(PAGE, "html.parser")
+
+    assert [link["href"] for link in links] == ["https://elpais.com.co/a", "https://elpais.com.co/b"]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_unwanted_tags_and_attributes_are_removed(parser):
+    content, _ = clean_page(PAGE, parser)
+
+    assert content.find("script") is None and content.find("nav") is None
+    assert content.find("p").attrs == {}
+    assert content.find("a", href="https://elpais.com.co/a").attrs == {"href": "https://elpais.com.co/a"}
+
+
+def test_page_without_body():
+    content, links = clean_page("<p><a href='https://elpais.com.co/a'>noticia</a></p>", "html.parser")
+
+    assert content is None
+    assert [link["href"] for link in links] == ["https://elpais.com.co/a"]